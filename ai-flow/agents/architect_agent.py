@@ -102,10 +102,16 @@ As a {s.role}, I want {s.feature}"""
             for s in stories
         ])
         
+        doc_context = self.get_doc_context(
+            stories_text + "\n" + "\n".join(f"{s.description} {s.benefit}" for s in stories)
+        )
+        if doc_context:
+            doc_context = f"\nRELEVANT ARCHITECTURE DOCUMENTATION:\n{doc_context}\n"
+        
         user_prompt = f"""Design technical specs for these user stories.
 
 {stories_text}
-
+{doc_context}
 Return ONLY a valid JSON object with this structure:
 {{"specs": [
   {{"feature_id": "US-001", "database_changes": ["..."], "api_endpoints": ["POST /api/v1/..."], "frontend_components": ["..."], "dependencies": []}}
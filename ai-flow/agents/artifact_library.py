@@ -0,0 +1,206 @@
+"""
+AI Flow - Approved Artifact Library
+Files of reviewed and approved tasks, kept across runs and projects for reuse
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from orchestrator.state import ReviewResult, Task
+from rag.embeddings import EmbeddingProvider
+
+
+def task_key(task: Task) -> str:
+    """What a task asks for, as embedded for similarity: title, description and files"""
+    return f"{task.title}\n{task.description}\n" + " ".join(task.files_to_create + task.files_to_modify)
+
+
+def tech_stack_signature(tech_stack: dict) -> str:
+    """Stable one-line form of config.yaml's tech_stack; artifacts only match the same stack"""
+    return "; ".join(
+        f"{layer}: " + ", ".join(f"{k}={v}" for k, v in sorted(values.items()))
+        for layer, values in sorted((tech_stack or {}).items())
+        if isinstance(values, dict)
+    )
+
+
+def review_score(review: ReviewResult) -> float:
+    """1.0 for a clean approval, less for every issue the reviewer still listed"""
+    penalty = (
+        0.25 * len(review.security_issues)
+        + 0.1 * len(review.performance_issues)
+        + 0.05 * len(review.suggested_fixes)
+    )
+    return round(max(0.0, 1.0 - penalty), 3)
+
+
+class ApprovedArtifact(BaseModel):
+    """The files of one approved task and what they were approved for"""
+    id: str
+    title: str
+    description: str
+    task_type: str
+    tech_stack: str
+    score: float
+    files: List[dict]  # [{"path", "content", "action"}] as produced by CodeAgent
+    approved_at: float
+    uses: int = 0
+
+
+@dataclass
+class ArtifactMatch:
+    artifact: ApprovedArtifact
+    similarity: float
+    verbatim: bool  # above the reuse threshold: used as is; otherwise adapted
+
+
+@dataclass
+class LibraryStats:
+    reused: int = 0
+    adapted: int = 0
+    added: int = 0
+    reused_ids: List[str] = field(default_factory=list)
+
+
+class ArtifactLibrary:
+    """
+    Persistent library of approved task outputs. Each artifact is stored with
+    its task title/description, TaskType, tech stack signature and review
+    score, and indexed by an embedding of the task (`task_key`).
+
+    `find` returns the most similar artifact of the same task type and tech
+    stack: at or above `reuse_threshold` its files are used verbatim, at or
+    above `adapt_threshold` they are adapted by a small edit prompt. Only
+    approvals scoring at least `min_score` are added.
+    """
+
+    DB_NAME = "artifacts.sqlite3"
+
+    def __init__(
+        self,
+        directory: str,
+        embedder: EmbeddingProvider,
+        tech_stack: str = "",
+        reuse_threshold: float = 0.97,
+        adapt_threshold: float = 0.85,
+        min_score: float = 0.6,
+    ):
+        self.embedder = embedder
+        self.tech_stack = tech_stack
+        self.reuse_threshold = reuse_threshold
+        self.adapt_threshold = adapt_threshold
+        self.min_score = min_score
+        self.stats = LibraryStats()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / self.DB_NAME
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id TEXT PRIMARY KEY,
+                task_type TEXT NOT NULL,
+                tech_stack TEXT NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                score REAL NOT NULL,
+                artifact TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_artifacts_group ON artifacts (task_type, tech_stack, model);
+        """)
+        self._conn.commit()
+        # task_type -> (artifact ids, unit vectors) for this tech stack and embedder
+        self._groups: Dict[str, Tuple[List[str], Optional[np.ndarray]]] = {}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+
+    async def _embed(self, task: Task) -> np.ndarray:
+        vector = np.asarray(
+            (await asyncio.to_thread(self.embedder.embed_queries, [task_key(task)]))[0], dtype=np.float32
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _group(self, task_type: str) -> Tuple[List[str], Optional[np.ndarray]]:
+        if task_type not in self._groups:
+            rows = self._conn.execute(
+                "SELECT id, vector FROM artifacts WHERE task_type = ? AND tech_stack = ? AND model = ?",
+                (task_type, self.tech_stack, self.embedder.name),
+            ).fetchall()
+            vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]) if rows else None
+            self._groups[task_type] = ([row[0] for row in rows], vectors)
+        return self._groups[task_type]
+
+    def get(self, artifact_id: str) -> Optional[ApprovedArtifact]:
+        row = self._conn.execute("SELECT artifact FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return ApprovedArtifact(**json.loads(row[0])) if row else None
+
+    async def find(self, task: Task) -> Optional[ArtifactMatch]:
+        """The closest approved artifact for `task` above the adapt threshold"""
+        ids, vectors = self._group(task.type.value)
+        if vectors is None:
+            return None
+        scores = vectors @ await self._embed(task)
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < self.adapt_threshold:
+            return None
+        artifact = self.get(ids[best])
+        if artifact is None:
+            return None
+        verbatim = similarity >= self.reuse_threshold
+        artifact.uses += 1
+        self._conn.execute(
+            "UPDATE artifacts SET artifact = ? WHERE id = ?", (artifact.model_dump_json(), artifact.id)
+        )
+        self._conn.commit()
+        if verbatim:
+            self.stats.reused += 1
+            self.stats.reused_ids.append(artifact.id)
+        else:
+            self.stats.adapted += 1
+        return ArtifactMatch(artifact, similarity, verbatim)
+
+    async def add(self, task: Task, files: List[dict], review: ReviewResult) -> Optional[ApprovedArtifact]:
+        """Store the approved files of a task; skipped below min_score or without files"""
+        score = review_score(review)
+        if not files or score < self.min_score:
+            return None
+        content = json.dumps([task.type.value, self.tech_stack, task_key(task), files], sort_keys=True)
+        artifact = ApprovedArtifact(
+            id=hashlib.sha1(content.encode("utf-8")).hexdigest()[:16],
+            title=task.title,
+            description=task.description,
+            task_type=task.type.value,
+            tech_stack=self.tech_stack,
+            score=score,
+            files=files,
+            approved_at=time.time(),
+        )
+        vector = await self._embed(task)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO artifacts (id, task_type, tech_stack, model, vector, score, artifact) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (artifact.id, artifact.task_type, self.tech_stack, self.embedder.name,
+             vector.tobytes(), score, artifact.model_dump_json()),
+        )
+        self._conn.commit()
+        self._groups.pop(artifact.task_type, None)
+        self.stats.added += 1
+        return artifact
+
+    def summary(self) -> str:
+        return f"{self.stats.reused} reused, {self.stats.adapted} adapted, {self.stats.added} added ({len(self)} stored)"
@@ -4,17 +4,16 @@ Abstract base class for all AI agents
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Optional
-import yaml
-from pathlib import Path
+from typing import Any, Callable, Optional
+import time
 
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel
-import os
 
+from agents import llm_registry
+from agents.rate_limiter import estimate_tokens
+from agents.retry_policy import RATE_LIMIT, classify_error, retry_after_seconds
 from orchestrator.state import WorkflowState
 
 
@@ -24,62 +23,58 @@ class BaseAgent(ABC):
     def __init__(self, config_path: str = "config/config.yaml"):
         self.config = self._load_config(config_path)
         self.llm = self._init_llm()
+        # Provider quota and concurrency, shared by all agents (agents.rate_limiter.RateLimiter)
+        self.rate_limiter = llm_registry.get_rate_limiter(self.config.get("llm", {}))
+        # Error classification, backoff and the run's retry budget (agents.retry_policy.RetryPolicy)
+        self.retry_policy = llm_registry.get_retry_policy(self.config.get("llm", {}))
         self.json_parser = JsonOutputParser()
+        # Set by the orchestrator when project docs were indexed
+        self.doc_indexer = None
+        # Set by the orchestrator to replay responses of earlier runs (agents.llm_cache.LLMCache)
+        self.llm_cache = None
+        # Optional near-duplicate response cache (agents.semantic_cache.SemanticCache)
+        self.semantic_cache = None
     
     def _load_config(self, config_path: str) -> dict:
-        """Load configuration from YAML file"""
-        config_file = Path(__file__).parent.parent / config_path
-        if config_file.exists():
-            with open(config_file, 'r') as f:
-                return yaml.safe_load(f)
-        return {}
+        """Configuration from YAML, parsed once per process and shared by all agents"""
+        return llm_registry.load_config(config_path)
     
     def _init_llm(self):
-        """Initialize the LLM based on configuration"""
+        """The shared LLM client for the configured provider (see agents.llm_registry)"""
+        return llm_registry.get_llm(self.config.get("llm", {}))
+    
+    def _llm_identity(self) -> tuple:
+        """(provider, model, temperature) of the configured LLM, as used for cache keys"""
         provider = self.config.get("llm", {}).get("provider", "gemini")
-        
-        if provider == "ollama":
-            from langchain_ollama import ChatOllama
-            ollama_config = self.config.get("llm", {}).get("ollama", {})
-            return ChatOllama(
-                base_url=ollama_config.get("base_url", "http://localhost:11434"),
-                model=ollama_config.get("model", "qwen2.5-coder:7b"),
-                temperature=ollama_config.get("temperature", 0.1),
-            )
-
-        elif provider == "openrouter":
-            openrouter_config = self.config.get("llm", {}).get("openrouter", {})
-            api_key = os.getenv("OPENROUTER_API_KEY")
-            if not api_key:
-                raise ValueError("OPENROUTER_API_KEY environment variable not set")
-                
-            return ChatOpenAI(
-                base_url=openrouter_config.get("base_url", "https://openrouter.ai/api/v1"),
-                api_key=api_key,
-                model=openrouter_config.get("model", "google/gemini-2.0-flash-exp:free"),
-                temperature=openrouter_config.get("temperature", 0.1),
-                max_tokens=openrouter_config.get("max_tokens", 8192),
-            )
-            
-        elif provider == "gemini":
-            gemini_config = self.config.get("llm", {}).get("gemini", {})
-            return ChatGoogleGenerativeAI(
-                model=gemini_config.get("model", "gemini-2.0-flash-exp"),
-                temperature=gemini_config.get("temperature", 0.1),
-                max_output_tokens=gemini_config.get("max_tokens", 8192),
-            )
-        else:
-            # Fallback to Gemini
-            return ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash-exp",
-                temperature=0.1,
-            )
+        model = getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or ""
+        return provider, str(model), getattr(self.llm, "temperature", None)
     
     def _get_agent_config(self) -> dict:
         """Get agent-specific configuration"""
         agent_name = self.__class__.__name__.lower().replace("agent", "_agent")
         return self.config.get("agents", {}).get(agent_name, {})
     
+    def get_doc_context(self, query: str) -> str:
+        """
+        Digests of the doc types listed under this agent's `docs` key in
+        config.yaml, followed by the sections of those documents relevant to
+        `query`. `docs_digest_max_chars: 0` leaves the digests out.
+        """
+        if self.doc_indexer is None or not query.strip():
+            return ""
+        agent_config = self._get_agent_config()
+        digests = self.doc_indexer.get_digests(
+            doc_types=agent_config.get("docs"),
+            max_chars=agent_config.get("docs_digest_max_chars", 4000),
+        ) if agent_config.get("docs_digest_max_chars", 4000) else ""
+        sections = self.doc_indexer.get_context_for_query(
+            query,
+            top_k=agent_config.get("docs_top_k", 5),
+            doc_types=agent_config.get("docs"),
+            max_chars=agent_config.get("docs_max_chars", 12000),
+        )
+        return "\n".join(part for part in (digests, sections) if part)
+    
     @property
     @abstractmethod
     def name(self) -> str:
@@ -104,57 +99,110 @@ class BaseAgent(ABC):
         self,
         user_prompt: str,
         output_schema: Optional[type[BaseModel]] = None,
+        semantic_key: Optional[str] = None,
+        task_type: str = "",
+        use_semantic_cache: bool = True,
+        semantic_stage: Optional[str] = None,
+        cache_accept: Optional[Callable[[str], bool]] = None,
     ) -> Any:
         """
         Invoke the LLM with the system prompt and user prompt.
         Optionally parse output to a Pydantic model.
-        Retry on 429 errors (Rate Limit) with exponential backoff.
+        Calls wait for the provider's rate limiter before they are sent.
+        Rate limits, 5xx, timeouts and connection errors are retried with
+        jittered backoff (see agents.retry_policy); auth, not found and
+        context length errors fail at once.
+        Responses are served from / stored in `self.llm_cache` when set.
+        With a semantic cache, `semantic_key` (default: the prompt) is matched
+        against earlier requests of this agent and `task_type`: a close match
+        is served as is, a looser one attached to the prompt as a draft.
+        Revisions of rejected output pass `use_semantic_cache=False` to skip
+        the lookup. With `semantic_stage` the response is only staged under
+        that key, and stored once the caller commits it as accepted.
+        `cache_accept(text)` lets a caller that parses the response itself
+        keep unusable ones out of both caches; a cached response it rejects
+        is dropped and requested again.
         """
-        # Define retry wrapper
-        from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, before_sleep_log
-        import logging
+        provider, model, temperature = self._llm_identity()
+        cache_key = None
+        if self.llm_cache is not None and self.llm_cache.cacheable(temperature):
+            cache_key = self.llm_cache.make_key(provider, model, temperature, self.system_prompt, user_prompt)
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None and cache_accept is not None and not cache_accept(cached):
+                self.llm_cache.invalidate(cache_key)
+                cached = None
+            if cached is not None:
+                self.log("Replaying cached LLM response")
+                return self._parse_response(cached, output_schema, cache_key)
         
-        # Configure logging for retries
-        logger = logging.getLogger(f"{self.name}_Retry")
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            handler.setFormatter(logging.Formatter('[%(name)s] %(message)s'))
-            logger.addHandler(handler)
-            logger.setLevel(logging.WARNING)
-
-        @retry(
-            reraise=True,
-            stop=stop_after_attempt(5),
-            wait=wait_exponential(multiplier=2, min=2, max=60),
-            # Retry on any exception that mentions "429" or "rate limit" string in message
-            retry=retry_if_exception_type(Exception), 
-            before_sleep=before_sleep_log(logger, logging.WARNING)
-        )
-        async def _call_llm_with_retry():
-            messages = [
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=user_prompt),
-            ]
+        semantic_vector = None
+        prompt = user_prompt
+        semantic_config = self._get_agent_config().get("semantic_cache")
+        if self.semantic_cache is not None and self.semantic_cache.enabled_for(semantic_config) and (
+            use_semantic_cache or semantic_stage is not None
+        ):
             try:
-                return await self.llm.ainvoke(messages)
+                semantic_vector = await self.semantic_cache.embed(semantic_key or user_prompt)
             except Exception as e:
-                # Check for rate limit error patterns
-                error_msg = str(e).lower()
-                if "429" in error_msg or "rate limit" in error_msg or "quota" in error_msg:
-                    self.log(f"Rate limit hit! Retrying... ({error_msg[:100]}...)", "warning")
-                    raise e # Trigger retry
-                raise e # Re-raise other errors immediately
-        
+                self.log(f"Semantic cache skipped, embedding failed: {e}", "warning")
+            if semantic_vector is not None and use_semantic_cache:
+                match = self.semantic_cache.lookup(self.name, task_type, semantic_vector, semantic_config)
+                if match is not None and match.served:
+                    self.log(f"Serving response of a near-identical request (similarity {match.similarity:.2f})")
+                    return self._parse_response(match.response, output_schema, None)
+                if match is not None:
+                    self.log(f"Drafting from a similar earlier response (similarity {match.similarity:.2f})")
+                    prompt = self.semantic_cache.draft_prompt(user_prompt, match)
+
+        messages = [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=prompt),
+        ]
+        estimated_tokens = estimate_tokens(self.system_prompt, prompt)
+
+        async def _attempt():
+            async with self.rate_limiter.limit(estimated_tokens):
+                response = await self.retry_policy.with_timeout(self.llm.ainvoke(messages))
+            usage = getattr(response, "usage_metadata", None) or {}
+            self.rate_limiter.settle(estimated_tokens, usage.get("total_tokens"))
+            return response
+
+        def _on_retry(kind: str, attempt: int, delay: float, error: BaseException):
+            if kind == RATE_LIMIT and retry_after_seconds(error) is not None:
+                # The provider said when; hold every agent's calls until then
+                self.rate_limiter.hold(delay)
+            self.log(
+                f"LLM call failed ({kind}), retry {attempt}/{self.retry_policy.max_attempts - 1} "
+                f"in {delay:.1f}s: {str(error)[:100]}",
+                "warning",
+            )
+
+        started = time.perf_counter()
         try:
-            response = await _call_llm_with_retry()
+            response = await self.retry_policy.call(_attempt, on_retry=_on_retry)
         except Exception as e:
-            self.log(f"LLM Call failed after retries: {e}", "error")
+            self.log(f"LLM call failed ({classify_error(e)}): {e}", "error")
             raise e
 
+        accepted = isinstance(response.content, str) and (cache_accept is None or cache_accept(response.content))
+        if cache_key is not None and accepted:
+            self.llm_cache.put(cache_key, response.content, agent=self.name, model=model)
+        parsed = self._parse_response(response.content, output_schema, cache_key)
+        # Only responses that parsed may be served or drafted from later
+        if semantic_vector is not None and accepted:
+            entry = (self.name, task_type, semantic_vector, response.content, time.perf_counter() - started)
+            if semantic_stage is not None:
+                self.semantic_cache.stage(semantic_stage, *entry)
+            else:
+                self.semantic_cache.put(*entry)
+        return parsed
+    
+    def _parse_response(self, content: Any, output_schema: Optional[type[BaseModel]], cache_key: Optional[str]) -> Any:
+        """The response text, or `output_schema` instance(s) parsed from its JSON"""
         if output_schema:
             # Parse JSON response to Pydantic model
             try:
-                json_str = response.content
+                json_str = content
                 # Extract JSON from markdown code blocks if present
                 if "```json" in json_str:
                     json_str = json_str.split("```json")[1].split("```")[0]
@@ -168,9 +216,12 @@ class BaseAgent(ABC):
                     return [output_schema(**item) for item in data]
                 return output_schema(**data)
             except Exception as e:
-                raise ValueError(f"Failed to parse LLM response: {e}\nResponse: {response.content}")
+                # Do not replay a response that cannot be parsed
+                if cache_key is not None:
+                    self.llm_cache.invalidate(cache_key)
+                raise ValueError(f"Failed to parse LLM response: {e}\nResponse: {content}")
         
-        return response.content
+        return content
     
     def log(self, message: str, level: str = "info"):
         """Log a message with agent context"""
@@ -6,8 +6,10 @@ Generates code for various task types
 import json
 from typing import Dict, Optional
 
+from agents.artifact_library import ArtifactMatch, task_key
 from agents.base_agent import BaseAgent
 from orchestrator.state import WorkflowState, Task, TaskStatus, TaskType
+from rag.metadata import ChunkFilter
 
 
 class CodeAgent(BaseAgent):
@@ -22,6 +24,21 @@ class CodeAgent(BaseAgent):
     - Write inline documentation
     """
     
+    # Codebase context each task type retrieves by default; override per task
+    # type under agents.code_agent.context_filters in config.yaml
+    CONTEXT_FILTERS = {
+        TaskType.DATABASE: ChunkFilter(extensions=['.prisma', '.sql']),
+        TaskType.BACKEND: ChunkFilter(extensions=['.ts', '.js', '.py', '.prisma']),
+        TaskType.API: ChunkFilter(extensions=['.ts', '.js', '.py']),
+        TaskType.FRONTEND: ChunkFilter(extensions=['.tsx', '.jsx']),
+        TaskType.TEST: ChunkFilter(extensions=['.ts', '.tsx', '.js', '.jsx', '.py']),
+    }
+    
+    def __init__(self, config_path: str = "config/config.yaml"):
+        super().__init__(config_path)
+        # Set by the orchestrator when the approved-artifact library is enabled
+        self.artifact_library = None
+    
     @property
     def name(self) -> str:
         return "Code Agent"
@@ -120,6 +137,14 @@ TEST TASK GUIDELINES:
         }
         return prompts.get(task.type, "")
     
+    def context_filter(self, task: Task) -> Optional[ChunkFilter]:
+        """Which indexed chunks may serve as codebase context for a task"""
+        overrides = self._get_agent_config().get("context_filters") or {}
+        if task.type.value in overrides:
+            spec = overrides[task.type.value]
+            return ChunkFilter(**spec) if spec else None
+        return self.CONTEXT_FILTERS.get(task.type)
+    
     async def process(self, state: WorkflowState) -> WorkflowState:
         """Generate code for the current task"""
         current_task_id = state.get("current_task_id")
@@ -139,6 +164,33 @@ TEST TASK GUIDELINES:
             self.log(f"Task {current_task_id} not found", "error")
             return state
         
+        # A close approved artifact from an earlier run is reused or adapted;
+        # revisions always generate
+        revising = bool(
+            state.get("reflector_feedback") and state["reflector_feedback"].get("status") == "needs_revision"
+        )
+        if self.artifact_library is not None and task.retry_count == 0 and not revising:
+            try:
+                match = await self.artifact_library.find(task)
+            except Exception as e:
+                self.log(f"Artifact library lookup failed: {e}", "warning")
+                match = None
+            if match is not None and match.verbatim:
+                self.log(
+                    f"Reusing approved artifact {match.artifact.id} ({match.artifact.title}, "
+                    f"similarity {match.similarity:.2f})", "success"
+                )
+                task.artifact_id, task.artifact_verbatim = match.artifact.id, True
+                self._store_files(state, task, match.artifact.files)
+                return state
+            if match is not None:
+                self.log(
+                    f"Adapting approved artifact {match.artifact.id} ({match.artifact.title}, "
+                    f"similarity {match.similarity:.2f})"
+                )
+                task.artifact_id = match.artifact.id
+                return await self._generate(state, task, self._adapt_prompt(task, match), revising)
+        
         self.log(f"Generating code for task: {task.title}")
         
         # Build context from existing files
@@ -154,8 +206,11 @@ TEST TASK GUIDELINES:
                 else:
                     existing_files_context += f"\n--- {path} ---\n{content[:2000]}...\n"
         
-        # Build context from project
-        project_context = state.get("project_context", "")
+        # Build context from project: explicit context plus the codebase
+        # context retrieved for this task by the orchestrator
+        project_context = "\n\n".join(
+            part for part in (state.get("project_context", ""), task.context) if part
+        )
         # Truncate context if too long
         # Estimate: 1 token ~= 4 chars. Target < 100k tokens (~400k chars)
         # We reserve ~20k tokens for the rest of the prompt
@@ -164,6 +219,14 @@ TEST TASK GUIDELINES:
         if len(project_context) > max_context_chars:
             project_context = project_context[:max_context_chars] + "\n...[Context Truncated]..."
         
+        # Documentation sections for this task only (API contracts, schema...)
+        doc_context = self.get_doc_context(
+            f"{task.title}\n{task.description}\n{task.type.value}\n"
+            + " ".join(task.files_to_create + task.files_to_modify)
+        )
+        if doc_context:
+            doc_context = f"\nRELEVANT DOCUMENTATION:\n{doc_context}"
+        
         # Check for reflector feedback
         feedback_context = ""
         if state.get("reflector_feedback") and state["reflector_feedback"].get("status") == "needs_revision":
@@ -191,6 +254,7 @@ Files to modify: {', '.join(task.files_to_modify) if task.files_to_modify else '
 
 PROJECT CONTEXT:
 {project_context}
+{doc_context}
 {existing_files_context}
 {feedback_context}
 
@@ -213,8 +277,41 @@ Respond with ONLY valid JSON, no other text."""
                 truncated_context = user_prompt[task_info_end:task_info_end+allowed_context]
                 user_prompt = user_prompt[:task_info_end] + truncated_context + "\n...[TRUNCATED]...\n" + user_prompt[context_end:]
 
+        return await self._generate(state, task, user_prompt, revising)
+    
+    def _adapt_prompt(self, task: Task, match: ArtifactMatch) -> str:
+        """Small edit prompt: the approved files of a similar task and what differs"""
+        files_text = "".join(f"\n--- {f['path']} ---\n{f['content']}\n" for f in match.artifact.files)
+        return f"""Adapt an approved implementation of a similar task to the following task.
+
+TASK: {task.id}
+Title: {task.title}
+Description: {task.description}
+Type: {task.type.value}
+Files to create: {', '.join(task.files_to_create) if task.files_to_create else 'Determine based on task'}
+Files to modify: {', '.join(task.files_to_modify) if task.files_to_modify else 'None'}
+
+APPROVED IMPLEMENTATION OF "{match.artifact.title}" (similarity {match.similarity:.2f}, review score {match.artifact.score:.2f}):
+{files_text}
+Keep its structure and conventions. Change only names, fields, paths and logic
+that differ for this task, and drop anything this task does not need.
+Respond with ONLY valid JSON with a "files" key, in the same format as the files above."""
+    
+    async def _generate(self, state: WorkflowState, task: Task, user_prompt: str, revising: bool) -> WorkflowState:
+        """Call the LLM for a task's files and store them"""
         try:
-            response = await self.invoke_llm(user_prompt)
+            # Recurring task shapes ("Add X model to the schema") match on the task itself
+            response = await self.invoke_llm(
+                user_prompt,
+                semantic_key=task_key(task),
+                task_type=task.type.value,
+                # A revision must not be served the rejected answer again
+                use_semantic_cache=not revising,
+                # Stored for similar tasks only once review approves it
+                semantic_stage=task.id,
+                # A response without files must not be replayed by the next run
+                cache_accept=lambda text: bool(self._parse_files(text)),
+            )
             
             # Parse the response
             response_text = str(response)
@@ -222,69 +319,21 @@ Respond with ONLY valid JSON, no other text."""
             # Log raw response for debugging (truncated)
             self.log(f"LLM Raw Output purpose debugging: {response_text[:500]}...", "info")
 
-            # Parsing logic with robust regex for 7B models
-            import re
-            
-            # 1. Try to find JSON object structure
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
-            
-            data = {}
-            try:
-                data = json.loads(response_text)
-            except json.JSONDecodeError:
-                self.log("Standard JSON parse failed, trying repair...", "warning")
-                # Try to fix common issues
-                try:
-                    # Escape unescaped newlines in values
-                    fixed_text = re.sub(r'(?<=: ")(.*?)(?=")', lambda m: m.group(1).replace('\n', '\\n'), response_text, flags=re.DOTALL)
-                    data = json.loads(fixed_text)
-                except:
-                    self.log("JSON repair failed.", "error")
-
-            files_data = data.get("files", [])
+            files_data = self._parse_files(response_text)
+            if files_data is None:
+                self.log("JSON repair failed.", "error")
+                files_data = []
             
             # Auto-map 'name' to 'path' if 'path' is missing (common 7B hallucination)
-            if files_data:
-                for f in files_data:
-                    if "path" not in f and "name" in f:
-                        f["path"] = f["name"]
-                        self.log(f"Mapped 'name' to 'path' for {f['path']}", "warning")
-
-
-            files_data = data.get("files", [])
+            for f in files_data:
+                if "path" not in f and "name" in f:
+                    f["path"] = f["name"]
+                    self.log(f"Mapped 'name' to 'path' for {f['path']}", "warning")
             
             if not files_data:
-                 self.log(f"Warning: No files found in response. Data keys: {list(data.keys())}", "warning")
+                 self.log("Warning: No files found in response", "warning")
 
-            # Store generated code in state and write to disk
-            output_dir = state.get("output_dir", "./generated")
-            from pathlib import Path
-            
-            for file_info in files_data:
-                path = file_info["path"]
-                content = file_info["content"]
-                
-                # Update state
-                state["generated_files"][path] = content
-                
-                # Write to disk immediately
-                try:
-                    full_path = Path(output_dir) / path
-                    full_path.parent.mkdir(parents=True, exist_ok=True)
-                    full_path.write_text(content, encoding='utf-8')
-                    self.log(f"Generated and Saved: {path}", "success")
-                except Exception as e:
-                    self.log(f"Error saving {path}: {e}", "error")
-            
-            # Update task status
-            for t in state["tasks"]:
-                if t.id == current_task_id:
-                    t.status = TaskStatus.REVIEW_NEEDED
-                    t.generated_code = json.dumps(files_data)
-                    break
-            
+            self._store_files(state, task, files_data)
             self.log(f"Generated {len(files_data)} files for task {task.id}", "success")
             
         except Exception as e:
@@ -293,9 +342,61 @@ Respond with ONLY valid JSON, no other text."""
             
             # Mark task as failed
             for t in state["tasks"]:
-                if t.id == current_task_id:
+                if t.id == task.id:
                     t.status = TaskStatus.FAILED
                     t.retry_count += 1
                     break
         
         return state
+
+    def _parse_files(self, response_text: str) -> Optional[list]:
+        """The `files` list of a response's JSON, None if it cannot be parsed even after repair"""
+        # Parsing logic with robust regex for 7B models
+        import re
+        
+        # 1. Try to find JSON object structure
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if json_match:
+            response_text = json_match.group(0)
+        
+        try:
+            data = json.loads(response_text)
+        except json.JSONDecodeError:
+            # Try to fix common issues
+            try:
+                # Escape unescaped newlines in values
+                fixed_text = re.sub(r'(?<=: ")(.*?)(?=")', lambda m: m.group(1).replace('\n', '\\n'), response_text, flags=re.DOTALL)
+                data = json.loads(fixed_text)
+            except json.JSONDecodeError:
+                return None
+        files = data.get("files", []) if isinstance(data, dict) else []
+        return files if isinstance(files, list) else []
+
+    def _store_files(self, state: WorkflowState, task: Task, files_data: list) -> None:
+        """Record a task's files in the state, write them to disk and hand the task to review"""
+        # Store generated code in state and write to disk
+        output_dir = state.get("output_dir", "./generated")
+        from pathlib import Path
+        
+        for file_info in files_data:
+            path = file_info["path"]
+            content = file_info["content"]
+            
+            # Update state
+            state["generated_files"][path] = content
+            
+            # Write to disk immediately
+            try:
+                full_path = Path(output_dir) / path
+                full_path.parent.mkdir(parents=True, exist_ok=True)
+                full_path.write_text(content, encoding='utf-8')
+                self.log(f"Generated and Saved: {path}", "success")
+            except Exception as e:
+                self.log(f"Error saving {path}: {e}", "error")
+        
+        # Update task status
+        for t in state["tasks"]:
+            if t.id == task.id:
+                t.status = TaskStatus.REVIEW_NEEDED
+                t.generated_code = json.dumps(files_data)
+                break
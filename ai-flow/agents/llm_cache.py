@@ -0,0 +1,150 @@
+"""
+AI Flow - LLM Response Cache
+Content-addressed, on-disk store of LLM responses with LRU eviction and TTL
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+
+CACHE_MODES = ("read", "write", "off")
+
+
+class LLMCache:
+    """
+    LLM responses in SQLite, keyed by a hash of everything that determines
+    the answer: provider, model, temperature, system prompt and user prompt.
+
+    Modes:
+        read   serve cached responses, call the LLM and store on a miss
+        write  always call the LLM and store (refresh) the response
+        off    neither read nor write
+
+    Only calls at or below `max_temperature` are cached, since replaying a
+    sampled answer of a creative agent would freeze it. Entries older than
+    `ttl_seconds` are misses; once the stored responses exceed `max_bytes`
+    the least recently used are evicted.
+    """
+
+    DB_NAME = "llm_responses.sqlite3"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        mode: str = "read",
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_temperature: float = 0.1,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode} (expected one of {', '.join(CACHE_MODES)})")
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds or None
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._conn = None
+        if mode == "off":
+            return
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / self.DB_NAME
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+        """)
+        self._conn.commit()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: Optional[float], system_prompt: str, user_prompt: str) -> str:
+        payload = json.dumps(
+            [provider, model, temperature, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+             hashlib.sha256(user_prompt.encode("utf-8")).hexdigest()],
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cacheable(self, temperature: Optional[float]) -> bool:
+        return self._conn is not None and (temperature is None or temperature <= self.max_temperature)
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached response for `key` in read mode, counting the hit or miss"""
+        if self._conn is None or self.mode != "read":
+            self.misses += 1
+            return None
+        row = self._conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, content: str, agent: str = "", model: str = "") -> None:
+        if self._conn is None:
+            return
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, agent, model, content, size, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, agent, model, content, len(content.encode("utf-8")), now, now),
+        )
+        self._conn.commit()
+        self._evict()
+
+    def invalidate(self, key: str) -> None:
+        """Forget a response, e.g. one the caller could not parse"""
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop expired responses, then the least recently used beyond max_bytes"""
+        removed = 0
+        if self.ttl_seconds:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            stale = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            removed += len(stale)
+        self._conn.commit()
+        self.evicted += removed
+
+    def summary(self) -> str:
+        if self.mode == "off":
+            return "off"
+        return f"{self.hits} hits, {self.misses} misses ({self.mode})"
@@ -0,0 +1,150 @@
+"""
+AI Flow - LLM Registry
+Process-wide config and LLM clients, shared by every agent
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from agents.rate_limiter import RateLimiter
+from agents.retry_policy import RetryPolicy
+
+
+_lock = threading.Lock()
+_configs: Dict[Path, dict] = {}
+_clients: Dict[Tuple, Any] = {}
+_limiters: Dict[str, RateLimiter] = {}
+_retry_policy: Optional[RetryPolicy] = None
+
+
+class RegistryStats:
+    """How often config and clients were built versus reused"""
+    config_loads = 0
+    config_hits = 0
+    clients_created = 0
+    client_hits = 0
+
+
+def load_config(config_path: str = "config/config.yaml") -> dict:
+    """
+    config.yaml parsed once per process. `config_path` is relative to the
+    ai-flow directory, as for agents. Callers must not mutate the result.
+    """
+    path = (Path(__file__).parent.parent / config_path).resolve()
+    with _lock:
+        if path in _configs:
+            RegistryStats.config_hits += 1
+            return _configs[path]
+        config = {}
+        if path.exists():
+            with open(path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+        RegistryStats.config_loads += 1
+        _configs[path] = config
+        return config
+
+
+def _client_spec(llm_config: dict) -> Tuple[str, dict]:
+    """(provider, constructor settings) of the configured LLM; the settings identify the client"""
+    provider = llm_config.get("provider", "gemini")
+    if provider == "ollama":
+        ollama_config = llm_config.get("ollama", {})
+        return provider, {
+            "base_url": ollama_config.get("base_url", "http://localhost:11434"),
+            "model": ollama_config.get("model", "qwen2.5-coder:7b"),
+            "temperature": ollama_config.get("temperature", 0.1),
+        }
+    if provider == "openrouter":
+        openrouter_config = llm_config.get("openrouter", {})
+        return provider, {
+            "base_url": openrouter_config.get("base_url", "https://openrouter.ai/api/v1"),
+            "model": openrouter_config.get("model", "google/gemini-2.0-flash-exp:free"),
+            "temperature": openrouter_config.get("temperature", 0.1),
+            "max_tokens": openrouter_config.get("max_tokens", 8192),
+        }
+    if provider == "gemini":
+        gemini_config = llm_config.get("gemini", {})
+        return provider, {
+            "model": gemini_config.get("model", "gemini-2.0-flash-exp"),
+            "temperature": gemini_config.get("temperature", 0.1),
+            "max_output_tokens": gemini_config.get("max_tokens", 8192),
+        }
+    # Fallback to Gemini
+    return "gemini", {"model": "gemini-2.0-flash-exp", "temperature": 0.1}
+
+
+def _build_client(provider: str, settings: dict):
+    if provider == "ollama":
+        from langchain_ollama import ChatOllama
+        return ChatOllama(**settings)
+    if provider == "openrouter":
+        from langchain_openai import ChatOpenAI
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            raise ValueError("OPENROUTER_API_KEY environment variable not set")
+        return ChatOpenAI(api_key=api_key, **settings)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(**settings)
+
+
+def get_llm(llm_config: dict):
+    """
+    The chat model for the `llm` section of the config. One client (and so
+    one keep-alive HTTP connection pool) exists per provider and settings;
+    every agent configured alike shares it.
+    """
+    provider, settings = _client_spec(llm_config)
+    key = (provider, tuple(sorted(settings.items())))
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            RegistryStats.client_hits += 1
+            return client
+        client = _build_client(provider, settings)
+        RegistryStats.clients_created += 1
+        _clients[key] = client
+        return client
+
+
+def get_rate_limiter(llm_config: dict) -> RateLimiter:
+    """
+    The rate limiter of the configured provider, from its `rate_limit`
+    section. Quotas are per provider account, so all agents and models of
+    a provider share one limiter.
+    """
+    provider, _ = _client_spec(llm_config)
+    with _lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = RateLimiter.from_config(provider, llm_config.get(provider, {}).get("rate_limit"))
+            _limiters[provider] = limiter
+        return limiter
+
+
+def rate_limiters() -> List[RateLimiter]:
+    """Every limiter in use, e.g. for the run summary"""
+    with _lock:
+        return list(_limiters.values())
+
+
+def get_retry_policy(llm_config: dict) -> RetryPolicy:
+    """The retry policy from the `retry` section; one per process, so its budget covers the whole run"""
+    global _retry_policy
+    with _lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy.from_config(llm_config.get("retry"))
+        return _retry_policy
+
+
+def reset() -> None:
+    """Forget cached config, clients, limiters and the retry policy, e.g. after config.yaml was edited"""
+    global _retry_policy
+    with _lock:
+        _configs.clear()
+        _clients.clear()
+        _limiters.clear()
+        _retry_policy = None
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 
 from agents.base_agent import BaseAgent
 from orchestrator.state import WorkflowState, UserStory, TaskPriority
+from rag.digests import DigestStore
 
 
 class UserStoriesOutput(BaseModel):
@@ -84,16 +85,27 @@ Example output:
         """Extract user stories from meeting notes"""
         self.log("Analyzing meeting notes and extracting user stories...")
         
-        # Truncate meeting notes if too long to avoid token limits
+        # Truncate meeting notes if too long to avoid token limits; a digest of
+        # the whole input keeps what the cut-off part defines
         meeting_notes = state['meeting_notes']
         if len(meeting_notes) > 15000:
-            meeting_notes = meeting_notes[:15000] + "\n\n[... truncated for brevity ...]"
+            digest_store = self.doc_indexer.digest_store if self.doc_indexer else DigestStore()
+            digest = digest_store.get("input", meeting_notes).render()
+            meeting_notes = (
+                meeting_notes[:15000]
+                + "\n\n[... truncated for brevity; digest of the full input follows ...]\n\n"
+                + digest
+            )
+        
+        doc_context = self.get_doc_context(meeting_notes)
+        if doc_context:
+            doc_context = f"\nRELEVANT REQUIREMENTS DOCUMENTATION:\n{doc_context}\n"
         
         user_prompt = f"""Analyze the following project documentation and extract user stories.
 
 PROJECT DOCUMENTATION:
 {meeting_notes}
-
+{doc_context}
 Extract the TOP 5 most important user stories for an MVP.
 Focus on core e-commerce features: authentication, products, cart, orders, payments.
 
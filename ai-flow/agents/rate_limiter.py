@@ -0,0 +1,278 @@
+"""
+AI Flow - LLM Rate Limiter
+Provider quotas enforced before a request is sent, with adaptive (AIMD) concurrency
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+from agents.retry_policy import is_rate_limit_error
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token count of a prompt (~4 characters per token)"""
+    return max(1, sum(len(text) for text in texts) // 4)
+
+
+class TokenBucket:
+    """
+    `limit` units per `period` seconds, refilled evenly and holding at most
+    `burst` (default: `limit`). `take` reserves its units at once, letting the level go
+    negative, and sleeps until the reservation is covered, so callers are
+    served in arrival order without a lock. A limit of 0 is unlimited.
+    """
+
+    def __init__(self, limit: float, period: float = 60.0, burst: Optional[float] = None):
+        self.limit = float(limit or 0)
+        self.rate = self.limit / period if self.limit else 0.0
+        self.capacity = float(min(burst, self.limit) if burst else self.limit)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units now; the seconds until they are actually available"""
+        if not self.limit:
+            return 0.0
+        self._refill()
+        # A single request larger than the bucket waits for a full bucket, not forever
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def adjust(self, amount: float) -> None:
+        """Charge (or refund, if negative) units after the fact, e.g. the actual token usage"""
+        if self.limit:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+    async def take(self, amount: float = 1) -> float:
+        delay = self.reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class AIMDController:
+    """
+    Concurrency limit adapted the way TCP adapts its window: additive
+    increase by `increase` per `limit` healthy calls, multiplicative
+    decrease by `decrease` on a 429 or a latency spike (more than
+    `latency_spike_factor` times the running average). Congestion seen by
+    calls sent before the last decrease is not counted again, so a burst of
+    429s halves the limit once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 8,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_spike_factor: float = 3.0,
+        latency_samples: int = 5,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_spike_factor = latency_spike_factor
+        self.latency_samples = latency_samples
+        self.in_flight = 0
+        self.latency_average: Optional[float] = None
+        self.healthy_calls = 0
+        self.decreases = 0
+        self.last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def slots(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.slots and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted a slot, but cancelled before using it
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.slots:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def on_success(self, sent: float, latency: float) -> None:
+        """A call sent at `sent` (time.monotonic) answered after `latency` seconds"""
+        average = self.latency_average
+        if (
+            average is not None
+            and self.latency_spike_factor
+            and self.healthy_calls >= self.latency_samples
+            and latency > average * self.latency_spike_factor
+        ):
+            self.on_congestion(sent)
+            return
+        self.healthy_calls += 1
+        self.latency_average = latency if average is None else 0.8 * average + 0.2 * latency
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+        self._wake()
+
+    def on_congestion(self, sent: float) -> None:
+        """A 429 or latency spike for a call sent at `sent`"""
+        if sent < self.last_decrease:
+            return
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+        self.last_decrease = time.monotonic()
+        self.decreases += 1
+
+
+@dataclass
+class RateLimiterStats:
+    requests: int = 0
+    waits: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    throttled: int = 0  # 429s the provider still returned
+
+    @property
+    def average_wait_seconds(self) -> float:
+        return self.wait_seconds / self.requests if self.requests else 0.0
+
+
+class RateLimiter:
+    """
+    One provider's quota, shared by every agent (see
+    llm_registry.get_rate_limiter): requests and tokens per minute and per
+    day as token buckets, plus an AIMD concurrency limit. A call holds a
+    concurrency slot from before its quota is taken until it returns; the
+    time spent waiting for both is the limiter wait.
+    """
+
+    def __init__(
+        self,
+        provider: str = "",
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        requests_per_day: int = 0,
+        tokens_per_day: int = 0,
+        burst: Optional[int] = None,
+        headroom: float = 0.05,
+        concurrency: Optional[AIMDController] = None,
+    ):
+        self.provider = provider
+        # Pacing right at the quota loses to clock skew against the provider's window
+        scale = 1.0 - headroom
+        # A full minute's requests at once could, with the refill, exceed a
+        # provider's sliding-window quota; by default a tenth may burst
+        burst = burst or max(1, int(requests_per_minute or 0) // 10)
+        self.request_buckets = [
+            TokenBucket(requests_per_minute * scale, 60, burst), TokenBucket(requests_per_day, 86400),
+        ]
+        self.token_buckets = [
+            TokenBucket(tokens_per_minute * scale, 60), TokenBucket(tokens_per_day, 86400),
+        ]
+        self.concurrency = concurrency or AIMDController()
+        self.held_until = 0.0
+        self.stats = RateLimiterStats()
+
+    @classmethod
+    def from_config(cls, provider: str, config: Optional[dict]) -> "RateLimiter":
+        """From an `llm.<provider>.rate_limit` section"""
+        config = config or {}
+        concurrency = config.get("concurrency", {}) or {}
+        return cls(
+            provider=provider,
+            requests_per_minute=config.get("requests_per_minute", 0),
+            tokens_per_minute=config.get("tokens_per_minute", 0),
+            requests_per_day=config.get("requests_per_day", 0),
+            tokens_per_day=config.get("tokens_per_day", 0),
+            burst=config.get("burst"),
+            headroom=config.get("headroom", 0.05),
+            concurrency=AIMDController(
+                initial=concurrency.get("initial", 4),
+                minimum=concurrency.get("min", 1),
+                maximum=concurrency.get("max", 8),
+                latency_spike_factor=concurrency.get("latency_spike_factor", 3.0),
+            ),
+        )
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 1):
+        """
+        Wait for a concurrency slot and quota for one request of about
+        `tokens` tokens. A rate-limit error raised inside shrinks the
+        concurrency limit, a normal exit lets it grow.
+        """
+        started = time.perf_counter()
+        await self.concurrency.acquire()
+        try:
+            delay = self.held_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            delay = 0.0
+            for bucket in self.request_buckets:
+                delay = max(delay, bucket.reserve(1))
+            for bucket in self.token_buckets:
+                delay = max(delay, bucket.reserve(tokens))
+            if delay:
+                await asyncio.sleep(delay)
+            self._record_wait(time.perf_counter() - started)
+            sent = time.monotonic()
+            try:
+                yield
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    self.stats.throttled += 1
+                    self.concurrency.on_congestion(sent)
+                elif isinstance(e, TimeoutError):
+                    self.concurrency.on_congestion(sent)  # an attempt timeout is the worst latency spike
+                raise
+            self.concurrency.on_success(sent, time.monotonic() - sent)
+        finally:
+            self.concurrency.release()
+
+    def hold(self, seconds: float) -> None:
+        """Send nothing for `seconds`, e.g. the Retry-After of a 429"""
+        self.held_until = max(self.held_until, time.monotonic() + seconds)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token buckets once the provider reported the real usage"""
+        if actual_tokens:
+            for bucket in self.token_buckets:
+                bucket.adjust(actual_tokens - estimated_tokens)
+
+    def _record_wait(self, seconds: float) -> None:
+        self.stats.requests += 1
+        self.stats.wait_seconds += seconds
+        self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, seconds)
+        if seconds >= 0.01:
+            self.stats.waits += 1
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{s.requests} requests, {s.waits} waited {s.wait_seconds:.1f}s "
+            f"(max {s.max_wait_seconds:.1f}s), {s.throttled} throttled, "
+            f"concurrency {self.concurrency.slots} ({self.concurrency.decreases} decreases)"
+        )
@@ -0,0 +1,258 @@
+"""
+AI Flow - LLM Retry Policy
+Error classification, Retry-After aware jittered backoff and a per-run retry budget
+"""
+
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+
+# Error kinds; the first four are retried, the rest fail at once
+RATE_LIMIT = "rate_limit"
+SERVER = "server"
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+AUTH = "auth"
+NOT_FOUND = "not_found"
+CONTEXT_LENGTH = "context_length"
+INVALID = "invalid"
+UNKNOWN = "unknown"  # not recognised as transient, e.g. a bug in a client wrapper
+
+RETRYABLE = frozenset({RATE_LIMIT, SERVER, TIMEOUT, CONNECTION})
+
+_CONTEXT_LENGTH_PATTERNS = (
+    "context length", "context_length", "context window", "maximum context",
+    "too many tokens", "prompt is too long", "input is too long",
+)
+_AUTH_PATTERNS = (
+    "api key", "api_key", "unauthorized", "unauthenticated", "permission denied",
+    "permission_denied", "forbidden", "authentication",
+)
+_SERVER_PATTERNS = ("overloaded", "unavailable", "internal error", "internal server error", "bad gateway")
+_CONNECTION_PATTERNS = ("connection", "connect error", "remote end closed", "server disconnected")
+# Transport error classes of httpx, openai and aiohttp, matched by name anywhere in the MRO
+_TRANSPORT_ERROR_TYPES = frozenset({
+    "TransportError", "NetworkError", "ProtocolError", "APIConnectionError",
+    "ClientConnectionError", "ServerDisconnectedError",
+})
+_RETRY_AFTER_MESSAGE = re.compile(
+    r"retry(?:[ _-]?after|[ _-]?delay| in)\D{0,24}?(\d+(?:\.\d+)?)\s*(ms|s|sec|seconds)?", re.IGNORECASE
+)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider error: openai/httpx/ollama `status_code`, google `code`"""
+    for owner in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "code"):
+            value = getattr(owner, attribute, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether a provider error means the quota was exceeded (HTTP 429)"""
+    message = str(error).lower()
+    return (
+        _status_code(error) == 429
+        or "429" in message or "rate limit" in message or "quota" in message
+        or "resource_exhausted" in message
+    )
+
+
+def classify_error(error: BaseException) -> str:
+    """The kind of an LLM call failure, from its status code, type and message"""
+    message = str(error).lower()
+    status = _status_code(error)
+    # Providers report an oversized prompt as 400 or 413; it is never worth retrying
+    if any(pattern in message for pattern in _CONTEXT_LENGTH_PATTERNS) or status == 413:
+        return CONTEXT_LENGTH
+    if is_rate_limit_error(error):
+        return RATE_LIMIT
+    if status in (401, 403) or any(pattern in message for pattern in _AUTH_PATTERNS):
+        return AUTH
+    if status == 404 or "not found" in message:
+        return NOT_FOUND
+    if status == 408 or isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "timed out" in message:
+        return TIMEOUT
+    if status is not None and status >= 500:
+        return SERVER
+    if status is not None and 400 <= status < 500:
+        return INVALID
+    if isinstance(error, ConnectionError) or any(
+        "Connect" in cls.__name__ or cls.__name__ in _TRANSPORT_ERROR_TYPES for cls in type(error).__mro__
+    ):
+        return CONNECTION
+    if any(pattern in message for pattern in _SERVER_PATTERNS):
+        return SERVER
+    if any(pattern in message for pattern in _CONNECTION_PATTERNS):
+        return CONNECTION
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return INVALID
+    # Anything not positively identified as transient fails fast instead of spending the budget
+    return UNKNOWN
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """A provider's hint of when to retry: Retry-After(-ms) headers, or a delay in the message"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            try:
+                return max(0.0, float(value) / 1000)
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if value is not None:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+    # Gemini puts it in the error text: "retry_delay { seconds: 23 }", "Please retry in 23.5s"
+    match = _RETRY_AFTER_MESSAGE.search(str(error))
+    if match:
+        seconds = float(match.group(1))
+        return seconds / 1000 if (match.group(2) or "").lower() == "ms" else seconds
+    return None
+
+
+@dataclass
+class RetryStats:
+    calls: int = 0
+    attempts: int = 0
+    retries: Dict[str, int] = field(default_factory=dict)  # kind -> retries
+    fatal: Dict[str, int] = field(default_factory=dict)  # kind -> calls failed without retry
+    exhausted: int = 0  # calls that ran out of attempts or budget
+    retry_after_hints: int = 0
+    wasted_seconds: float = 0.0  # failed attempts plus backoff
+
+    @property
+    def total_retries(self) -> int:
+        return sum(self.retries.values())
+
+
+class RetryPolicy:
+    """
+    How `BaseAgent.invoke_llm` retries. Rate limits, 5xx, timeouts and
+    connection errors are retried up to `max_attempts` per call with full
+    jitter backoff (uniform up to `base_delay * 2**n`, capped at
+    `max_delay`), or after the provider's Retry-After when it sends one
+    (giving up when that is beyond `max_delay`, e.g. a spent daily quota).
+    Auth, not found, context length, other invalid requests and errors
+    not recognised as transient fail at once. Each attempt is cut off after `attempt_timeout` seconds. All
+    agents draw on one budget of `budget_retries` retries and
+    `budget_seconds` of backoff per run; once it is spent calls fail on
+    their first error.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        attempt_timeout: Optional[float] = 300.0,
+        budget_retries: int = 40,
+        budget_seconds: float = 900.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout or None
+        self.budget_retries = budget_retries
+        self.budget_seconds = budget_seconds
+        self.backoff_seconds = 0.0
+        self.stats = RetryStats()
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "RetryPolicy":
+        """From the `llm.retry` section"""
+        config = config or {}
+        return cls(
+            max_attempts=config.get("max_attempts", 5),
+            base_delay=config.get("base_delay_seconds", 2.0),
+            max_delay=config.get("max_delay_seconds", 60.0),
+            attempt_timeout=config.get("attempt_timeout_seconds", 300.0),
+            budget_retries=config.get("budget_retries", 40),
+            budget_seconds=config.get("budget_seconds", 900.0),
+        )
+
+    @property
+    def budget_left(self) -> int:
+        return max(0, self.budget_retries - self.stats.total_retries)
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait before retry number `attempt` (1-based)"""
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            self.stats.retry_after_hints += 1
+            # A little jitter so callers told the same moment do not return together
+            return hint * random.uniform(1.0, 1.1)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def with_timeout(self, awaitable: Awaitable):
+        """`awaitable` cut off after the attempt timeout"""
+        if not self.attempt_timeout:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, self.attempt_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LLM call timed out after {self.attempt_timeout:g}s") from None
+
+    async def call(
+        self,
+        attempt: Callable[[], Awaitable],
+        on_retry: Optional[Callable[[str, int, float, BaseException], None]] = None,
+    ):
+        """
+        Run `attempt` until it succeeds or fails for good. `on_retry(kind,
+        attempt number, delay, error)` is called before each backoff.
+        """
+        self.stats.calls += 1
+        number = 0
+        while True:
+            number += 1
+            self.stats.attempts += 1
+            started = time.perf_counter()
+            try:
+                return await attempt()
+            except Exception as e:
+                self.stats.wasted_seconds += time.perf_counter() - started
+                kind = classify_error(e)
+                if kind not in RETRYABLE:
+                    self.stats.fatal[kind] = self.stats.fatal.get(kind, 0) + 1
+                    raise
+                delay = self.delay(number, e)
+                if (
+                    number >= self.max_attempts
+                    or delay > self.max_delay * 1.1  # told to come back later than we wait
+                    or not self.budget_left
+                    or self.backoff_seconds + delay > self.budget_seconds
+                ):
+                    self.stats.exhausted += 1
+                    raise
+                self.stats.retries[kind] = self.stats.retries.get(kind, 0) + 1
+                self.backoff_seconds += delay
+                self.stats.wasted_seconds += delay
+                if on_retry is not None:
+                    on_retry(kind, number, delay, e)
+                await asyncio.sleep(delay)
+
+    def summary(self) -> str:
+        s = self.stats
+        retries = ", ".join(f"{kind} {count}" for kind, count in sorted(s.retries.items()))
+        fatal = ", ".join(f"{kind} {count}" for kind, count in sorted(s.fatal.items()))
+        return (
+            f"{s.total_retries} retries" + (f" ({retries})" if retries else "")
+            + f", {sum(s.fatal.values())} fatal" + (f" ({fatal})" if fatal else "")
+            + f", {s.exhausted} exhausted, {s.wasted_seconds:.1f}s wasted, "
+            f"budget {self.budget_left}/{self.budget_retries} left"
+        )
@@ -0,0 +1,238 @@
+"""
+AI Flow - Semantic Response Cache
+Serves or drafts from earlier LLM responses to near-identical requests
+"""
+
+import asyncio
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.embeddings import EmbeddingProvider
+
+
+@dataclass
+class SemanticMatch:
+    """The most similar earlier response of the same agent and task type"""
+    response: str
+    similarity: float
+    latency_seconds: float  # what the original call took
+    served: bool  # above the serve threshold: returned as is; otherwise a draft
+
+
+@dataclass
+class SemanticCacheStats:
+    served: int = 0
+    drafted: int = 0
+    misses: int = 0
+    stored: int = 0
+    latency_saved_seconds: float = 0.0
+    lookup_seconds: float = 0.0
+
+    @property
+    def lookups(self) -> int:
+        return self.served + self.drafted + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.served + self.drafted) / self.lookups if self.lookups else 0.0
+
+
+class SemanticCache:
+    """
+    Earlier LLM responses indexed by an embedding of their request, for the
+    recurring task shapes exact-match caching misses ("Add X model to the
+    Prisma schema", "Create CRUD controller for Y").
+
+    A lookup embeds the request key (by default the start of the prompt) and
+    compares it with the stored requests of the same agent and task type.
+    At or above the agent's `serve_threshold` the stored response is
+    returned without a call; at or above `draft_threshold` it is handed to
+    the model as a draft to adapt. Only agents with an
+    `agents.<name>.semantic_cache` section (which may override both
+    thresholds) use the cache. With `lookups=False` responses are only
+    stored. Vectors live in SQLite and are searched in memory, one matrix
+    per agent, task type and embedding model. Output that is judged later
+    (the code agent's) is `stage`d and only stored on `commit`, once
+    review approved it.
+    """
+
+    DB_NAME = "semantic_responses.sqlite3"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        embedder: EmbeddingProvider,
+        serve_threshold: float = 0.98,
+        draft_threshold: float = 0.9,
+        lookups: bool = True,
+        max_key_chars: int = 4000,
+        draft_max_chars: int = 6000,
+        max_entries: int = 5000,
+    ):
+        self.embedder = embedder
+        self.serve_threshold = serve_threshold
+        self.draft_threshold = draft_threshold
+        self.lookups = lookups
+        self.max_key_chars = max_key_chars
+        self.draft_max_chars = draft_max_chars
+        self.max_entries = max_entries
+        self.stats = SemanticCacheStats()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / self.DB_NAME
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                agent TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                response TEXT NOT NULL,
+                latency REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_group ON entries (agent, task_type, model);
+        """)
+        self._conn.commit()
+        # (agent, task_type) -> (entry ids, unit vectors), loaded on first use
+        self._groups: Dict[Tuple[str, str], Tuple[List[int], np.ndarray]] = {}
+        # owner (e.g. task id) -> put() arguments of a response awaiting approval
+        self._staged: Dict[str, tuple] = {}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def thresholds(self, overrides: Optional[dict] = None) -> Tuple[float, float]:
+        """(serve, draft) thresholds, with an agent's overrides; above 1 turns that use off"""
+        overrides = overrides or {}
+        return (
+            overrides.get("serve_threshold", self.serve_threshold),
+            overrides.get("draft_threshold", self.draft_threshold),
+        )
+
+    def enabled_for(self, overrides: Optional[dict] = None) -> bool:
+        """Whether an agent with this `semantic_cache` section uses the cache; None (no section) opts out"""
+        return overrides is not None and min(self.thresholds(overrides)) <= 1.0
+
+    def _group(self, agent: str, task_type: str) -> Tuple[List[int], np.ndarray]:
+        key = (agent, task_type)
+        if key not in self._groups:
+            rows = self._conn.execute(
+                "SELECT id, vector FROM entries WHERE agent = ? AND task_type = ? AND model = ?",
+                (agent, task_type, self.embedder.name),
+            ).fetchall()
+            vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]) if rows else None
+            self._groups[key] = ([row[0] for row in rows], vectors)
+        return self._groups[key]
+
+    async def embed(self, key_text: str) -> np.ndarray:
+        """Unit vector of a request key, embedded off the event loop"""
+        vector = np.asarray(
+            (await asyncio.to_thread(self.embedder.embed_queries, [key_text[:self.max_key_chars]]))[0],
+            dtype=np.float32,
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self, agent: str, task_type: str, vector: np.ndarray, overrides: Optional[dict] = None
+    ) -> Optional[SemanticMatch]:
+        """Best earlier response above the agent's draft threshold, counting the outcome"""
+        if not self.lookups:
+            return None
+        started = time.perf_counter()
+        serve_threshold, draft_threshold = self.thresholds(overrides)
+        ids, vectors = self._group(agent, task_type)
+        match = None
+        if vectors is not None:
+            scores = vectors @ vector
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity >= min(serve_threshold, draft_threshold):
+                response, latency = self._conn.execute(
+                    "SELECT response, latency FROM entries WHERE id = ?", (ids[best],)
+                ).fetchone()
+                served = similarity >= serve_threshold
+                if not served:
+                    response = response[:self.draft_max_chars]
+                match = SemanticMatch(response, similarity, latency, served)
+                self._conn.execute("UPDATE entries SET last_used = ? WHERE id = ?", (time.time(), ids[best]))
+                self._conn.commit()
+        if match is None:
+            self.stats.misses += 1
+        elif match.served:
+            self.stats.served += 1
+            self.stats.latency_saved_seconds += match.latency_seconds
+        else:
+            self.stats.drafted += 1
+        self.stats.lookup_seconds += time.perf_counter() - started
+        return match
+
+    def put(self, agent: str, task_type: str, vector: np.ndarray, response: str, latency_seconds: float) -> None:
+        cursor = self._conn.execute(
+            "INSERT INTO entries (agent, task_type, model, vector, response, latency, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (agent, task_type, self.embedder.name, vector.astype(np.float32).tobytes(),
+             response, latency_seconds, time.time()),
+        )
+        evicted = self._conn.execute(
+            "DELETE FROM entries WHERE id NOT IN (SELECT id FROM entries ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        ).rowcount
+        self._conn.commit()
+        self.stats.stored += 1
+        if evicted:
+            self._groups.clear()
+            return
+        if (agent, task_type) not in self._groups:
+            return  # loaded with the new entry on first lookup
+        ids, vectors = self._groups[(agent, task_type)]
+        self._groups[(agent, task_type)] = (
+            ids + [cursor.lastrowid],
+            vector[None, :] if vectors is None else np.vstack([vectors, vector]),
+        )
+
+    def stage(
+        self, owner: str, agent: str, task_type: str, vector: np.ndarray, response: str, latency_seconds: float
+    ) -> None:
+        """Hold a response until `commit(owner)`; a later stage for the same owner replaces it"""
+        self._staged[owner] = (agent, task_type, vector, response, latency_seconds)
+
+    def commit(self, owner: str) -> bool:
+        """Store the response staged for `owner`, now that it was accepted"""
+        staged = self._staged.pop(owner, None)
+        if staged is None:
+            return False
+        self.put(*staged)
+        return True
+
+    def discard(self, owner: str) -> None:
+        """Drop the response staged for `owner`, e.g. after it was rejected"""
+        self._staged.pop(owner, None)
+
+    @staticmethod
+    def draft_prompt(user_prompt: str, match: SemanticMatch) -> str:
+        """The prompt with a near-duplicate's response attached as a few-shot draft"""
+        return (
+            f"{user_prompt}\n\n"
+            f"DRAFT FROM A SIMILAR EARLIER REQUEST (similarity {match.similarity:.2f}):\n"
+            "Reuse its structure where it fits, but adapt every name, field and detail to this request.\n"
+            f"{match.response}"
+        )
+
+    def summary(self) -> str:
+        s = self.stats
+        if not self.lookups:
+            return f"{s.stored} stored (lookups off)"
+        return (
+            f"{s.served} served, {s.drafted} drafts, {s.misses} misses "
+            f"({s.hit_rate:.0%} hit rate, ~{s.latency_saved_seconds:.0f}s saved)"
+        )
@@ -12,6 +12,10 @@ from agents.base_agent import BaseAgent
 from orchestrator.state import WorkflowState
 
 
+# Inputs handed to the transcription model; anything else is treated as text
+MEDIA_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.mp4', '.webm', '.ogg')
+
+
 class TranscriberAgent(BaseAgent):
     """
     Transcriber Agent
@@ -115,7 +119,7 @@ Provide the transcript in the following format:
         meeting_input = state.get("meeting_notes", "")
         
         # Check if it's a file path
-        if meeting_input.endswith(('.mp3', '.wav', '.m4a', '.mp4', '.webm', '.ogg')):
+        if meeting_input.endswith(MEDIA_EXTENSIONS):
             try:
                 self.log(f"Detected audio/video file: {meeting_input}")
                 transcript = await self.transcribe_file(meeting_input)
@@ -0,0 +1,4 @@
+"""
+AI Flow - Benchmarks package
+Run from the ai-flow directory, e.g. `python -m benchmarks.bench_search`
+"""
@@ -0,0 +1,70 @@
+"""
+AI Flow - ANN benchmark
+Recall@k and latency of the IVF index against exact brute-force search.
+
+Usage:
+    python -m benchmarks.bench_ann --chunks 200000 --dim 768 --nprobe 4 8 16 32
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from rag.ann import IVFIndex
+from rag.indexer import top_k_indices
+from rag.vector_store import normalize_rows
+
+
+def clustered_vectors(
+    rng: np.random.Generator, centers: np.ndarray, count: int, spread: float
+) -> np.ndarray:
+    """Gaussian blobs around topic centers on the unit sphere; real code embeddings cluster similarly"""
+    labels = rng.integers(0, len(centers), count)
+    noise = rng.standard_normal((count, centers.shape[1])).astype(np.float32) * spread / np.sqrt(centers.shape[1])
+    return normalize_rows(centers[labels] + noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF ANN search against exact search")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = auto (~4 * sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--clusters", type=int, default=500, help="Synthetic topic clusters")
+    parser.add_argument("--spread", type=float, default=0.7, help="Noise norm around each topic center")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    centers = normalize_rows(rng.standard_normal((args.clusters, args.dim)))
+    vectors = clustered_vectors(rng, centers, args.chunks, args.spread)
+    queries = clustered_vectors(rng, centers, args.queries, args.spread)
+    
+    start = time.perf_counter()
+    exact = [top_k_indices(vectors @ q, args.top_k) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    
+    start = time.perf_counter()
+    index = IVFIndex.train(vectors, nlist=args.nlist)
+    index.add(vectors, np.arange(args.chunks))
+    build_seconds = time.perf_counter() - start
+    
+    print(f"Chunks: {args.chunks} x {args.dim} dims, nlist={index.nlist}, top_k={args.top_k}")
+    print(f"IVF build: {build_seconds:.2f} s")
+    print(f"{'search':>12} {'recall@k':>10} {'ms/query':>10} {'speedup':>9}")
+    print(f"{'exact':>12} {1.0:>10.3f} {exact_ms:>10.2f} {1.0:>8.1f}x")
+    
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        results = [index.search(vectors, q, args.top_k, nprobe=nprobe)[0] for q in queries]
+        ann_ms = (time.perf_counter() - start) * 1000 / args.queries
+        
+        hits = sum(len(set(rows.tolist()) & set(truth.tolist())) for (rows, _), truth in zip(results, exact))
+        recall = hits / (args.queries * args.top_k)
+        print(f"{'nprobe=' + str(nprobe):>12} {recall:>10.3f} {ann_ms:>10.2f} {exact_ms / ann_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+AI Flow - Chunker comparison
+Chunk counts and embedding cost of the old line-window chunker vs. SyntaxChunker
+on a real source tree.
+
+Usage:
+    python -m benchmarks.bench_chunker --path ../some-project/src
+"""
+
+import argparse
+import ast
+import hashlib
+import math
+import time
+from typing import Dict, List, Tuple
+
+from rag.chunker import SyntaxChunker
+from rag.embeddings import GEMINI_MAX_BATCH
+from rag.indexer import CodebaseIndexer
+from rag.walker import DirectoryWalker
+
+
+def legacy_chunk(content: str, chunk_size: int, chunk_overlap: int) -> List[Tuple[int, int, str]]:
+    """The line-window chunker CodebaseIndexer used before SyntaxChunker"""
+    chunks = []
+    lines = content.split('\n')
+    current_chunk = []
+    current_start = 1
+    current_size = 0
+    for i, line in enumerate(lines, 1):
+        line_size = len(line) + 1
+        if current_size + line_size > chunk_size and current_chunk:
+            chunks.append((current_start, i - 1, '\n'.join(current_chunk)))
+            overlap_lines = max(0, len(current_chunk) - chunk_overlap // 50)
+            current_chunk = current_chunk[overlap_lines:]
+            current_start = i - len(current_chunk)
+            current_size = sum(len(l) + 1 for l in current_chunk)
+        current_chunk.append(line)
+        current_size += line_size
+    if current_chunk:
+        chunks.append((current_start, len(lines), '\n'.join(current_chunk)))
+    return chunks
+
+
+def python_definitions(content: str) -> List[Tuple[int, int]]:
+    """Line ranges of functions and classes, to count how many a chunker cuts"""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return []
+    return [
+        (node.lineno, node.end_lineno)
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        and node.end_lineno - node.lineno < 40
+    ]
+
+
+def summarize(name: str, chunks: Dict[str, List[Tuple[int, int, str]]], cut: int, seconds: float) -> dict:
+    texts = [f"File: {path}\n{text}" for path, file_chunks in chunks.items() for _, _, text in file_chunks]
+    unique = {hashlib.md5(t.encode()).hexdigest(): t for t in texts}
+    chars = sum(len(t) for t in unique.values())
+    return {
+        "name": name,
+        "chunks": len(texts),
+        "unique": len(unique),
+        "chars": chars,
+        # ~4 characters per token is the usual estimate for code
+        "tokens": chars // 4,
+        "requests": math.ceil(len(unique) / GEMINI_MAX_BATCH),
+        "cut": cut,
+        "ms": seconds * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare line-window and syntax-aware chunking")
+    parser.add_argument("--path", default=".", help="Source tree to chunk")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    walker = DirectoryWalker(CodebaseIndexer.SUPPORTED_EXTENSIONS, CodebaseIndexer.IGNORE_DIRS)
+    files = {}
+    for entry in walker.walk(args.path):
+        files[entry.relative_path] = entry.path.read_text(encoding='utf-8', errors='ignore')
+
+    definitions = {path: python_definitions(text) for path, text in files.items() if path.endswith('.py')}
+
+    def count_cut(chunks: Dict[str, List[Tuple[int, int, str]]]) -> int:
+        """Small functions/classes not contained in any single chunk"""
+        cut = 0
+        for path, ranges in definitions.items():
+            for start, end in ranges:
+                if not any(s <= start and end <= e for s, e, _ in chunks[path]):
+                    cut += 1
+        return cut
+
+    started = time.perf_counter()
+    legacy = {path: legacy_chunk(text, args.chunk_size, args.chunk_overlap) for path, text in files.items()}
+    legacy_seconds = time.perf_counter() - started
+
+    chunker = SyntaxChunker(args.chunk_size, args.chunk_overlap)
+    started = time.perf_counter()
+    syntax = {
+        path: [(c.start_line, c.end_line, c.content) for c in chunker.chunk(text, path)]
+        for path, text in files.items()
+    }
+    syntax_seconds = time.perf_counter() - started
+
+    rows = [
+        summarize("line windows", legacy, count_cut(legacy), legacy_seconds),
+        summarize("syntax-aware", syntax, count_cut(syntax), syntax_seconds),
+    ]
+    total_defs = sum(len(r) for r in definitions.values())
+
+    print(f"Files: {len(files)} ({len(definitions)} Python, {total_defs} small definitions)")
+    print(f"{'':14}{'chunks':>8}{'unique':>8}{'chars':>10}{'~tokens':>9}{'requests':>9}{'defs cut':>9}{'ms':>8}")
+    for r in rows:
+        print(f"{r['name']:14}{r['chunks']:8d}{r['unique']:8d}{r['chars']:10d}{r['tokens']:9d}"
+              f"{r['requests']:9d}{r['cut']:9d}{r['ms']:8.1f}")
+    before, after = rows
+    if before["tokens"]:
+        print(f"Embedding tokens: {100 * (after['tokens'] - before['tokens']) / before['tokens']:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
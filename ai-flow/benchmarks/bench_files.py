@@ -0,0 +1,91 @@
+"""
+AI Flow - Two-stage file -> chunk search benchmark
+Latency, recall@k against exact chunk search, and how often the file a query
+is about shows up in the results, on a synthetic repo of files made of chunks.
+
+Usage:
+    python -m benchmarks.bench_files --files 20000 --chunks-per-file 25 --top-files 10 20 50
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from rag.file_index import FileIndex
+from rag.indexer import top_k_indices
+from rag.vector_store import normalize_rows
+
+
+def synthetic_repo(
+    rng: np.random.Generator, files: int, chunks_per_file: int, dim: int, modules: int, spread: float
+):
+    """
+    Files belong to modules and chunks to files; each level adds noise around
+    its parent's topic. Chunk counts per file vary (1 to 2x the mean).
+    """
+    modules_topics = normalize_rows(rng.standard_normal((modules, dim)))
+    file_module = rng.integers(0, modules, files)
+    file_topics = normalize_rows(modules_topics[file_module] + rng.standard_normal((files, dim)) * spread / np.sqrt(dim))
+    counts = rng.integers(1, 2 * chunks_per_file, files)
+    path_ids = np.repeat(np.arange(files), counts)
+    noise = rng.standard_normal((len(path_ids), dim)).astype(np.float32) * spread / np.sqrt(dim)
+    vectors = normalize_rows(file_topics[path_ids] + noise)
+    return file_topics, path_ids, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark two-stage file -> chunk search")
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--top-files", type=int, nargs="+", default=[5, 10, 20, 50])
+    parser.add_argument("--modules", type=int, default=300, help="Synthetic modules (groups of related files)")
+    parser.add_argument("--spread", type=float, default=1.0, help="Noise norm at each level")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    file_topics, path_ids, vectors = synthetic_repo(
+        rng, args.files, args.chunks_per_file, args.dim, args.modules, args.spread
+    )
+    # Each query is about one file, phrased differently from any of its chunks
+    targets = rng.integers(0, args.files, args.queries)
+    queries = normalize_rows(
+        file_topics[targets] + rng.standard_normal((args.queries, args.dim)) * args.spread / np.sqrt(args.dim)
+    )
+
+    start = time.perf_counter()
+    exact = [top_k_indices(vectors @ q, args.top_k) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    start = time.perf_counter()
+    index = FileIndex.build(vectors, path_ids, np.ones(len(path_ids), dtype=bool), args.files)
+    build_seconds = time.perf_counter() - start
+
+    def describe(results):
+        target_hits = sum(t in set(path_ids[rows].tolist()) for rows, t in zip(results, targets))
+        distinct = np.mean([len(set(path_ids[rows].tolist())) for rows in results])
+        return target_hits / args.queries, distinct
+
+    print(f"Chunks: {len(vectors)} in {args.files} files x {args.dim} dims, top_k={args.top_k}")
+    print(f"File index build: {build_seconds:.2f} s ({index.vectors.nbytes / 2**20:.1f} MB)")
+    print(f"{'search':>14} {'recall@k':>9} {'file hit':>9} {'files/k':>8} {'scored':>8} {'ms/query':>9} {'speedup':>8}")
+    hit, distinct = describe(exact)
+    print(f"{'exact':>14} {1.0:>9.3f} {hit:>9.2f} {distinct:>8.1f} {len(vectors):>8d} {exact_ms:>9.2f} {1.0:>7.1f}x")
+
+    for top_files in args.top_files:
+        start = time.perf_counter()
+        results = [index.search(vectors, q, args.top_k, top_files=top_files)[0] for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        rows = [r for r, _ in results]
+        recall = sum(len(set(r.tolist()) & set(t.tolist())) for r, t in zip(rows, exact)) / (args.queries * args.top_k)
+        hit, distinct = describe(rows)
+        scored = args.files + top_files * args.chunks_per_file
+        print(f"{'top_files=' + str(top_files):>14} {recall:>9.3f} {hit:>9.2f} {distinct:>8.1f} "
+              f"{scored:>8d} {ms:>9.2f} {exact_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+AI Flow - Quantization benchmark
+Memory, latency and recall@k of int8 / binary / PCA-reduced first-pass search
+with exact float rescoring, against brute-force float32 search.
+
+Usage:
+    python -m benchmarks.bench_quant --chunks 200000 --dim 768 --rescore 1 10 50
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import clustered_vectors
+from rag.indexer import top_k_indices
+from rag.quantization import QuantizedIndex
+from rag.vector_store import normalize_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized search against exact search")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--pca-dim", type=int, default=256)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 10, 50],
+                        help="Candidates rescored, as multiples of top_k (1 = compressed ranking only)")
+    parser.add_argument("--clusters", type=int, default=500, help="Synthetic topic clusters")
+    parser.add_argument("--spread", type=float, default=0.7, help="Noise norm around each topic center")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = normalize_rows(rng.standard_normal((args.clusters, args.dim)))
+    vectors = clustered_vectors(rng, centers, args.chunks, args.spread)
+    queries = clustered_vectors(rng, centers, args.queries, args.spread)
+    ids = np.arange(args.chunks)
+
+    start = time.perf_counter()
+    exact = [top_k_indices(vectors @ q, args.top_k) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    # search_many scores a whole batch of queries (e.g. a task plan) at once
+    start = time.perf_counter()
+    top_k_indices(queries @ vectors.T, args.top_k)
+    exact_batch_ms = (time.perf_counter() - start) * 1000 / args.queries
+    float_mb = vectors.nbytes / 2**20
+
+    print(f"Chunks: {args.chunks} x {args.dim} dims, top_k={args.top_k}")
+    print(f"{'mode':>14} {'build s':>8} {'scan MB':>9} {'ratio':>6} {'rescore':>8} {'recall@k':>9} "
+          f"{'ms/query':>9} {'batched':>8}")
+    print(f"{'float32':>14} {'':>8} {float_mb:>9.1f} {1.0:>5.0f}x {'':>8} {1.0:>9.3f} "
+          f"{exact_ms:>9.2f} {exact_batch_ms:>8.2f}")
+
+    configs = [
+        ("int8", "int8", 0),
+        (f"int8+pca{args.pca_dim}", "int8", args.pca_dim),
+        ("binary", "binary", 0),
+        (f"binary+pca{args.pca_dim}", "binary", args.pca_dim),
+    ]
+    for name, mode, pca_dim in configs:
+        start = time.perf_counter()
+        index = QuantizedIndex.build(vectors, ids, mode=mode, pca_dim=pca_dim)
+        build_seconds = time.perf_counter() - start
+        scan_mb = index.codes.nbytes / 2**20
+
+        for rescore in args.rescore:
+            start = time.perf_counter()
+            results = [index.search(vectors, q, args.top_k, rescore=rescore)[0] for q in queries]
+            ms = (time.perf_counter() - start) * 1000 / args.queries
+            start = time.perf_counter()
+            index.search(vectors, queries, args.top_k, rescore=rescore)
+            batch_ms = (time.perf_counter() - start) * 1000 / args.queries
+            hits = sum(len(set(rows.tolist()) & set(truth.tolist())) for (rows, _), truth in zip(results, exact))
+            recall = hits / (args.queries * args.top_k)
+            print(f"{name:>14} {build_seconds:>8.2f} {scan_mb:>9.1f} {float_mb / scan_mb:>5.0f}x "
+                  f"{rescore:>8d} {recall:>9.3f} {ms:>9.2f} {batch_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
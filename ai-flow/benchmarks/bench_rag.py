@@ -0,0 +1,293 @@
+"""
+AI Flow - RAG scaling benchmark
+Builds CodebaseIndexer and DocumentIndexer indexes over synthetic corpora of
+growing size (benchmarks/corpus.py) with the deterministic HashingEmbedder and
+reports walk time, chunking throughput, build time, memory, query latency
+percentiles and recall as JSON, optionally compared against a stored baseline.
+
+Usage:
+    python -m benchmarks.bench_rag --chunks 10000 100000 --json results.json
+    python -m benchmarks.bench_rag --chunks 10000 --baseline benchmarks/baselines/bench_rag.json
+    python -m benchmarks.bench_rag --chunks 1000000 --ann --quantization int8
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import Query, generate_corpus
+from rag.embeddings import HashingEmbedder
+from rag.indexer import CodebaseIndexer, DocumentIndexer, top_k_indices
+from rag.walker import DirectoryWalker
+
+
+# Metric name -> True when larger is better; metrics not listed are informational
+DIRECTIONS = {
+    "walk_seconds": False,
+    "chunk_mb_per_second": True,
+    "chunks_per_second": True,
+    "index_seconds": False,
+    "embed_seconds": False,
+    "load_seconds": False,
+    "index_mb": False,
+    "peak_rss_mb": False,
+    "query_p50_ms": False,
+    "query_p95_ms": False,
+    "query_p99_ms": False,
+    "recall_at_k": True,
+    "mrr": True,
+    "recall_vs_exact": True,
+    "docs_index_seconds": False,
+    "docs_query_p50_ms": False,
+    "docs_query_p95_ms": False,
+    "docs_recall_at_k": True,
+    "docs_mrr": True,
+}
+
+# Changes smaller than this are timer noise, whatever their relative size
+NOISE_FLOOR = {"_ms": 0.5, "_seconds": 0.25}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def directory_mb(path: Path) -> float:
+    return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file()) / 2**20
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+def bench_walk_and_chunk(root: Path, indexer: CodebaseIndexer) -> dict:
+    """Walk alone, then read + chunk every selected file (no embedding, no store)"""
+    walker = DirectoryWalker(CodebaseIndexer.SUPPORTED_EXTENSIONS, CodebaseIndexer.IGNORE_DIRS, use_git=False)
+    start = time.perf_counter()
+    entries = list(walker.walk(str(root)))
+    walk_seconds = time.perf_counter() - start
+
+    total_bytes = chunks = 0
+    start = time.perf_counter()
+    for entry in entries:
+        content = Path(entry.path).read_text(encoding='utf-8')
+        total_bytes += len(content)
+        chunks += len(indexer.chunker.chunk(content, entry.relative_path))
+    chunk_seconds = time.perf_counter() - start
+    return {
+        "files": len(entries),
+        "chunks": chunks,
+        "walk_seconds": round(walk_seconds, 4),
+        "chunk_seconds": round(chunk_seconds, 4),
+        "chunks_per_second": round(chunks / chunk_seconds),
+        "chunk_mb_per_second": round(total_bytes / 2**20 / chunk_seconds, 3),
+    }
+
+
+def reciprocal_rank(paths: List[str], target: str) -> float:
+    return next((1.0 / rank for rank, path in enumerate(paths, 1) if path == target), 0.0)
+
+
+def timed(search, text: str, repeat: int):
+    """Result of search(text) and its best wall time over `repeat` calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = search(text)
+        best = min(best, time.perf_counter() - start)
+    return results, best
+
+
+def bench_code_search(
+    indexer: CodebaseIndexer, queries: List[Query], top_k: int, mode: str, repeat: int = 1
+) -> dict:
+    """
+    Per-query latency, recall@k and mean reciprocal rank of the target file,
+    and, for approximate vector search, agreement with exact search
+    """
+    latencies, ranks = [], []
+    approximate = mode == "vector" and (indexer.ann or indexer.quantized or indexer.files)
+    agreement = []
+    for query in queries:
+        results, seconds = timed(lambda text: indexer.search(text, top_k, mode=mode), query.text, repeat)
+        latencies.append(seconds)
+        ranks.append(reciprocal_rank([chunk.file_path for chunk in results], query.target))
+        if approximate:
+            exact = top_k_indices(indexer.store.scores(indexer._embed_queries([query.text]))[0], top_k)
+            expected = {(c.file_path, c.start_line) for c in (indexer._chunk_at(row) for row in exact)}
+            found = {(c.file_path, c.start_line) for c in results}
+            agreement.append(len(expected & found) / max(1, len(expected)))
+    stats = {f"query_{k}": v for k, v in percentiles(latencies).items()}
+    stats["recall_at_k"] = round(float(np.mean(np.asarray(ranks) > 0)), 4)
+    stats["mrr"] = round(float(np.mean(ranks)), 4)
+    if agreement:
+        stats["recall_vs_exact"] = round(float(np.mean(agreement)), 4)
+    return stats
+
+
+def bench_docs(docs_dir: Path, queries: List[Query], top_k: int, repeat: int = 1) -> dict:
+    indexer = DocumentIndexer()
+    start = time.perf_counter()
+    files = indexer.index_docs_directory(str(docs_dir))
+    index_seconds = time.perf_counter() - start
+    latencies, ranks = [], []
+    for query in queries:
+        sections, seconds = timed(lambda text: indexer.search(text, top_k), query.text, repeat)
+        latencies.append(seconds)
+        ranks.append(reciprocal_rank([section.filename for section in sections], query.target))
+    stats = {
+        "docs_files": files,
+        "docs_sections": len(indexer.sections),
+        "docs_index_seconds": round(index_seconds, 4),
+    }
+    stats.update({f"docs_query_{k}": v for k, v in percentiles(latencies).items()})
+    stats["docs_recall_at_k"] = round(float(np.mean(np.asarray(ranks) > 0)), 4)
+    stats["docs_mrr"] = round(float(np.mean(ranks)), 4)
+    return stats
+
+
+def run_size(chunks: int, args: argparse.Namespace) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="bench-rag-"))
+    root = workdir / "repo"
+    try:
+        start = time.perf_counter()
+        queries = generate_corpus(root, chunks, args.queries, args.seed)
+        generate_seconds = time.perf_counter() - start
+        code_queries = [q for q in queries if q.kind == "code"]
+        doc_queries = [q for q in queries if q.kind == "docs"]
+
+        indexer = CodebaseIndexer(
+            embedder=HashingEmbedder(args.dim),
+            embedding_batch_size=HashingEmbedder.max_batch,
+            index_dir=str(workdir / "index"),
+            search_mode=args.mode,
+            walker_config={"use_git": False},
+            ann_config={"enabled": True, "min_vectors": 0} if args.ann else None,
+            quantization_config={"mode": args.quantization} if args.quantization != "none" else None,
+            hierarchical_config={"enabled": True, "min_files": 0} if args.hierarchical else None,
+        )
+        result = {"chunks_target": chunks, "generate_seconds": round(generate_seconds, 3)}
+        result.update(bench_walk_and_chunk(root, indexer))
+
+        start = time.perf_counter()
+        indexer.index_directory(str(root))
+        result["index_seconds"] = round(time.perf_counter() - start, 4)
+        start = time.perf_counter()
+        asyncio.run(indexer.generate_embeddings())
+        result["embed_seconds"] = round(time.perf_counter() - start, 4)
+        result["indexed_chunks"] = indexer.store.count
+        result["index_mb"] = round(directory_mb(indexer.store.directory), 3)
+
+        # Reopen from disk, as a later run would
+        reopened = CodebaseIndexer(
+            embedder=indexer.embedder,
+            index_dir=indexer.index_dir,
+            search_mode=args.mode,
+            ann_config=indexer.ann_config,
+            quantization_config=indexer.quantization_config,
+            hierarchical_config=indexer.hierarchical_config,
+        )
+        start = time.perf_counter()
+        reopened.load_index(str(root))
+        result["load_seconds"] = round(time.perf_counter() - start, 4)
+
+        result.update(bench_code_search(reopened, code_queries, args.top_k, args.mode, args.repeat))
+        result.update(bench_docs(root / "docs", doc_queries, args.top_k, args.repeat))
+        result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        return result
+    finally:
+        if args.keep:
+            print(f"Kept corpus and index in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """Relative change of every directional metric against the baseline run of the same size"""
+    regressions = []
+    previous = {run["chunks_target"]: run for run in baseline.get("runs", [])}
+    for run in results:
+        base = previous.get(run["chunks_target"])
+        if base is None:
+            print(f"\nNo baseline run for {run['chunks_target']} chunks")
+            continue
+        print(f"\nvs. baseline ({run['chunks_target']} chunks, tolerance {tolerance:.0%}):")
+        for metric, higher_is_better in DIRECTIONS.items():
+            if metric not in run or metric not in base or not base[metric]:
+                continue
+            change = (run[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            floor = next((v for suffix, v in NOISE_FLOOR.items() if metric.endswith(suffix)), 0.0)
+            flag = "REGRESSION" if worse > tolerance and abs(run[metric] - base[metric]) > floor else ""
+            print(f"  {metric:<22} {base[metric]:>12} -> {run[metric]:>12} {change:>+8.1%} {flag}")
+            if flag:
+                regressions.append(f"{run['chunks_target']}:{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG indexing and search at several corpus sizes")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000], help="Corpus sizes in code chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Code queries (and as many docs queries)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384, help="HashingEmbedder dimensions")
+    parser.add_argument("--mode", choices=sorted(CodebaseIndexer.SEARCH_MODES), default="hybrid")
+    parser.add_argument("--ann", action="store_true", help="Enable the IVF index (rag.ann)")
+    parser.add_argument("--quantization", choices=["none", "int8", "binary"], default="none")
+    parser.add_argument("--hierarchical", action="store_true", help="Enable file -> chunk search")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per query (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against results previously written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Relative change counted as a regression")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpus and index")
+    args = parser.parse_args()
+
+    runs = []
+    for chunks in sorted(args.chunks):
+        print(f"Benchmarking {chunks} chunks...")
+        run = run_size(chunks, args)
+        runs.append(run)
+        print(json.dumps(run, indent=2))
+
+    report = {
+        "benchmark": "bench_rag",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.machine(),
+        },
+        "settings": {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "keep")},
+        "runs": runs,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get("settings", {}).get("mode") not in (None, args.mode):
+            print(f"Warning: baseline was run with --mode {baseline['settings']['mode']}")
+        regressions = compare(runs, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
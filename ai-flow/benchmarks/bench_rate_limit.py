@@ -0,0 +1,111 @@
+"""
+AI Flow - Rate limiter benchmark
+Concurrent LLM calls against a simulated provider that answers 429 beyond its
+requests-per-window quota or its concurrency, with backoff-only retries (the
+RetryPolicy of invoke_llm) versus the shared rate limiter in front of them.
+Time is scaled: a quota window of --window seconds stands for a minute.
+
+Usage:
+    python -m benchmarks.bench_rate_limit --calls 60 --quota 15 --window 2 --parallel 4
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from agents.rate_limiter import AIMDController, RateLimiter
+from agents.retry_policy import RetryPolicy, is_rate_limit_error
+
+
+class SimulatedProvider:
+    """Sliding-window request quota and a cap on requests in flight"""
+
+    def __init__(self, quota: int, window: float, parallel: int, latency: float):
+        self.quota = quota
+        self.window = window
+        self.parallel = parallel
+        self.latency = latency
+        self.sent: deque = deque()
+        self.in_flight = 0
+        self.ok = 0
+        self.rejected = 0
+
+    async def call(self) -> None:
+        now = time.monotonic()
+        while self.sent and now - self.sent[0] > self.window:
+            self.sent.popleft()
+        if len(self.sent) >= self.quota or self.in_flight >= self.parallel:
+            self.rejected += 1
+            raise RuntimeError("Error code: 429 - rate limit exceeded")
+        self.sent.append(now)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        finally:
+            self.in_flight -= 1
+        self.ok += 1
+
+
+async def run(args, limiter=None) -> dict:
+    provider = SimulatedProvider(args.quota, args.window, args.parallel, args.latency)
+    # Retries as in BaseAgent.invoke_llm, with the backoff scaled like the window
+    policy = RetryPolicy(
+        max_attempts=args.attempts, base_delay=args.window / 60, max_delay=args.window,
+        attempt_timeout=None, budget_retries=10 ** 6, budget_seconds=float("inf"),
+    )
+
+    async def attempt():
+        if limiter is None:
+            return await provider.call()
+        async with limiter.limit():
+            return await provider.call()
+
+    async def one_call():
+        try:
+            await policy.call(attempt)
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(args.calls)))
+    return {
+        "seconds": time.perf_counter() - started,
+        "ok": provider.ok,
+        "429s": provider.rejected,
+        "failed": policy.stats.exhausted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backoff-only retries against the rate limiter")
+    parser.add_argument("--calls", type=int, default=60, help="concurrent LLM calls")
+    parser.add_argument("--quota", type=int, default=15, help="requests per window")
+    parser.add_argument("--window", type=float, default=2.0, help="seconds standing for a minute")
+    parser.add_argument("--parallel", type=int, default=4, help="requests the provider serves at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--attempts", type=int, default=5, help="tries per call, as llm.retry.max_attempts")
+    args = parser.parse_args()
+    random.seed(0)
+
+    # The limiter is configured as in config.yaml, scaled to the window
+    limiter = RateLimiter(
+        "simulated",
+        requests_per_minute=args.quota * 60 / args.window,
+        burst=max(1, args.quota // 10),
+        concurrency=AIMDController(initial=8, maximum=8),
+    )
+    results = {
+        "backoff only": asyncio.run(run(args)),
+        "rate limiter": asyncio.run(run(args, limiter)),
+    }
+    print(f"{'mode':<14} {'seconds':>8} {'ok':>5} {'429s':>6} {'failed':>7}")
+    for mode, r in results.items():
+        print(f"{mode:<14} {r['seconds']:>8.2f} {r['ok']:>5} {r['429s']:>6} {r['failed']:>7}")
+    print(f"Limiter: {limiter.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+AI Flow - Startup and connection benchmark
+Times AIFlowOrchestrator construction and counts config parses, LLM clients and
+HTTP connections when every agent makes calls to a local stub server that
+speaks the OpenAI-compatible (openrouter) or Ollama chat API.
+
+Usage:
+    python -m benchmarks.bench_startup --provider ollama --calls 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import yaml
+
+AGENTS = [
+    "transcriber", "pm_agent", "architect_agent", "task_agent",
+    "code_agent", "review_agent", "qa_agent", "reflector_agent",
+]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every chat request with a fixed message over keep-alive HTTP/1.1"""
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    requests = 0
+
+    def setup(self):
+        super().setup()
+        StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubHandler.requests += 1
+        if self.path.startswith("/api/chat"):
+            # Ollama streams NDJSON; a single final message is a valid stream
+            body = (json.dumps({
+                "model": "stub", "created_at": "2024-01-01T00:00:00Z", "done": True, "done_reason": "stop",
+                "message": {"role": "assistant", "content": "{}"},
+            }) + "\n").encode()
+            content_type = "application/x-ndjson"
+        else:
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{}"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def write_config(provider: str, port: int) -> str:
+    """config.yaml with the provider pointed at the stub"""
+    config = yaml.safe_load((Path(__file__).parent.parent / "config" / "config.yaml").read_text())
+    config["llm"]["provider"] = provider
+    suffix = "/v1" if provider == "openrouter" else ""
+    config["llm"][provider]["base_url"] = f"http://127.0.0.1:{port}{suffix}"
+    handle = tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False)
+    yaml.safe_dump(config, handle)
+    handle.close()
+    return handle.name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark orchestrator startup and LLM connection reuse")
+    parser.add_argument("--provider", choices=["openrouter", "ollama"], default="ollama")
+    parser.add_argument("--calls", type=int, default=3, help="LLM calls per agent")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config_path = write_config(args.provider, server.server_port)
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+    # Count config parses by wrapping the parser the agents use
+    parses = 0
+    safe_load = yaml.safe_load
+
+    def counting_safe_load(stream):
+        nonlocal parses
+        parses += 1
+        return safe_load(stream)
+
+    yaml.safe_load = counting_safe_load
+    import_started = time.perf_counter()
+    from orchestrator.workflow import AIFlowOrchestrator
+    import_seconds = time.perf_counter() - import_started
+
+    started = time.perf_counter()
+    orchestrator = AIFlowOrchestrator(config_path=config_path)
+    construct_seconds = time.perf_counter() - started
+    construct_parses = parses
+
+    started = time.perf_counter()
+    orchestrator.pm_agent
+    first_agent_seconds = time.perf_counter() - started
+
+    # Agents a text run uses; the transcriber only handles audio/video input
+    used = [name for name in AGENTS if name != "transcriber"]
+    agents = [getattr(orchestrator, name) for name in used]
+    clients = len({id(agent.llm) for agent in agents})
+
+    async def calls():
+        for agent in agents:
+            for i in range(args.calls):
+                await agent.invoke_llm(f"ping {i}")
+
+    started = time.perf_counter()
+    asyncio.run(calls())
+    call_seconds = time.perf_counter() - started
+    yaml.safe_load = safe_load
+    server.shutdown()
+    os.unlink(config_path)
+
+    print(f"Import orchestrator:       {import_seconds * 1000:.1f} ms")
+    print(f"Orchestrator construction: {construct_seconds * 1000:.1f} ms ({construct_parses} config parses)")
+    print(f"First agent ready:         {first_agent_seconds * 1000:.1f} ms")
+    print(f"Import to first agent:     {(import_seconds + construct_seconds + first_agent_seconds) * 1000:.1f} ms")
+    print(f"Config parses in total:    {parses}")
+    print(f"LLM clients for {len(agents)} agents: {clients}")
+    print(
+        f"LLM calls: {StubHandler.requests} over {StubHandler.connections} HTTP connections "
+        f"({call_seconds * 1000:.0f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
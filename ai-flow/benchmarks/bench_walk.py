@@ -0,0 +1,92 @@
+"""
+AI Flow - Directory walk benchmark
+Compares the old rglob-then-filter walk with the pruning DirectoryWalker on a
+synthetic monorepo with large node_modules and build output trees.
+
+Usage:
+    python -m benchmarks.bench_walk --packages 20 --deps 300
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from rag.indexer import CodebaseIndexer
+from rag.walker import DirectoryWalker
+
+
+def legacy_walk(root: Path) -> list:
+    """The walk CodebaseIndexer.iter_chunks used before DirectoryWalker"""
+    selected = []
+    for file_path in root.rglob('*'):
+        if not file_path.is_file() or file_path.suffix not in CodebaseIndexer.SUPPORTED_EXTENSIONS:
+            continue
+        if any(part in CodebaseIndexer.IGNORE_DIRS for part in file_path.parts):
+            continue
+        selected.append(str(file_path.relative_to(root)))
+    return selected
+
+
+def build_tree(root: Path, packages: int, deps: int, files_per_dep: int) -> None:
+    """Source files per package, plus a node_modules and dist tree that dwarf them"""
+    for p in range(packages):
+        package = root / "packages" / f"pkg{p}"
+        for d in ("src/services", "src/controllers", "src/components"):
+            (package / d).mkdir(parents=True)
+            for i in range(10):
+                (package / d / f"file{i}.ts").write_text(f"export const value{i} = {i};\n" * 20)
+        (package / "dist").mkdir()
+        for i in range(30):
+            (package / "dist" / f"bundle{i}.js").write_text("var x = 1;\n")
+    (root / ".gitignore").write_text("generated/\n*.log\n")
+    (root / "generated").mkdir()
+    for i in range(200):
+        (root / "generated" / f"client{i}.ts").write_text("export {};\n")
+    for d in range(deps):
+        dep = root / "node_modules" / f"dep{d}" / "lib"
+        dep.mkdir(parents=True)
+        for i in range(files_per_dep):
+            (dep / f"index{i}.js").write_text("module.exports = {};\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark codebase directory walking")
+    parser.add_argument("--packages", type=int, default=20, help="Source packages in the tree")
+    parser.add_argument("--deps", type=int, default=300, help="Packages under node_modules")
+    parser.add_argument("--files-per-dep", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per walker (best is reported)")
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench-walk-"))
+    try:
+        build_tree(root, args.packages, args.deps, args.files_per_dep)
+
+        legacy_seconds = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            legacy = legacy_walk(root)
+            legacy_seconds = min(legacy_seconds, time.perf_counter() - start)
+
+        walker = DirectoryWalker(CodebaseIndexer.SUPPORTED_EXTENSIONS, CodebaseIndexer.IGNORE_DIRS, use_git=False)
+        walker_seconds = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            selected = [entry.relative_path for entry in walker.walk(str(root))]
+            walker_seconds = min(walker_seconds, time.perf_counter() - start)
+
+        source_files = args.packages * 30
+        print(f"Tree: {source_files} source files, {args.deps * args.files_per_dep} in node_modules")
+        print(f"Legacy rglob + filter:    {legacy_seconds * 1000:10.2f} ms ({len(legacy)} files selected)")
+        print(f"Pruning walker:           {walker_seconds * 1000:10.2f} ms ({len(selected)} files selected)")
+        print(f"  files/s (source files): {source_files / legacy_seconds:10.0f} -> {source_files / walker_seconds:.0f}")
+        print(f"  dirs pruned:            {walker.stats.dirs_pruned:10d}")
+        print(f"  ignored by .gitignore:  {len(legacy) - len(selected):10d}")
+        print(f"Speedup:                  {legacy_seconds / walker_seconds:10.1f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+AI Flow - Synthetic corpus generator
+Writes a NestJS-style TypeScript / Prisma / markdown tree of a requested size,
+together with queries whose answer (the file they are about) is known.
+
+Usage:
+    python -m benchmarks.corpus --chunks 100000 --out /tmp/corpus
+"""
+
+import argparse
+import json
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+from rag.chunker import SyntaxChunker
+
+
+AREAS = [
+    "billing", "catalog", "identity", "inventory", "logistics", "marketing", "orders",
+    "payments", "reporting", "scheduling", "support", "tenancy", "analytics", "compliance",
+]
+QUALIFIERS = [
+    "account", "archive", "audit", "batch", "budget", "campaign", "carrier", "channel",
+    "contract", "coupon", "customer", "device", "discount", "document", "employee", "event",
+    "invoice", "ledger", "license", "location", "member", "message", "partner", "policy",
+    "price", "product", "profile", "quota", "refund", "region", "rental", "route",
+    "session", "shipment", "supplier", "survey", "ticket", "vendor", "voucher", "warehouse",
+]
+NOUNS = [
+    "entry", "group", "item", "line", "link", "note", "plan", "record", "rule", "setting",
+    "slot", "snapshot", "status", "summary", "tag", "template", "token", "transfer",
+]
+FIELDS = [
+    "code", "email", "externalRef", "name", "owner", "phone", "reference", "region",
+    "slug", "status", "tenant", "title", "createdAt", "expiresAt", "priority", "category",
+]
+VERBS = ["find", "list", "count", "archive", "restore", "validate", "export", "sync"]
+PRISMA_TYPES = ["String", "Int", "Boolean", "DateTime", "Decimal", "Json"]
+
+
+@dataclass
+class Query:
+    """A benchmark query and the relative path of the file it is about"""
+    text: str
+    target: str
+    kind: str  # "code" or "docs"
+
+
+def camel(*words: str) -> str:
+    return words[0] + ''.join(w[0].upper() + w[1:] for w in words[1:])
+
+
+def pascal(*words: str) -> str:
+    return ''.join(w[0].upper() + w[1:] for w in words)
+
+
+def entity_words(index: int) -> Tuple[str, ...]:
+    """Distinct entity names: qualifier x noun, then numbered once those run out"""
+    qualifier = QUALIFIERS[index % len(QUALIFIERS)]
+    noun = NOUNS[(index // len(QUALIFIERS)) % len(NOUNS)]
+    generation = index // (len(QUALIFIERS) * len(NOUNS))
+    return (qualifier, noun) if generation == 0 else (qualifier, noun, f"v{generation}")
+
+
+def service_file(rng: random.Random, words: Tuple[str, ...], methods: int) -> Tuple[str, List[Tuple[str, str]]]:
+    """A service class with `methods` query methods; returns (source, [(verb, field)])"""
+    name = pascal(*words)
+    var = camel(*words)
+    lines = [
+        "import { Injectable, NotFoundException } from '@nestjs/common';",
+        "import { PrismaService } from '../../prisma/prisma.service';",
+        "",
+        "@Injectable()",
+        f"export class {name}Service {{",
+        "  constructor(private readonly prisma: PrismaService) {}",
+    ]
+    signatures = []
+    for _ in range(methods):
+        verb, field = rng.choice(VERBS), rng.choice(FIELDS)
+        signatures.append((verb, field))
+        method = camel(verb, *words, "by", field)
+        limit = rng.randint(10, 500)
+        lines += [
+            "",
+            f"  async {method}({field}: string, take = {limit}) {{",
+            f"    const rows = await this.prisma.{var}.findMany({{",
+            f"      where: {{ {field}, deletedAt: null }},",
+            "      orderBy: { updatedAt: 'desc' },",
+            "      take,",
+            "    });",
+            f"    if (!rows.length) throw new NotFoundException('No {' '.join(words)} with this {field}');",
+            f"    return rows.map((row) => ({{ ...row, {verb}edAt: new Date() }}));",
+            "  }",
+        ]
+    lines += ["}", ""]
+    return '\n'.join(lines), signatures
+
+
+def prisma_file(rng: random.Random, entities: List[Tuple[str, ...]]) -> str:
+    blocks = []
+    for words in entities:
+        fields = rng.sample(FIELDS, 6)
+        body = [f"  {f.ljust(12)} {rng.choice(PRISMA_TYPES)}" for f in fields]
+        blocks.append(
+            f"model {pascal(*words)} {{\n  id           String   @id @default(uuid())\n"
+            + '\n'.join(body)
+            + f"\n  updatedAt    DateTime @updatedAt\n\n  @@index([{fields[0]}])\n}}\n"
+        )
+    return '\n'.join(blocks)
+
+
+def doc_file(rng: random.Random, area: str, entities: List[Tuple[str, ...]]) -> str:
+    lines = [f"# {area.title()} API", "", f"Endpoints and rules of the {area} module.", ""]
+    for words in entities:
+        title = ' '.join(words).title()
+        route = '-'.join(words)
+        lines += [f"## {title}", "", f"A {' '.join(words)} belongs to one tenant of the {area} module.", ""]
+        for field in rng.sample(FIELDS, 3):
+            lines += [
+                f"### GET /{area}/{route}?{field}=",
+                "",
+                f"Lists {' '.join(words)} records filtered by {field}, newest first.",
+                f"Returns 404 when no {' '.join(words)} matches the {field}.",
+                "",
+            ]
+    return '\n'.join(lines)
+
+
+def generate_corpus(
+    root: Path,
+    chunks: int,
+    queries: int = 200,
+    seed: int = 0,
+    methods_per_service: int = 12,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+) -> List[Query]:
+    """
+    Write a tree of roughly `chunks` code chunks under `root`:
+
+        apps/api/src/<area>/<entity>.service.ts   (about 90% of chunks)
+        prisma/<area>.prisma                      (one model per entity)
+        docs/<AREA>_API.md                        (read by DocumentIndexer)
+
+    The number of files is calibrated by chunking the first files with
+    SyntaxChunker. Returns `queries` code queries (a service method described
+    in words -> its file) and as many docs queries (an endpoint -> its doc).
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    chunker = SyntaxChunker(chunk_size, chunk_overlap)
+
+    code_queries: List[Query] = []
+    doc_entities = {area: [] for area in AREAS}
+    prisma_entities = {area: [] for area in AREAS}
+    written = 0
+    per_file = None
+    entity = 0
+    while written < chunks:
+        words = entity_words(entity)
+        area = AREAS[entity % len(AREAS)]
+        source, signatures = service_file(rng, words, methods_per_service)
+        path = Path("apps/api/src") / area / f"{'-'.join(words)}.service.ts"
+        (root / path.parent).mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(source)
+        if entity < 20:
+            written += len(chunker.chunk(source, str(path)))
+            per_file = written / (entity + 1)
+        else:
+            written += per_file
+        verb, field = rng.choice(signatures)
+        code_queries.append(Query(f"{verb} {' '.join(words)} by {field}", path.as_posix(), "code"))
+        prisma_entities[area].append(words)
+        if entity % 4 == 0:
+            doc_entities[area].append(words)
+        entity += 1
+
+    (root / "prisma").mkdir(parents=True, exist_ok=True)
+    for area, entities in prisma_entities.items():
+        # Split schemas so no single file dominates the walk
+        for part in range(0, len(entities), 200):
+            name = f"{area}.prisma" if part == 0 else f"{area}-{part // 200}.prisma"
+            (root / "prisma" / name).write_text(prisma_file(rng, entities[part:part + 200]))
+
+    doc_queries: List[Query] = []
+    (root / "docs").mkdir(parents=True, exist_ok=True)
+    for area, entities in doc_entities.items():
+        for part in range(0, len(entities), 100):
+            name = f"{area.upper()}_API.md" if part == 0 else f"{area.upper()}_API_{part // 100}.md"
+            batch = entities[part:part + 100]
+            (root / "docs" / name).write_text(doc_file(rng, area, batch))
+            doc_queries += [Query(f"{area} {' '.join(w)} endpoint", name, "docs") for w in batch]
+
+    rng.shuffle(code_queries)
+    rng.shuffle(doc_queries)
+    return code_queries[:queries] + doc_queries[:queries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic codebase for benchmarks")
+    parser.add_argument("--chunks", type=int, default=10000, help="Approximate number of code chunks")
+    parser.add_argument("--out", required=True, help="Directory to write the tree to")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    root = Path(args.out)
+    queries = generate_corpus(root, args.chunks, args.queries, args.seed)
+    # Next to the tree, not in it, so indexing the tree does not pick it up
+    queries_path = root.with_name(root.name + "-queries.json")
+    queries_path.write_text(json.dumps([asdict(q) for q in queries], indent=1))
+    files = sum(1 for p in root.rglob('*') if p.is_file())
+    print(f"Wrote {files} files (~{args.chunks} chunks) to {root}, {len(queries)} queries to {queries_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ Run the AI-driven development workflow
 import asyncio
 import os
 from pathlib import Path
+from typing import List, Optional
 from dotenv import load_dotenv
 import typer
 from rich.console import Console
@@ -22,12 +23,168 @@ if os.getenv("GOOGLE_API_KEY"):
     genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 from orchestrator.workflow import AIFlowOrchestrator
+from agents import llm_registry
+from agents.artifact_library import ArtifactLibrary, tech_stack_signature
+from agents.llm_cache import CACHE_MODES, LLMCache
+from agents.semantic_cache import SemanticCache
 from rag.indexer import DocumentIndexer, CodebaseIndexer
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import EmbeddingProvider, GeminiEmbedder, create_embedder
+from rag.federated import (
+    FederatedCodebaseIndexer, FederatedDocumentIndexer, IndexShard, RootSpec, parse_roots
+)
 
 app = typer.Typer(help="AI-Driven Development Flow")
 console = Console()
 
 
+def _load_config_section(section: str) -> dict:
+    """One top-level section of config/config.yaml (parsed once, shared with the agents)"""
+    return llm_registry.load_config().get(section) or {}
+
+
+def _load_rag_config() -> dict:
+    """Load the `rag` section of config/config.yaml"""
+    return _load_config_section("rag")
+
+
+def _resolve_cache_dir(cache_dir: str | None) -> str:
+    """CLI --cache-dir, falling back to rag.cache_dir"""
+    return cache_dir or _load_rag_config().get("cache_dir", "./.ai-flow-cache")
+
+
+def _build_llm_cache(mode: str | None, cache_dir: str | None) -> LLMCache:
+    """LLM response cache in the cache directory; CLI --cache overrides llm.cache.mode"""
+    cache_config = _load_config_section("llm").get("cache", {})
+    mode = mode or cache_config.get("mode", "read")
+    if mode not in CACHE_MODES:
+        console.print(f"[red]Error: --cache must be one of {', '.join(CACHE_MODES)}[/red]")
+        raise typer.Exit(1)
+    return LLMCache(
+        str(Path(_resolve_cache_dir(cache_dir)) / "llm"),
+        mode=mode,
+        max_bytes=int(cache_config.get("max_mb", 256) * 1024 * 1024),
+        ttl_seconds=cache_config.get("ttl_hours", 168) * 3600,
+        max_temperature=cache_config.get("max_temperature", 0.1),
+    )
+
+
+def _retry_summary() -> str:
+    """Retry counts and wasted seconds of this run's LLM calls"""
+    return llm_registry.get_retry_policy(_load_config_section("llm")).summary()
+
+
+def _build_semantic_cache(mode: str | None, cache_dir: str | None) -> Optional[SemanticCache]:
+    """
+    Near-duplicate response cache when llm.semantic_cache.enabled. It follows
+    --cache: off disables it, write stores responses without serving any.
+    """
+    semantic_config = _load_config_section("llm").get("semantic_cache", {})
+    mode = mode or _load_config_section("llm").get("cache", {}).get("mode", "read")
+    if not semantic_config.get("enabled", False) or mode == "off":
+        return None
+    rag_config = _load_rag_config()
+    return SemanticCache(
+        str(Path(_resolve_cache_dir(cache_dir)) / "llm"),
+        embedder=create_embedder(
+            semantic_config.get("embedding_model") or rag_config.get("embedding_model", "models/embedding-001"),
+            ollama_base_url=rag_config.get("ollama_base_url"),
+        ),
+        serve_threshold=semantic_config.get("serve_threshold", 0.98),
+        draft_threshold=semantic_config.get("draft_threshold", 0.9),
+        lookups=mode == "read",
+        draft_max_chars=semantic_config.get("draft_max_chars", 6000),
+        max_entries=semantic_config.get("max_entries", 5000),
+    )
+
+
+def _build_artifact_library(cache_dir: str | None) -> Optional[ArtifactLibrary]:
+    """Approved-artifact library when library.enabled; shared across projects via library.dir"""
+    library_config = _load_config_section("library")
+    if not library_config.get("enabled", False):
+        return None
+    rag_config = _load_rag_config()
+    return ArtifactLibrary(
+        library_config.get("dir") or str(Path(_resolve_cache_dir(cache_dir)) / "library"),
+        embedder=create_embedder(
+            library_config.get("embedding_model") or rag_config.get("embedding_model", "models/embedding-001"),
+            ollama_base_url=rag_config.get("ollama_base_url"),
+        ),
+        tech_stack=tech_stack_signature(_load_config_section("tech_stack")),
+        reuse_threshold=library_config.get("reuse_threshold", 0.97),
+        adapt_threshold=library_config.get("adapt_threshold", 0.85),
+        min_score=library_config.get("min_score", 0.6),
+    )
+
+
+def _format_walk_stats(stats) -> str:
+    source = "git ls-files" if stats.used_git else "directory scan"
+    skipped = stats.skipped_ignored + stats.skipped_large + stats.skipped_generated + stats.skipped_binary
+    return (
+        f"{stats.files_seen} files seen via {source} in {stats.seconds:.2f}s "
+        f"({stats.files_per_second:,.0f} files/s), {stats.dirs_pruned} dirs pruned, {skipped} skipped"
+    )
+
+
+def _build_code_indexer(
+    cache_dir: str | None,
+    embedder: Optional[EmbeddingProvider] = None,
+    cache: Optional[EmbeddingCache] = None,
+) -> CodebaseIndexer:
+    """
+    Create a CodebaseIndexer backed by the persistent embedding cache.
+    Indexers for several roots can share one embedder and cache.
+    """
+    rag_config = _load_rag_config()
+    cache_dir = _resolve_cache_dir(cache_dir)
+    return CodebaseIndexer(
+        chunk_size=rag_config.get("chunk_size", 1000),
+        chunk_overlap=rag_config.get("chunk_overlap", 200),
+        embedder=embedder or create_embedder(
+            rag_config.get("embedding_model", "models/embedding-001"),
+            ollama_base_url=rag_config.get("ollama_base_url"),
+        ),
+        cache=cache or EmbeddingCache(cache_dir),
+        embedding_batch_size=rag_config.get("embedding_batch_size", 100),
+        embedding_concurrency=rag_config.get("embedding_concurrency", 4),
+        vector_dtype=rag_config.get("vector_dtype", "float32"),
+        ann_config=rag_config.get("ann"),
+        quantization_config=rag_config.get("quantization"),
+        store=rag_config.get("store", "native"),
+        hierarchical_config=rag_config.get("hierarchical"),
+        context_config=rag_config.get("context"),
+        search_mode=rag_config.get("search_mode", "hybrid"),
+        walker_config=rag_config.get("walker"),
+    )
+
+
+def _build_code_indexers(cache_dir: str | None, count: int) -> List[CodebaseIndexer]:
+    """One indexer per root, all sharing the embedder and the embedding cache"""
+    first = _build_code_indexer(cache_dir)
+    return [first] + [
+        _build_code_indexer(cache_dir, embedder=first.embedder, cache=first.cache) for _ in range(count - 1)
+    ]
+
+
+def _federate_docs(roots: List[RootSpec], indexers: List[DocumentIndexer]) -> DocumentIndexer:
+    """A single root's indexer as is, several merged under their root names"""
+    if len(indexers) == 1:
+        return indexers[0]
+    return FederatedDocumentIndexer(
+        [IndexShard(root.name, indexer, root.weight) for root, indexer in zip(roots, indexers)]
+    )
+
+
+def _federate_code(roots: List[RootSpec], indexers: List[CodebaseIndexer]):
+    """A single root's indexer as is, several merged under their root names"""
+    if len(indexers) == 1:
+        return indexers[0]
+    return FederatedCodebaseIndexer(
+        [IndexShard(root.name, indexer, root.weight) for root, indexer in zip(roots, indexers)],
+        context_config=_load_rag_config().get("context"),
+    )
+
+
 @app.command()
 def run(
     input_file: str = typer.Argument(
@@ -39,21 +196,36 @@ def run(
         "--output", "-o",
         help="Directory to output generated code"
     ),
-    docs_dir: str = typer.Option(
+    docs_dirs: List[str] = typer.Option(
         None,
         "--docs", "-d",
-        help="Path to project documentation directory"
+        help="Project documentation directory; repeatable, as path, name=path or name=path@weight"
     ),
-    codebase_dir: str = typer.Option(
+    codebase_dirs: List[str] = typer.Option(
         None,
         "--codebase", "-c",
-        help="Path to existing codebase for context"
+        help="Existing codebase for context; repeatable, as path, name=path or name=path@weight"
     ),
     skip_rag: bool = typer.Option(
         False,
         "--skip-rag",
         help="Skip RAG indexing (faster but less context)"
     ),
+    cache_dir: str = typer.Option(
+        None,
+        "--cache-dir",
+        help="Directory for the persistent embedding cache (default: rag.cache_dir)"
+    ),
+    reuse_index: bool = typer.Option(
+        False,
+        "--reuse-index",
+        help="Open the index prebuilt by `index` instead of re-walking the codebase"
+    ),
+    cache: str = typer.Option(
+        None,
+        "--cache",
+        help="LLM response cache: read (replay, store misses), write (refresh) or off (default: llm.cache.mode)"
+    ),
 ):
     """
     Run the AI-driven development workflow.
@@ -67,16 +239,24 @@ def run(
         
         # With existing codebase for patterns
         python main.py requirements.md -c ./src -o ./output
+        
+        # Several repos, each with its own index; backend results weigh more
+        python main.py requirements.md -c api=../backend@1.5 -c web=../frontend -c ../shared-types
     """
-    asyncio.run(_run_async(input_file, output_dir, docs_dir, codebase_dir, skip_rag))
+    asyncio.run(_run_async(
+        input_file, output_dir, docs_dirs, codebase_dirs, skip_rag, cache_dir, reuse_index, cache
+    ))
 
 
 async def _run_async(
     input_file: str,
     output_dir: str,
-    docs_dir: str | None,
-    codebase_dir: str | None,
+    docs_dirs: List[str] | None,
+    codebase_dirs: List[str] | None,
     skip_rag: bool,
+    cache_dir: str | None = None,
+    reuse_index: bool = False,
+    cache_mode: str | None = None,
 ):
     """Async implementation of the run command"""
     
@@ -116,6 +296,8 @@ async def _run_async(
     
     # Build context
     project_context = ""
+    doc_indexer = None
+    code_indexer = None
     
     with Progress(
         SpinnerColumn(),
@@ -123,40 +305,72 @@ async def _run_async(
         console=console,
     ) as progress:
         
-        # Index docs if provided
-        if docs_dir and not skip_rag:
+        # Index docs if provided: each root keeps its own persisted index
+        if docs_dirs and not skip_rag:
             task = progress.add_task("Indexing documentation...", total=None)
-            doc_indexer = DocumentIndexer()
-            doc_count = doc_indexer.index_docs_directory(docs_dir)
-            project_context += f"\n\n=== PROJECT DOCUMENTATION ===\n{doc_indexer.get_all_docs_content()}"
+            roots = parse_roots(docs_dirs)
+            indexers = []
+            for root in roots:
+                indexer = DocumentIndexer(index_dir=str(Path(_resolve_cache_dir(cache_dir)) / "docs"))
+                doc_count = indexer.index_docs_directory(root.path)
+                indexers.append(indexer)
+                console.print(
+                    f"[green]Indexed {doc_count} documentation files"
+                    f"{' in ' + root.name if len(roots) > 1 else ''} "
+                    f"({len(indexer.sections)} sections, retrieved per agent)[/green]"
+                )
+                console.print(
+                    f"[dim]Document digests: {indexer.digest_store.hits} cached, "
+                    f"{indexer.digest_store.misses} built[/dim]"
+                )
             progress.update(task, completed=True)
-            console.print(f"[green]Indexed {doc_count} documentation files[/green]")
+            doc_indexer = _federate_docs(roots, indexers)
         
-        # Index codebase if provided
-        if codebase_dir and not skip_rag:
+        # Index codebases if provided: one shard per root, so a new root
+        # never re-indexes the others
+        if codebase_dirs and not skip_rag:
             task = progress.add_task("Indexing codebase...", total=None)
-            code_indexer = CodebaseIndexer()
-            code_count = code_indexer.index_directory(codebase_dir)
-            
-            # Get relevant context
-            if code_count > 0:
-                # Generate embeddings
-                await code_indexer.generate_embeddings()
-                
-                # Get context for general code patterns
-                project_context += f"\n\n=== EXISTING CODE PATTERNS ===\n"
-                project_context += code_indexer.get_context_for_task(
-                    "code structure, patterns, services, controllers, components",
-                    top_k=10
+            roots = parse_roots(codebase_dirs)
+            indexers = _build_code_indexers(cache_dir, len(roots))
+            indexed_roots = []
+            for root, indexer in zip(roots, indexers):
+                if reuse_index and indexer.load_index(root.path):
+                    code_count = len(indexer.store.paths)
+                else:
+                    code_count = indexer.index_directory(root.path)
+                    # Generate embeddings (batched, off the event loop)
+                    await indexer.generate_embeddings(
+                        on_progress=lambda done, total, name=root.name: progress.update(
+                            task, description=f"Embedding chunks ({name})... {done}/{total}"
+                        )
+                    )
+                console.print(
+                    f"[green]Indexed {code_count} code files"
+                    f"{' in ' + root.name if len(roots) > 1 else ''} "
+                    f"({indexer.files_skipped} unchanged, {indexer.embedding_calls} embedding calls)[/green]"
                 )
+                if code_count:
+                    indexed_roots.append((root, indexer))
             
             progress.update(task, completed=True)
-            console.print(f"[green]Indexed {code_count} code files[/green]")
+            # Context is retrieved per task once the task plan exists
+            if indexed_roots:
+                code_indexer = _federate_code(*map(list, zip(*indexed_roots)))
     
     # Run the workflow
     console.print("\n[bold]Starting AI Flow...[/bold]\n")
     
-    orchestrator = AIFlowOrchestrator()
+    llm_cache = _build_llm_cache(cache_mode, cache_dir)
+    semantic_cache = _build_semantic_cache(cache_mode, cache_dir)
+    artifact_library = _build_artifact_library(cache_dir)
+    orchestrator = AIFlowOrchestrator(
+        doc_indexer=doc_indexer,
+        code_indexer=code_indexer,
+        task_context_top_k=_load_rag_config().get("top_k", 5),
+        llm_cache=llm_cache,
+        semantic_cache=semantic_cache,
+        artifact_library=artifact_library,
+    )
     
     try:
         result = await orchestrator.run(
@@ -172,7 +386,16 @@ async def _run_async(
             f"[bold]Tasks:[/bold] {len(result.get('tasks', []))}\n"
             f"[bold]Completed:[/bold] {len(result.get('completed_tasks', []))}\n"
             f"[bold]Files Generated:[/bold] {len(result.get('generated_files', {}))}\n"
-            f"[bold]Errors:[/bold] {len(result.get('errors', []))}\n\n"
+            f"[bold]Errors:[/bold] {len(result.get('errors', []))}\n"
+            f"[bold]LLM cache:[/bold] {llm_cache.summary()}\n"
+            + (f"[bold]Semantic cache:[/bold] {semantic_cache.summary()}\n" if semantic_cache else "")
+            + (f"[bold]Artifact library:[/bold] {artifact_library.summary()}\n" if artifact_library else "")
+            + "".join(
+                f"[bold]Rate limiter ({limiter.provider}):[/bold] {limiter.summary()}\n"
+                for limiter in llm_registry.rate_limiters()
+            )
+            + f"[bold]Retries:[/bold] {_retry_summary()}\n"
+            + f"\n"
             f"[dim]Output: {output_dir}[/dim]",
             title="Summary",
             border_style="green"
@@ -192,11 +415,71 @@ async def _run_async(
         
     except Exception as e:
         console.print(f"[red]Error running workflow: {e}[/red]")
+        console.print(f"[dim]Retries: {_retry_summary()}[/dim]")
         raise typer.Exit(1)
 
 
 @app.command()
-def demo():
+def index(
+    codebase_dirs: List[str] = typer.Argument(
+        ...,
+        help="Codebases to index, each into its own shard"
+    ),
+    cache_dir: str = typer.Option(
+        None,
+        "--cache-dir",
+        help="Directory for the persistent embedding cache (default: rag.cache_dir)"
+    ),
+):
+    """
+    Prebuild the embedding cache for one or more codebases.
+    
+    Later `run -c` invocations on the same trees then skip unchanged
+    files and make no embedding calls for cached chunks.
+    """
+    roots = parse_roots(codebase_dirs)
+    indexers = _build_code_indexers(cache_dir, len(roots))
+    code_indexer = indexers[0]
+    needs_google_key = isinstance(code_indexer.embedder, GeminiEmbedder)
+    if code_indexer.search_mode != "lexical" and needs_google_key and not os.getenv("GOOGLE_API_KEY"):
+        console.print("[red]Error: GOOGLE_API_KEY is required for embeddings[/red]")
+        raise typer.Exit(1)
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console,
+    ) as progress:
+        task = progress.add_task("Indexing codebase...", total=None)
+        counts = []
+        for root, indexer in zip(roots, indexers):
+            counts.append(indexer.index_directory(root.path))
+            asyncio.run(indexer.generate_embeddings(
+                on_progress=lambda done, total, name=root.name: progress.update(
+                    task, description=f"Embedding chunks ({name})... {done}/{total}"
+                )
+            ))
+    
+    for root, indexer, code_count in zip(roots, indexers, counts):
+        console.print(Panel(
+            f"[bold]Files indexed:[/bold] {code_count} ({indexer.files_skipped} unchanged)\n"
+            f"[bold]Chunks:[/bold] {indexer.chunk_count}\n"
+            f"[bold]Embedding calls:[/bold] {indexer.embedding_calls}\n"
+            f"[bold]Walk:[/bold] {_format_walk_stats(indexer.walk_stats)}\n\n"
+            f"[dim]Cache: {indexer.cache.db_path}[/dim]",
+            title=f"Index: {root.name}" if len(roots) > 1 else "Index",
+            border_style="green"
+        ))
+
+
+@app.command()
+def demo(
+    cache: str = typer.Option(
+        None,
+        "--cache",
+        help="LLM response cache: read (replay, store misses), write (refresh) or off (default: llm.cache.mode)"
+    ),
+):
     """Run a demo with the sample e-commerce docs"""
     docs_dir = Path(__file__).parent.parent / "docs"
     
@@ -209,9 +492,10 @@ def demo():
     asyncio.run(_run_async(
         input_file=str(docs_dir / "01-BRD.md"),
         output_dir="./generated",
-        docs_dir=str(docs_dir),
-        codebase_dir=None,
+        docs_dirs=[str(docs_dir)],
+        codebase_dirs=None,
         skip_rag=False,
+        cache_mode=cache,
     ))
 
 
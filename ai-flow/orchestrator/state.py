@@ -70,9 +70,12 @@ class Task(BaseModel):
     status: TaskStatus = TaskStatus.PENDING
     assigned_agent: Optional[str] = None
     generated_code: Optional[str] = None
+    context: Optional[str] = None  # Codebase context retrieved for this task (RAG)
     review_comments: Optional[List[str]] = None
     test_results: Optional[dict] = None
     retry_count: int = 0
+    artifact_id: Optional[str] = None  # approved library artifact the code was reused or adapted from
+    artifact_verbatim: bool = False  # reused as is: reflection and review are skipped
 
 
 class ReviewResult(BaseModel):
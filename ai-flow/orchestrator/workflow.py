@@ -4,14 +4,16 @@ LangGraph-based workflow that coordinates all agents
 """
 
 import asyncio
+import json
 from datetime import datetime
+from functools import cached_property
 from typing import Literal
 from pathlib import Path
 
 from langgraph.graph import StateGraph, END
 
-from orchestrator.state import WorkflowState, create_initial_state, TaskStatus
-from agents.transcriber_agent import TranscriberAgent
+from orchestrator.state import WorkflowState, create_initial_state, TaskStatus, ReviewResult
+from agents.transcriber_agent import TranscriberAgent, MEDIA_EXTENSIONS
 from agents.pm_agent import PMAgent
 from agents.architect_agent import ArchitectAgent
 from agents.task_agent import TaskAgent
@@ -27,22 +29,77 @@ class AIFlowOrchestrator:
     Uses LangGraph to coordinate multiple AI agents.
     """
     
-    def __init__(self, config_path: str = "config/config.yaml"):
+    def __init__(
+        self,
+        config_path: str = "config/config.yaml",
+        doc_indexer=None,
+        code_indexer=None,
+        task_context_top_k: int = 5,
+        llm_cache=None,
+        semantic_cache=None,
+        artifact_library=None,
+    ):
         self.config_path = config_path
+        # Codebase index used to retrieve per-task context after planning
+        self.code_indexer = code_indexer
+        self.task_context_top_k = task_context_top_k
+        self.llm_cache = llm_cache
+        self.semantic_cache = semantic_cache
+        # Approved task outputs kept across runs (agents.artifact_library.ArtifactLibrary)
+        self.artifact_library = artifact_library
+        
+        self.doc_indexer = doc_indexer
         
-        # Initialize agents
-        self.transcriber = TranscriberAgent(config_path)
-        self.pm_agent = PMAgent(config_path)
-        self.architect_agent = ArchitectAgent(config_path)
-        self.task_agent = TaskAgent(config_path)
-        self.code_agent = CodeAgent(config_path)
-        self.review_agent = ReviewAgent(config_path)
-        self.qa_agent = QAAgent(config_path)
-        self.reflector_agent = ReflectorAgent(config_path)
+        # Agents are created on first use (see the properties below), so a
+        # run never builds agents it does not need, e.g. the transcriber for
+        # text input; they share one config and LLM client (agents.llm_registry)
         
         # Build the workflow graph
         self.graph = self._build_graph()
     
+    def _make_agent(self, agent_class):
+        """Create an agent wired to the run's document index and LLM caches"""
+        agent = agent_class(self.config_path)
+        # Agents retrieve their own documentation sections (agents.<name>.docs)
+        agent.doc_indexer = self.doc_indexer
+        agent.llm_cache = self.llm_cache
+        agent.semantic_cache = self.semantic_cache
+        return agent
+    
+    @cached_property
+    def transcriber(self) -> TranscriberAgent:
+        return self._make_agent(TranscriberAgent)
+    
+    @cached_property
+    def pm_agent(self) -> PMAgent:
+        return self._make_agent(PMAgent)
+    
+    @cached_property
+    def architect_agent(self) -> ArchitectAgent:
+        return self._make_agent(ArchitectAgent)
+    
+    @cached_property
+    def task_agent(self) -> TaskAgent:
+        return self._make_agent(TaskAgent)
+    
+    @cached_property
+    def code_agent(self) -> CodeAgent:
+        agent = self._make_agent(CodeAgent)
+        agent.artifact_library = self.artifact_library
+        return agent
+    
+    @cached_property
+    def review_agent(self) -> ReviewAgent:
+        return self._make_agent(ReviewAgent)
+    
+    @cached_property
+    def qa_agent(self) -> QAAgent:
+        return self._make_agent(QAAgent)
+    
+    @cached_property
+    def reflector_agent(self) -> ReflectorAgent:
+        return self._make_agent(ReflectorAgent)
+    
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph workflow"""
         
@@ -115,6 +172,9 @@ class AIFlowOrchestrator:
     # Node implementations
     async def _transcribe_node(self, state: WorkflowState) -> WorkflowState:
         """Transcribe audio/video if needed"""
+        if not state.get("meeting_notes", "").endswith(MEDIA_EXTENSIONS):
+            # Text input: the transcriber is never built
+            return state
         return await self.transcriber.process(state)
     
     async def _requirements_node(self, state: WorkflowState) -> WorkflowState:
@@ -129,7 +189,35 @@ class AIFlowOrchestrator:
     async def _task_planning_node(self, state: WorkflowState) -> WorkflowState:
         """Plan and prioritize tasks"""
         state["phase"] = "planning"
-        return await self.task_agent.process(state)
+        state = await self.task_agent.process(state)
+        await self._prefetch_task_context(state)
+        return state
+    
+    async def _prefetch_task_context(self, state: WorkflowState) -> None:
+        """
+        Retrieve codebase context for every planned task at once, so code
+        generation never waits on retrieval: all task queries are embedded
+        in one batch and searched concurrently.
+        """
+        tasks = [t for t in state.get("tasks", []) if t.context is None]
+        if self.code_indexer is None or not tasks:
+            return
+        queries = [
+            f"{t.title}\n{t.description}\n{' '.join(t.files_to_create + t.files_to_modify)}"
+            for t in tasks
+        ]
+        # Each task type only sees matching files (e.g. .prisma/.sql for database tasks)
+        filters = [self.code_agent.context_filter(t) for t in tasks]
+        try:
+            contexts = await self.code_indexer.get_contexts_for_tasks(
+                queries, self.task_context_top_k, filters=filters
+            )
+        except Exception as e:
+            state["warnings"].append(f"Task context retrieval failed: {e}")
+            return
+        for task, context in zip(tasks, contexts):
+            task.context = context
+        print(f"Retrieved codebase context for {len(tasks)} tasks")
     
     async def _execute_task_node(self, state: WorkflowState) -> WorkflowState:
         """Execute the next task (generate code)"""
@@ -152,14 +240,53 @@ class AIFlowOrchestrator:
         
         return await self.code_agent.process(state)
     
+    def _current_task(self, state: WorkflowState):
+        return next((t for t in state["tasks"] if t.id == state.get("current_task_id")), None)
+    
     async def _reflector_node(self, state: WorkflowState) -> WorkflowState:
         """Critique generated code"""
+        task = self._current_task(state)
+        if task is not None and task.artifact_verbatim:
+            # Reused as is from the library: it was critiqued when first approved
+            state["reflector_feedback"] = {
+                "status": "approved", "feedback": f"Reused approved artifact {task.artifact_id}", "score": 10,
+            }
+            return state
         return await self.reflector_agent.process(state)
 
     async def _review_node(self, state: WorkflowState) -> WorkflowState:
-        """Review generated code"""
+        """Review generated code; approved files are added to the artifact library and semantic cache"""
         state["phase"] = "review"
-        return await self.review_agent.process(state)
+        task = self._current_task(state)
+        if task is not None and task.artifact_verbatim:
+            state["review_results"].append(ReviewResult(
+                task_id=task.id,
+                approved=True,
+                comments=[f"Reused approved artifact {task.artifact_id} verbatim"],
+                suggested_fixes=[],
+                security_issues=[],
+                performance_issues=[],
+            ))
+            task.status = TaskStatus.COMPLETED
+            state["completed_tasks"].append(task.id)
+            return state
+        
+        state = await self.review_agent.process(state)
+        review = next((r for r in reversed(state["review_results"]) if task and r.task_id == task.id), None)
+        if self.semantic_cache is not None and task is not None:
+            # Only approved code may be served or drafted for similar tasks
+            if review is not None and review.approved:
+                self.semantic_cache.commit(task.id)
+            else:
+                self.semantic_cache.discard(task.id)
+        if self.artifact_library is not None and review is not None and review.approved:
+            try:
+                artifact = await self.artifact_library.add(task, json.loads(task.generated_code), review)
+                if artifact is not None:
+                    print(f"Added approved artifact {artifact.id} to the library (score {artifact.score})")
+            except Exception as e:
+                state["warnings"].append(f"Could not add task {task.id} to the artifact library: {e}")
+        return state
     
     async def _test_node(self, state: WorkflowState) -> WorkflowState:
         """Generate tests for the task"""
@@ -0,0 +1,217 @@
+"""
+AI Flow - Approximate Nearest Neighbour Index
+IVF (inverted file) index with spherical k-means coarse quantization, in NumPy
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag.vector_store import normalize_rows
+
+
+# Rows assigned per block during training/insertion, to bound memory
+_ASSIGN_BLOCK_ROWS = 16384
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max inner product) for each row, block by block"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Cluster normalized vectors by cosine similarity; returns normalized centroids"""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(vectors, dtype=np.float32)
+    n_clusters = max(1, min(n_clusters, len(data)))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = _assign(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=n_clusters)
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over the rows of a VectorStore.
+
+    Vectors are partitioned into `nlist` cells by a spherical k-means coarse
+    quantizer. A query scores the centroids, probes the `nprobe` best cells
+    and scores only the vectors listed there exactly. Raising nprobe trades
+    latency for recall.
+
+    New vectors are inserted by assigning them to the existing centroids, so
+    re-indexing does not retrain until the corpus has grown past
+    `retrain_growth` times the size the quantizer was trained on.
+    """
+
+    FILES = ("ivf_centroids.npy", "ivf_offsets.npy", "ivf_ids.npy", "ivf.json")
+
+    def __init__(self, centroids: np.ndarray, nprobe: int = 8, trained_count: int = 0):
+        self.centroids = normalize_rows(centroids)
+        self.nprobe = nprobe
+        self.trained_count = trained_count
+        self._lists: List[np.ndarray] = [np.empty(0, dtype=np.int64) for _ in range(len(centroids))]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def size(self) -> int:
+        return sum(len(ids) for ids in self._lists)
+
+    @staticmethod
+    def default_nlist(count: int) -> int:
+        """Roughly 4 * sqrt(N) cells, the usual starting point for IVF"""
+        return max(1, int(4 * math.sqrt(max(count, 1))))
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: int = 0,
+        nprobe: int = 8,
+        iterations: int = 10,
+        sample_size: int = 50000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Fit the coarse quantizer on (a sample of) the given vectors"""
+        rng = np.random.default_rng(seed)
+        count = len(vectors)
+        nlist = nlist or cls.default_nlist(count)
+        if count > sample_size:
+            sample_rows = np.sort(rng.choice(count, sample_size, replace=False))
+            sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        else:
+            sample = np.asarray(vectors, dtype=np.float32)
+        centroids = spherical_kmeans(sample, nlist, iterations=iterations, seed=seed)
+        return cls(centroids, nprobe=nprobe, trained_count=count)
+
+    def add(self, vectors: np.ndarray, ids: Sequence[int]) -> None:
+        """Insert vectors (already normalized) under the given row ids"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        self.add_labeled(ids, _assign(vectors, self.centroids))
+
+    def add_labeled(self, ids: np.ndarray, labels: np.ndarray) -> None:
+        """Insert row ids whose cell is already known"""
+        ids = np.asarray(ids, dtype=np.int64)
+        labels = np.asarray(labels)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        for cell in range(self.nlist):
+            members = ids[order[bounds[cell]:bounds[cell + 1]]]
+            if len(members):
+                self._lists[cell] = np.concatenate([self._lists[cell], members])
+
+    def needs_retrain(self, count: int, growth: float) -> bool:
+        return count > self.trained_count * growth
+
+    def row_labels(self, count: int) -> np.ndarray:
+        """Cell of every row id in [0, count); -1 for rows not in the index"""
+        labels = np.full(count, -1, dtype=np.int32)
+        for cell, ids in enumerate(self._lists):
+            labels[ids[ids < count]] = cell
+        return labels
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Approximate top-k for each normalized query.
+        `vectors` is the full (memory-mapped) matrix the ids refer to.
+        Returns (row_ids, scores) per query, best first.
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        centroid_scores = queries @ self.centroids.T
+        probe = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, cells in zip(queries, probe):
+            candidates = np.concatenate([self._lists[c] for c in cells])
+            if len(candidates) == 0:
+                results.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+                continue
+            # Sorted ids keep memory-mapped reads sequential
+            candidates.sort()
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append((candidates[best], scores[best]))
+        return results
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        sizes = np.array([len(ids) for ids in self._lists], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        ids = np.concatenate(self._lists) if self._lists else np.empty(0, dtype=np.int64)
+        np.save(directory / "ivf_centroids.npy", self.centroids)
+        np.save(directory / "ivf_offsets.npy", offsets)
+        np.save(directory / "ivf_ids.npy", ids)
+        (directory / "ivf.json").write_text(json.dumps({
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "trained_count": self.trained_count,
+        }))
+
+    @classmethod
+    def load(cls, directory: Path, nprobe: Optional[int] = None) -> Optional["IVFIndex"]:
+        directory = Path(directory)
+        if not all((directory / name).exists() for name in cls.FILES):
+            return None
+        meta = json.loads((directory / "ivf.json").read_text())
+        index = cls(
+            np.load(directory / "ivf_centroids.npy"),
+            nprobe=nprobe or meta["nprobe"],
+            trained_count=meta["trained_count"],
+        )
+        offsets = np.load(directory / "ivf_offsets.npy")
+        ids = np.load(directory / "ivf_ids.npy", mmap_mode="r")
+        index._lists = [np.asarray(ids[offsets[c]:offsets[c + 1]]) for c in range(index.nlist)]
+        return index
+
+
+def carry_over_labels(
+    previous: IVFIndex, previous_keys: np.ndarray, keys: np.ndarray
+) -> np.ndarray:
+    """
+    Map cell assignments from a previous build onto a new row order by key
+    (chunk hash). Rows whose key was not indexed before get -1 and must be
+    assigned against the centroids.
+    """
+    labels = np.full(len(keys), -1, dtype=np.int32)
+    if len(previous_keys) == 0 or len(keys) == 0:
+        return labels
+    previous_labels = previous.row_labels(len(previous_keys))
+    order = np.argsort(previous_keys, kind="stable")
+    sorted_keys = previous_keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    match = sorted_keys[pos] == keys
+    labels[match] = previous_labels[order[pos[match]]]
+    return labels
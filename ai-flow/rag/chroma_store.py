@@ -0,0 +1,147 @@
+"""
+AI Flow - Chroma Store
+Persistent, embedded ChromaDB collection for chunk embeddings, shared across runs
+"""
+
+import hashlib
+import posixpath
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def chunk_id(path: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """
+    Collection id of a chunk: its content hash scoped to its file, so an
+    unchanged chunk keeps its id (and its embedding) across re-indexing.
+    `occurrence` tells apart identical chunks within one file.
+    """
+    return hashlib.md5(f"{path}\0{chunk_hash}\0{occurrence}".encode()).hexdigest()
+
+
+def chunk_ids(paths: Iterable[str], hashes: Iterable[str]) -> List[str]:
+    """chunk_id for every row, given the rows' paths and chunk hashes in order"""
+    seen: Dict[Tuple[str, str], int] = {}
+    ids = []
+    for path, chunk_hash in zip(paths, hashes):
+        occurrence = seen.get((path, chunk_hash), 0)
+        seen[(path, chunk_hash)] = occurrence + 1
+        ids.append(chunk_id(path, chunk_hash, occurrence))
+    return ids
+
+
+def chunk_metadata(path: str, start_line: int, end_line: int, chunk_hash: str, kind: str = "") -> dict:
+    """Metadata stored with each chunk; path/directory/extension/kind can be filtered on"""
+    return {
+        "path": path,
+        "directory": posixpath.dirname(path),
+        "extension": posixpath.splitext(path)[1],
+        "chunk_hash": chunk_hash,
+        "start_line": start_line,
+        "end_line": end_line,
+        "kind": kind,
+    }
+
+
+class ChromaStore:
+    """
+    Chunk embeddings for one codebase root in an on-disk Chroma collection.
+
+    Chroma runs embedded in persistent local mode (no server), so several
+    runs and processes can share one warm collection. Each (root, embedding
+    model) pair gets its own collection. sync() deletes chunks that are gone
+    (including every chunk of removed files), refreshes moved line ranges and
+    reports which chunks still need an embedding; those are then upserted.
+    """
+
+    def __init__(self, directory: Path, root: str, model: str):
+        import chromadb
+        from chromadb.config import Settings
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.client = chromadb.PersistentClient(
+            path=str(self.directory), settings=Settings(anonymized_telemetry=False)
+        )
+        name = "code_" + hashlib.sha1(f"{root}\0{model}".encode()).hexdigest()[:24]
+        self.collection = self.client.get_or_create_collection(
+            name,
+            metadata={"root": root, "model": model},
+            configuration={"hnsw": {"space": "cosine"}},
+            embedding_function=None,
+        )
+        self.batch_size = self.client.get_max_batch_size()
+
+    @property
+    def count(self) -> int:
+        return self.collection.count()
+
+    def existing(self) -> Dict[str, dict]:
+        """Metadata of every chunk in the collection, by id"""
+        found: Dict[str, dict] = {}
+        offset = 0
+        while True:
+            page = self.collection.get(limit=self.batch_size, offset=offset, include=["metadatas"])
+            found.update(zip(page["ids"], page["metadatas"]))
+            if len(page["ids"]) < self.batch_size:
+                return found
+            offset += len(page["ids"])
+
+    def sync(self, wanted: Dict[str, dict]) -> List[str]:
+        """
+        Make the collection hold exactly the ids in `wanted` (id -> metadata).
+        Stale chunks are deleted and changed metadata updated in place; the
+        ids that are not stored yet are returned, to be embedded and upserted.
+        """
+        existing = self.existing()
+        stale = [i for i in existing if i not in wanted]
+        moved = [i for i, metadata in wanted.items() if i in existing and existing[i] != metadata]
+        for start in range(0, len(stale), self.batch_size):
+            self.collection.delete(ids=stale[start:start + self.batch_size])
+        for start in range(0, len(moved), self.batch_size):
+            batch = moved[start:start + self.batch_size]
+            self.collection.update(ids=batch, metadatas=[wanted[i] for i in batch])
+        if stale or moved:
+            print(f"Chroma: {len(stale)} stale chunks deleted, {len(moved)} updated")
+        return [i for i in wanted if i not in existing]
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[dict],
+    ) -> None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            self.collection.upsert(
+                ids=list(ids[start:end]),
+                embeddings=embeddings[start:end],
+                documents=list(documents[start:end]),
+                metadatas=list(metadatas[start:end]),
+            )
+
+    def query(
+        self, queries: np.ndarray, top_k: int, where: Optional[dict] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Nearest chunks for each query embedding as (id, cosine similarity),
+        best first. `where` is a Chroma metadata filter, applied before the
+        nearest-neighbour search, e.g. {"extension": {"$in": [".prisma"]}}.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        count = self.count
+        if count == 0 or top_k <= 0:
+            return [[] for _ in queries]
+        result = self.collection.query(
+            query_embeddings=queries,
+            n_results=min(top_k, count),
+            where=where,
+            include=["distances"],
+        )
+        return [
+            [(i, 1.0 - float(distance)) for i, distance in zip(ids, distances)]
+            for ids, distances in zip(result["ids"], result["distances"])
+        ]
@@ -0,0 +1,385 @@
+"""
+AI Flow - Syntax-Aware Chunker
+Splits source files at declaration boundaries instead of fixed line windows
+"""
+
+import ast
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Sequence
+
+
+# Comment syntax for the symbol header line; None means no header
+COMMENT_PREFIXES = {
+    '.py': '#', '.yaml': '#', '.yml': '#', '.sql': '--',
+    '.ts': '//', '.tsx': '//', '.js': '//', '.jsx': '//', '.prisma': '//',
+}
+BRACE_LANGUAGES = {'.ts', '.tsx', '.js', '.jsx', '.prisma'}
+
+_TS_DECLARATION = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?"
+    r"(class|interface|enum|type|function\*?|const|let|var|namespace|module)\s+([A-Za-z_$][\w$]*)"
+)
+_TS_MEMBER = re.compile(
+    r"^(?:(?:public|private|protected|static|readonly|async|override|abstract|declare|get|set)\s+)*"
+    r"\*?([A-Za-z_$#][\w$]*)\s*([(<:=?!])"
+)
+_PRISMA_BLOCK = re.compile(r"^(model|enum|type|view|generator|datasource)\s+(\w+)")
+# A line ending in one of these continues the statement on the next line
+_CONTINUATIONS = ('=', ',', '+', '-', '*', '/', '&', '|', '?', ':', '.', '(', '[', '{', '=>', '<', '>')
+_CONTINUED_BY = ('.', '?.', '&&', '||', 'else', 'catch', 'finally')
+_KINDS = {'function*': 'function', 'const': 'variable', 'let': 'variable', 'var': 'variable', 'module': 'namespace'}
+
+
+@dataclass
+class Span:
+    """A run of source lines (0-based, end exclusive) holding one declaration"""
+    start: int
+    end: int
+    symbol: Optional[str] = None
+    kind: Optional[str] = None
+    children: List["Span"] = field(default_factory=list)
+
+
+@dataclass
+class Chunk:
+    """One chunk of a file; lines are 1-based and inclusive"""
+    start_line: int
+    end_line: int
+    content: str
+    symbol: str = ""
+    kind: str = ""
+
+
+def contiguous_spans(start: int, end: int, items: Sequence[Span]) -> List[Span]:
+    """
+    Stretch declaration spans so they tile [start, end): the lines before a
+    declaration (comments, decorators, blank lines) belong to it, and trailing
+    lines belong to the last one.
+    """
+    spans: List[Span] = []
+    cursor = start
+    for item in items:
+        if item.end <= cursor:
+            continue
+        item.start = cursor
+        spans.append(item)
+        cursor = item.end
+    if cursor < end:
+        if spans:
+            spans[-1].end = end
+        else:
+            spans.append(Span(cursor, end))
+    return spans
+
+
+# Python
+
+def _python_symbol(node: ast.AST, parent: Optional[str]) -> Optional[Span]:
+    end = getattr(node, 'end_lineno', None)
+    if end is None:
+        return None
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        symbol, kind = node.name, 'method' if parent else 'function'
+    elif isinstance(node, ast.ClassDef):
+        symbol, kind = node.name, 'class'
+    elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        names = [t.id for t in targets if isinstance(t, ast.Name)]
+        symbol, kind = (names[0], 'variable') if names else (None, None)
+    else:
+        symbol, kind = None, None
+    if symbol and parent:
+        symbol = f"{parent}.{symbol}"
+    return Span(0, end, symbol, kind)
+
+
+def python_spans(content: str, line_count: int) -> Optional[List[Span]]:
+    """Top-level statements from `ast`; classes carry their members as children"""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    def spans_for(body: Sequence[ast.stmt], start: int, end: int, parent: Optional[str]) -> List[Span]:
+        items = []
+        classes = {}
+        for node in body:
+            span = _python_symbol(node, parent)
+            if span is None:
+                continue
+            if isinstance(node, ast.ClassDef):
+                classes[id(span)] = node
+            items.append(span)
+        spans = contiguous_spans(start, end, items)
+        for span in spans:
+            node = classes.get(id(span))
+            if node is not None:
+                span.children = spans_for(node.body, span.start, span.end, span.symbol)
+        return spans
+
+    return spans_for(tree.body, 0, line_count, None)
+
+
+# Brace languages (TypeScript / JavaScript / Prisma)
+
+def brace_depths(lines: Sequence[str]) -> List[int]:
+    """
+    Bracket nesting depth after each line. Strings, template literals
+    (including ${...} holes) and comments are skipped so their brackets do
+    not count. Quote state resets at line ends, which contains the damage
+    from constructs this scanner does not model (regex literals, JSX text).
+    """
+    depths = []
+    depth = 0
+    mode = 'code'  # code | block | template
+    holes: List[int] = []  # depth at which each open ${ hole started
+    for line in lines:
+        i = 0
+        n = len(line)
+        while i < n:
+            ch = line[i]
+            if mode == 'block':
+                close = line.find('*/', i)
+                if close == -1:
+                    break
+                mode = 'code'
+                i = close + 2
+                continue
+            if mode == 'template':
+                if ch == '\\':
+                    i += 2
+                elif ch == '`':
+                    mode = 'code'
+                    i += 1
+                elif line.startswith('${', i):
+                    holes.append(depth)
+                    mode = 'code'
+                    i += 2
+                else:
+                    i += 1
+                continue
+            if line.startswith('//', i):
+                break
+            if line.startswith('/*', i):
+                mode = 'block'
+                i += 2
+                continue
+            if ch in '\'"':
+                i += 1
+                while i < n and line[i] != ch:
+                    i += 2 if line[i] == '\\' else 1
+                i += 1
+                continue
+            if ch == '`':
+                mode = 'template'
+            elif ch in '({[':
+                depth += 1
+            elif ch == '}' and holes and holes[-1] == depth:
+                holes.pop()
+                mode = 'template'
+            elif ch in ')}]':
+                depth = max(0, depth - 1)
+            i += 1
+        depths.append(depth)
+    return depths
+
+
+def _is_code(stripped: str) -> bool:
+    return bool(stripped) and not stripped.startswith(('//', '/*', '*', '@'))
+
+
+def brace_spans(
+    lines: Sequence[str],
+    depths: Sequence[int],
+    start: int,
+    end: int,
+    depth: int,
+    name_of: Callable[[str, int], Optional[tuple]],
+    parent: Optional[str] = None,
+) -> List[Span]:
+    """
+    Statements at nesting `depth` within [start, end), split where one
+    completes. Inside a block (depth > 0) its opening and closing lines are
+    spans of their own, left to the parent symbol: `name_of` returns None
+    for them.
+    """
+    items = []
+    for i in range(start, end):
+        stripped = lines[i].strip()
+        if not _is_code(stripped):
+            continue
+        before = depths[i - 1] if i > 0 else 0
+        if depth and ((depths[i] == depth and before < depth) or (depths[i] < depth and before >= depth)):
+            items.append(Span(0, i + 1))
+            continue
+        if depths[i] != depth or stripped.endswith(_CONTINUATIONS):
+            continue
+        following = next((lines[j].strip() for j in range(i + 1, end) if _is_code(lines[j].strip())), '')
+        if following.startswith(_CONTINUED_BY):
+            continue
+        items.append(Span(0, i + 1))
+
+    spans = contiguous_spans(start, end, items)
+    for span in spans:
+        head = next((lines[i].strip() for i in range(span.start, span.end) if _is_code(lines[i].strip())), '')
+        named = name_of(head, depth)
+        if named:
+            span.symbol = f"{parent}.{named[0]}" if parent else named[0]
+            span.kind = named[1]
+        elif parent:
+            # The opening of a split declaration (header line, leading fields)
+            span.symbol = parent
+        # Members of top-level classes, interfaces, enums, models...
+        if depth == 0 and span.end - span.start > 2:
+            span.children = brace_spans(lines, depths, span.start, span.end, depth + 1, name_of, span.symbol)
+            if len(span.children) < 2:
+                span.children = []
+    return spans
+
+
+def ts_name(line: str, depth: int) -> Optional[tuple]:
+    if depth == 0:
+        match = _TS_DECLARATION.match(line)
+        if match:
+            keyword = match.group(1)
+            return match.group(2), _KINDS.get(keyword, keyword)
+        return None
+    match = _TS_MEMBER.match(line)
+    if match:
+        return match.group(1), 'method' if match.group(2) in '(<' else 'property'
+    return None
+
+
+def prisma_name(line: str, depth: int) -> Optional[tuple]:
+    if depth == 0:
+        match = _PRISMA_BLOCK.match(line)
+        return (match.group(2), match.group(1)) if match else None
+    if _PRISMA_BLOCK.match(line):
+        return None  # the block's own opening line
+    field_name = line.split(None, 1)[0] if line else ''
+    return (field_name, 'field') if field_name.isidentifier() else None
+
+
+class SyntaxChunker:
+    """
+    Structure-aware chunking. Files are split at top-level declarations
+    (`ast` for Python, a bracket scanner for TypeScript/JavaScript, model and
+    enum blocks for Prisma). Small neighbouring declarations are packed
+    together up to chunk_size; a declaration larger than chunk_size is split
+    at its members, and anything still too large, or in another language, is
+    cut into line windows that overlap by up to chunk_overlap characters.
+
+    Every chunk that holds named declarations starts with a comment header
+    naming them, e.g. `// UsersService.findAll (method)`.
+    """
+
+    VERSION = 2
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    @property
+    def signature(self) -> str:
+        """Changes whenever chunk boundaries for the same input could change"""
+        return f"syntax{self.VERSION}:{self.chunk_size}:{self.chunk_overlap}"
+
+    def spans(self, content: str, lines: Sequence[str], extension: str) -> List[Span]:
+        spans = None
+        if extension == '.py':
+            spans = python_spans(content, len(lines))
+        elif extension in BRACE_LANGUAGES:
+            depths = brace_depths(lines)
+            name_of = prisma_name if extension == '.prisma' else ts_name
+            spans = brace_spans(lines, depths, 0, len(lines), 0, name_of)
+        return spans or [Span(0, len(lines))]
+
+    def chunk(self, content: str, file_path: str) -> List[Chunk]:
+        lines = content.split('\n')
+        sizes = [len(line) + 1 for line in lines]
+        extension = os.path.splitext(file_path)[1]
+        prefix = COMMENT_PREFIXES.get(extension)
+        return self._pack(lines, sizes, self.spans(content, lines, extension), prefix)
+
+    def _atoms(self, spans: List[Span], offsets: List[int]) -> Iterator[Span]:
+        """Spans that fit in a chunk, descending into the members of those that do not"""
+        for span in spans:
+            if offsets[span.end] - offsets[span.start] <= self.chunk_size or not span.children:
+                yield span
+            else:
+                yield from self._atoms(span.children, offsets)
+
+    def _pack(self, lines: List[str], sizes: List[int], spans: List[Span], prefix: Optional[str]) -> List[Chunk]:
+        """Greedily pack consecutive declarations into chunks of up to chunk_size"""
+        offsets = [0]
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+
+        chunks: List[Chunk] = []
+        group: List[Span] = []
+        group_size = 0
+        for span in self._atoms(spans, offsets):
+            size = offsets[span.end] - offsets[span.start]
+            if group and group_size + size > self.chunk_size:
+                chunks.extend(self._make_chunk(lines, group, prefix))
+                group, group_size = [], 0
+            if size > self.chunk_size:
+                chunks.extend(self._window(lines, sizes, span, prefix))
+                continue
+            group.append(span)
+            group_size += size
+        chunks.extend(self._make_chunk(lines, group, prefix))
+        return chunks
+
+    def _window(self, lines: List[str], sizes: List[int], span: Span, prefix: Optional[str]) -> List[Chunk]:
+        """Line windows of up to chunk_size, each overlapping the last by up to chunk_overlap chars"""
+        windows = []
+        start = span.start
+        while start < span.end:
+            end, size = start, 0
+            while end < span.end and (end == start or size + sizes[end] <= self.chunk_size):
+                size += sizes[end]
+                end += 1
+            windows.append((start, end))
+            if end >= span.end:
+                break
+            next_start, overlap = end, 0
+            while next_start - 1 > start and overlap + sizes[next_start - 1] <= self.chunk_overlap:
+                next_start -= 1
+                overlap += sizes[next_start]
+            start = next_start
+
+        chunks = []
+        for part, (start, end) in enumerate(windows, 1):
+            piece = Span(start, end, span.symbol, span.kind)
+            label = f"part {part}/{len(windows)}" if len(windows) > 1 else None
+            chunks.extend(self._make_chunk(lines, [piece], prefix, label))
+        return chunks
+
+    @staticmethod
+    def _make_chunk(
+        lines: List[str], spans: List[Span], prefix: Optional[str], part: Optional[str] = None
+    ) -> List[Chunk]:
+        if not spans:
+            return []
+        start, end = spans[0].start, spans[-1].end
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        while start < end and not lines[start].strip():
+            start += 1
+        if start == end:
+            return []
+
+        named = [s for s in spans if s.symbol]
+        symbol = ", ".join(s.symbol for s in named[:4]) + (f" +{len(named) - 4} more" if len(named) > 4 else "")
+        kinds = {s.kind for s in named}
+        kind = kinds.pop() if len(kinds) == 1 else ""
+        text = '\n'.join(lines[start:end])
+        if prefix and symbol:
+            label = f"{symbol} ({kind})" if len(named) == 1 and kind else symbol
+            if part:
+                label += f" [{part}]"
+            text = f"{prefix} {label}\n{text}"
+        return [Chunk(start + 1, end, text, symbol, kind)]
@@ -0,0 +1,213 @@
+"""
+AI Flow - Context Builder
+Turns retrieved chunks into prompt context: merged line ranges, no near-duplicates, packed to a budget
+"""
+
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Mersenne prime for the universal hash family used by MinHash
+_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+
+# Rough characters per token for code, as used elsewhere for budgets
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class ContextSpan:
+    """A contiguous run of lines from one file, built from one or more chunks"""
+    file_path: str
+    start_line: int
+    end_line: int
+    lines: List[str]
+    rank: int  # best (lowest) retrieval rank among the merged chunks
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+    def render(self, lines: Optional[List[str]] = None, truncated: bool = False) -> str:
+        lines = self.lines if lines is None else lines
+        end_line = self.start_line + len(lines) - 1
+        note = " [truncated]" if truncated else ""
+        return f"--- {self.file_path} (lines {self.start_line}-{end_line}){note} ---\n" + '\n'.join(lines) + "\n"
+
+
+@dataclass
+class ContextStats:
+    """What the last build did, for logging and comparisons"""
+    chunks: int = 0
+    spans: int = 0
+    merged: int = 0
+    duplicates: int = 0
+    dropped: int = 0
+    truncated: int = 0
+    input_chars: int = 0
+    output_chars: int = 0
+    duplicate_paths: List[str] = field(default_factory=list)
+
+
+def chunk_body(content: str, start_line: int, end_line: int) -> List[str]:
+    """
+    Source lines of a chunk. SyntaxChunker prefixes a one-line symbol header
+    (e.g. `// UsersService.findAll (method)`) that is not part of the file;
+    it is recognised by the line count and dropped.
+    """
+    lines = content.split('\n')
+    if len(lines) == end_line - start_line + 2:
+        lines = lines[1:]
+    return lines
+
+
+def merge_chunks(chunks: Sequence) -> List[ContextSpan]:
+    """
+    Coalesce chunks of the same file whose line ranges overlap or touch into
+    single spans. `chunks` are in retrieval order (best first); spans come
+    back in the order of their best chunk.
+    """
+    by_file: Dict[str, List[tuple]] = {}
+    for rank, chunk in enumerate(chunks):
+        body = chunk_body(chunk.content, chunk.start_line, chunk.end_line)
+        by_file.setdefault(chunk.file_path, []).append((chunk.start_line, chunk.end_line, rank, body))
+
+    spans: List[ContextSpan] = []
+    for path, items in by_file.items():
+        items.sort(key=lambda item: (item[0], item[1]))
+        current: Optional[ContextSpan] = None
+        for start, end, rank, body in items:
+            if current is not None and start <= current.end_line + 1:
+                if end > current.end_line:
+                    current.lines.extend(body[current.end_line - start + 1:])
+                    current.end_line = end
+                current.rank = min(current.rank, rank)
+                continue
+            current = ContextSpan(path, start, end, list(body), rank)
+            spans.append(current)
+
+    spans.sort(key=lambda span: span.rank)
+    return spans
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles. The fraction of equal signature
+    positions estimates the Jaccard similarity of two texts' shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        # 32-bit coefficients and 32-bit shingle hashes keep a * x + b below 2^64
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        size = self.shingle_size
+        shingles = {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # (a * x + b) mod p for every permutation and shingle
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % np.uint64(_PRIME)
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+
+class ContextBuilder:
+    """
+    Builds the codebase context block of a prompt from retrieved chunks:
+
+    1. chunks of the same file whose line ranges overlap or are adjacent
+       (e.g. the overlapping windows of a large declaration) become one span
+       with a single header;
+    2. spans whose text is a near-duplicate (MinHash Jaccard estimate at or
+       above `dedupe_threshold`) of a better-ranked span are dropped, which
+       catches copied code across files;
+    3. spans are packed best first into `max_chars` (or `max_tokens`, at
+       CHARS_PER_TOKEN characters each); the first span that does not fit is
+       cut at a line boundary if enough budget is left, the rest are dropped.
+    """
+
+    # Below this many characters of budget left, a span is dropped rather than cut
+    MIN_TRUNCATED_CHARS = 300
+
+    def __init__(
+        self,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        dedupe_threshold: float = 0.8,
+        shingle_size: int = 5,
+        num_perm: int = 64,
+    ):
+        budgets = [b for b in (max_chars, max_tokens and max_tokens * CHARS_PER_TOKEN) if b]
+        self.max_chars = min(budgets) if budgets else None
+        self.dedupe_threshold = dedupe_threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self.stats = ContextStats()
+
+    def dedupe(self, spans: List[ContextSpan]) -> List[ContextSpan]:
+        """Drop spans that are near-duplicates of a better-ranked one"""
+        if self.dedupe_threshold >= 1.0:
+            return spans
+        kept: List[ContextSpan] = []
+        signatures: List[np.ndarray] = []
+        for span in spans:
+            signature = self.hasher.signature(span.text)
+            if any(self.hasher.similarity(signature, s) >= self.dedupe_threshold for s in signatures):
+                self.stats.duplicates += 1
+                self.stats.duplicate_paths.append(span.file_path)
+                continue
+            kept.append(span)
+            signatures.append(signature)
+        return kept
+
+    def pack(self, spans: List[ContextSpan]) -> List[str]:
+        """Render spans best first until the character budget is used up"""
+        parts: List[str] = []
+        used = 0
+        for i, span in enumerate(spans):
+            rendered = span.render()
+            if self.max_chars is None or used + len(rendered) <= self.max_chars:
+                parts.append(rendered)
+                used += len(rendered)
+                continue
+            remaining = self.max_chars - used
+            if remaining >= self.MIN_TRUNCATED_CHARS:
+                lines, size = [], len(span.render([], truncated=True))
+                for line in span.lines:
+                    if size + len(line) + 1 > remaining:
+                        break
+                    lines.append(line)
+                    size += len(line) + 1
+                if lines:
+                    parts.append(span.render(lines, truncated=True))
+                    self.stats.truncated += 1
+                    i += 1
+            self.stats.dropped += len(spans) - i
+            break
+        return parts
+
+    def build(self, chunks: Sequence) -> str:
+        """Context text for chunks in retrieval order (best first)"""
+        self.stats = ContextStats(chunks=len(chunks))
+        self.stats.input_chars = sum(
+            len(f"--- {c.file_path} (lines {c.start_line}-{c.end_line}) ---\n{c.content}\n") for c in chunks
+        )
+        spans = merge_chunks(chunks)
+        self.stats.merged = len(chunks) - len(spans)
+        spans = self.dedupe(spans)
+        self.stats.spans = len(spans)
+        parts = self.pack(spans)
+        context = "\n".join(parts)
+        self.stats.output_chars = len(context)
+        return context
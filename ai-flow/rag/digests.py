@@ -0,0 +1,259 @@
+"""
+AI Flow - Document Digests
+Compact structured digests of project documents, cached on disk by content hash
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)\s*([\w+-]*)")
+_ENDPOINT = re.compile(r"\b(GET|POST|PUT|PATCH|DELETE)\s+(/[\w\-./{}:]*)")
+_CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[\"`]?(\w+)", re.IGNORECASE)
+_COLUMN = re.compile(r"^[\"`]?(\w+)[\"`]?\s*(\(([^)]*)\))?")
+_REFERENCES = re.compile(r"REFERENCES\s+[\"`]?(\w+)", re.IGNORECASE)
+_MODEL = re.compile(r"^\s*model\s+(\w+)\s*\{")
+_ER_ENTITY = re.compile(r"^\s*(\w+)\s*\{\s*$")
+_CLASS = re.compile(r"^\s*class\s+(\w+)")
+_BULLET = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.*)")
+_KEY_VALUE = re.compile(r"^\*\*([^*]+)\*\*\s*[:\-–]\s*(.+)")
+_MARKUP = re.compile(r"[*_`]+")
+
+# Bullets under these headings, or containing these words, are constraints
+_CONSTRAINT_HEADINGS = re.compile(
+    r"requirement|constraint|rule|security|performance|compliance|limit|validation|"
+    r"yêu cầu|ràng buộc|quy tắc|bảo mật|hiệu suất",
+    re.IGNORECASE,
+)
+_CONSTRAINT_WORDS = re.compile(
+    r"\b(must|shall|required|mandatory|unique|at least|at most|no more than|maximum|minimum|"
+    r"within|phải|bắt buộc|tối đa|tối thiểu|không được)\b|[<>≤≥]\s*\d",
+    re.IGNORECASE,
+)
+# "**Choice**: reason" bullets under these headings are decisions
+_DECISION_HEADINGS = re.compile(
+    r"stack|decision|justification|choice|pattern|principle|strategy|approach|architecture|"
+    r"quyết định|lựa chọn|chiến lược|kiến trúc",
+    re.IGNORECASE,
+)
+_TABLE_KEYWORDS = {"PRIMARY", "UNIQUE", "FOREIGN", "CONSTRAINT", "CHECK", "INDEX", "KEY", "EXCLUDE"}
+
+MAX_ITEM_CHARS = 200
+
+
+class DocDigest(BaseModel):
+    """What a document defines, without its prose"""
+    filename: str
+    content_hash: str
+    title: str = ""
+    chars: int = 0  # size of the source document
+    entities: List[str] = []
+    tables: List[str] = []  # "users (id, tenantId -> tenants, email, ...)"
+    endpoints: List[str] = []  # "POST /auth/login"
+    constraints: List[str] = []
+    decisions: List[str] = []
+    outline: List[str] = []  # section headings, shown when nothing else was found
+
+    def render(self, max_items: int = 25) -> str:
+        """Prompt text; long lists are cut to `max_items` with a count of the rest"""
+        def items(values: List[str]) -> List[str]:
+            rest = len(values) - max_items
+            return values[:max_items] + ([f"... {rest} more"] if rest > 0 else [])
+
+        lines = [f"=== {self.filename} (digest){' - ' + self.title if self.title else ''} ==="]
+        if self.entities:
+            lines.append("Entities: " + ", ".join(items(self.entities)))
+        if self.tables:
+            lines.append("Tables:")
+            lines += [f"- {t}" for t in items(self.tables)]
+        if self.endpoints:
+            lines.append("Endpoints: " + ", ".join(items(self.endpoints)))
+        if self.constraints:
+            lines.append("Constraints:")
+            lines += [f"- {c}" for c in items(self.constraints)]
+        if self.decisions:
+            lines.append("Decisions:")
+            lines += [f"- {d}" for d in items(self.decisions)]
+        if len(lines) == 1 and self.outline:
+            lines.append("Sections: " + "; ".join(items(self.outline)))
+        return "\n".join(lines) + "\n"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def _clean(text: str) -> str:
+    text = _MARKUP.sub("", text).strip()
+    return text if len(text) <= MAX_ITEM_CHARS else text[:MAX_ITEM_CHARS - 3].rstrip() + "..."
+
+
+def _append(values: List[str], seen: set, value: str) -> None:
+    if value and value.lower() not in seen:
+        seen.add(value.lower())
+        values.append(value)
+
+
+def _blocks(content: str) -> Iterator[Tuple[List[str], str, List[str]]]:
+    """
+    (heading path, language, lines) runs of a markdown document. Prose runs
+    have language ""; fenced blocks have their info string, or "code".
+    """
+    headings: List[Tuple[int, str]] = []
+    prose: List[str] = []
+    fence: Optional[Tuple[str, str]] = None
+    code: List[str] = []
+    for line in content.split('\n'):
+        match = _FENCE.match(line)
+        if fence is not None:
+            if match and match.group(1) == fence[0]:
+                yield [h for _, h in headings], fence[1], code
+                fence, code = None, []
+            else:
+                code.append(line)
+            continue
+        if match:
+            if prose:
+                yield [h for _, h in headings], "", prose
+                prose = []
+            fence = (match.group(1), match.group(2).lower() or "code")
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            if prose:
+                yield [h for _, h in headings], "", prose
+                prose = []
+            level = len(heading.group(1))
+            headings = [h for h in headings if h[0] < level] + [(level, _clean(heading.group(2)))]
+            continue
+        prose.append(line)
+    if fence is not None and code:
+        yield [h for _, h in headings], fence[1], code
+    if prose:
+        yield [h for _, h in headings], "", prose
+
+
+def _sql_tables(lines: List[str]) -> Iterator[Tuple[str, List[str]]]:
+    """(name, ["col", "col -> referenced", "unique(a,b)", ...]) for each CREATE TABLE statement"""
+    current: Optional[str] = None
+    columns: List[str] = []
+    for line in lines:
+        match = _CREATE_TABLE.search(line)
+        if match:
+            current, columns = match.group(1), []
+            continue
+        if current is None:
+            continue
+        stripped = line.strip()
+        if stripped.startswith(')'):
+            yield current, columns
+            current = None
+            continue
+        column = _COLUMN.match(stripped)
+        if not column:
+            continue
+        name = column.group(1)
+        if name.upper() in _TABLE_KEYWORDS:
+            if name.upper() == "UNIQUE" and column.group(3):
+                columns.append(f"unique({column.group(3).replace(' ', '')})")
+            continue
+        reference = _REFERENCES.search(stripped)
+        columns.append(f"{name} -> {reference.group(1)}" if reference else name)
+    if current is not None:
+        yield current, columns
+
+
+def extract_digest(filename: str, content: str) -> DocDigest:
+    """
+    Digest of a markdown document, extracted without any model call:
+
+    entities     erDiagram entities, Prisma models and classDiagram classes
+    tables       CREATE TABLE statements with their columns and references
+    endpoints    HTTP method + path anywhere in the text or code blocks
+    constraints  bullets under requirement/security/rule headings, or that
+                 state a rule (must, required, at least, < 200ms, ...)
+    decisions    "**Choice**: reason" bullets under stack/decision/strategy headings
+    """
+    digest = DocDigest(filename=filename, content_hash=content_hash(content), chars=len(content))
+    seen: Dict[str, set] = {name: set() for name in ("entities", "endpoints", "constraints", "decisions", "outline")}
+    # A table can be sketched early and defined in full later: keep the fullest definition
+    tables: Dict[str, List[str]] = {}
+
+    for match in _ENDPOINT.finditer(content):
+        path = match.group(2).rstrip('.:/') or '/'
+        _append(digest.endpoints, seen["endpoints"], f"{match.group(1)} {path}")
+
+    for path, language, lines in _blocks(content):
+        if not digest.title and path:
+            digest.title = path[0]
+        if language:
+            er_diagram = any(line.strip() == "erDiagram" for line in lines)
+            for line in lines:
+                match = _MODEL.match(line) or _CLASS.match(line) or (er_diagram and _ER_ENTITY.match(line))
+                if match:
+                    _append(digest.entities, seen["entities"], match.group(1))
+            for name, columns in _sql_tables(lines):
+                if len(columns) > len(tables.get(name, [])):
+                    tables[name] = columns
+            continue
+
+        heading = path[-1] if path else ""
+        for section in path[1:3]:
+            _append(digest.outline, seen["outline"], section)
+        constraint_section = any(_CONSTRAINT_HEADINGS.search(h) for h in path[1:])
+        decision_section = any(_DECISION_HEADINGS.search(h) for h in path[1:])
+        for line in lines:
+            bullet = _BULLET.match(line)
+            if not bullet:
+                continue
+            text = bullet.group(1).strip()
+            key_value = _KEY_VALUE.match(text)
+            if decision_section and key_value:
+                _append(digest.decisions, seen["decisions"], _clean(f"{key_value.group(1)}: {key_value.group(2)}"))
+            elif constraint_section or _CONSTRAINT_WORDS.search(text):
+                item = _clean(text)
+                if len(item) > 3:
+                    _append(digest.constraints, seen["constraints"], f"[{heading}] {item}" if heading else item)
+    digest.tables = [f"{name} ({', '.join(columns)})" for name, columns in tables.items()]
+    return digest
+
+
+class DigestStore:
+    """
+    DocDigests on disk, one JSON file per document content hash. A document
+    is only digested again when its text (or the extractor version) changes;
+    renamed or copied documents reuse the stored digest.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest_hash: str) -> Optional[Path]:
+        return self.directory / f"v{self.VERSION}-{digest_hash}.json" if self.directory else None
+
+    def get(self, filename: str, content: str) -> DocDigest:
+        path = self._path(content_hash(content))
+        if path is not None and path.exists():
+            try:
+                digest = DocDigest(**json.loads(path.read_text(encoding='utf-8')))
+                self.hits += 1
+                return digest.model_copy(update={"filename": filename})
+            except (ValueError, TypeError):
+                pass  # unreadable or from an older layout: rebuild it
+        self.misses += 1
+        digest = extract_digest(filename, content)
+        if path is not None:
+            path.write_text(digest.model_dump_json(), encoding='utf-8')
+        return digest
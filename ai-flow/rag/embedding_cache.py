@@ -0,0 +1,272 @@
+"""
+AI Flow - Embedding Cache
+Persistent, content-addressed store for chunk and query embeddings
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# SQLite limits the number of host parameters per statement
+_SQL_BATCH = 500
+
+
+def _batched(items: Sequence, size: int = _SQL_BATCH) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FileRecord:
+    """Cached chunk layout of a single file, valid while mtime/size are unchanged"""
+
+    __slots__ = ("mtime_ns", "size", "chunker", "blob_sha", "chunks")
+
+    def __init__(
+        self,
+        mtime_ns: int,
+        size: int,
+        chunker: str,
+        blob_sha: Optional[str],
+        chunks: List[Tuple[str, int, int, str]],
+    ):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.chunker = chunker
+        self.blob_sha = blob_sha  # git blob SHA, when the file was clean in a checkout
+        self.chunks = chunks  # [(chunk_hash, start_line, end_line, kind), ...]
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding store keyed by (embedding model, chunk_hash).
+
+    Also remembers how every indexed file was chunked so that files whose
+    mtime and size are unchanged can be skipped without reading them, and
+    caches query embeddings so repeated retrievals cost no API calls.
+    """
+
+    DB_NAME = "embeddings.sqlite3"
+    MAX_QUERIES = 5000
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / self.DB_NAME
+        # Query embeddings may be looked up from worker threads (asearch_many)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _create_tables(self) -> None:
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, chunk_hash)
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                chunker TEXT NOT NULL,
+                blob_sha TEXT,
+                PRIMARY KEY (root, path)
+            );
+            CREATE TABLE IF NOT EXISTS file_chunks (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                ordinal INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                start_line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL,
+                kind TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (root, path, ordinal)
+            );
+            CREATE INDEX IF NOT EXISTS idx_file_chunks_hash ON file_chunks (chunk_hash);
+            CREATE TABLE IF NOT EXISTS queries (
+                model TEXT NOT NULL,
+                query_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, query_hash)
+            );
+        """)
+        # Caches created before blob SHAs were tracked
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        if "blob_sha" not in columns:
+            self._conn.execute("ALTER TABLE files ADD COLUMN blob_sha TEXT")
+        # Caches created before chunk kinds were tracked: their layouts lack
+        # kinds, so forget them and let the files be re-chunked
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(file_chunks)")}
+        if "kind" not in columns:
+            self._conn.execute("ALTER TABLE file_chunks ADD COLUMN kind TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("DELETE FROM files")
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # Chunk embeddings
+
+    def get_embeddings(self, model: str, chunk_hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the given hashes; missing hashes are omitted"""
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(chunk_hashes))
+        for batch in _batched(unique):
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                (model, *batch),
+            )
+            for chunk_hash, blob in rows:
+                found[chunk_hash] = np.frombuffer(blob, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_embeddings(self, model: str, vectors: Dict[str, Sequence[float]]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, chunk_hash, vector) VALUES (?, ?, ?)",
+            [
+                (model, chunk_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                for chunk_hash, vector in vectors.items()
+            ],
+        )
+        self._conn.commit()
+
+    # File manifests
+
+    def get_file(self, root: str, path: str) -> Optional[FileRecord]:
+        row = self._conn.execute(
+            "SELECT mtime_ns, size, chunker, blob_sha FROM files WHERE root = ? AND path = ?",
+            (root, path),
+        ).fetchone()
+        if row is None:
+            return None
+        chunks = self._conn.execute(
+            "SELECT chunk_hash, start_line, end_line, kind FROM file_chunks "
+            "WHERE root = ? AND path = ? ORDER BY ordinal",
+            (root, path),
+        ).fetchall()
+        return FileRecord(row[0], row[1], row[2], row[3], chunks)
+
+    def put_file(
+        self,
+        root: str,
+        path: str,
+        mtime_ns: int,
+        size: int,
+        chunker: str,
+        chunks: List[Tuple[str, int, int, str, str]],
+        blob_sha: Optional[str] = None,
+    ) -> None:
+        """Record a file's chunk layout; chunks are (hash, start_line, end_line, content, kind)"""
+        self._conn.execute("DELETE FROM file_chunks WHERE root = ? AND path = ?", (root, path))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (root, path, mtime_ns, size, chunker, blob_sha) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (root, path, mtime_ns, size, chunker, blob_sha),
+        )
+        self._conn.executemany(
+            "INSERT INTO file_chunks (root, path, ordinal, chunk_hash, start_line, end_line, kind) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(root, path, i, h, start, end, kind) for i, (h, start, end, _, kind) in enumerate(chunks)],
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO chunks (chunk_hash, content) VALUES (?, ?)",
+            [(h, content) for h, _, _, content, _ in chunks],
+        )
+        self._conn.commit()
+
+    def get_chunk_contents(self, chunk_hashes: Sequence[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        unique = list(dict.fromkeys(chunk_hashes))
+        for batch in _batched(unique):
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT chunk_hash, content FROM chunks WHERE chunk_hash IN ({placeholders})",
+                tuple(batch),
+            )
+            found.update(rows)
+        return found
+
+    # Query embeddings
+
+    @staticmethod
+    def _query_hash(query: str) -> str:
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def get_query_embedding(self, model: str, query: str) -> Optional[np.ndarray]:
+        query_hash = self._query_hash(query)
+        row = self._conn.execute(
+            "SELECT vector FROM queries WHERE model = ? AND query_hash = ?",
+            (model, query_hash),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute(
+            "UPDATE queries SET last_used = ? WHERE model = ? AND query_hash = ?",
+            (time.time(), model, query_hash),
+        )
+        self._conn.commit()
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def put_query_embedding(self, model: str, query: str, vector: Sequence[float]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO queries (model, query_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            (model, self._query_hash(query), np.asarray(vector, dtype=np.float32).tobytes(), time.time()),
+        )
+        self._conn.commit()
+
+    # Garbage collection
+
+    def collect_garbage(self, root: str, live_paths: Iterable[str]) -> Dict[str, int]:
+        """
+        Forget files under `root` that no longer exist, then drop chunk texts
+        and embeddings that no file references anymore. Query embeddings are
+        trimmed to the MAX_QUERIES most recently used.
+        """
+        live = set(live_paths)
+        known = [p for (p,) in self._conn.execute("SELECT path FROM files WHERE root = ?", (root,))]
+        removed = [p for p in known if p not in live]
+        for batch in _batched(removed):
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM files WHERE root = ? AND path IN ({placeholders})", (root, *batch))
+            self._conn.execute(f"DELETE FROM file_chunks WHERE root = ? AND path IN ({placeholders})", (root, *batch))
+
+        chunks_removed = self._conn.execute(
+            "DELETE FROM chunks WHERE chunk_hash NOT IN (SELECT chunk_hash FROM file_chunks)"
+        ).rowcount
+        embeddings_removed = self._conn.execute(
+            "DELETE FROM embeddings WHERE chunk_hash NOT IN (SELECT chunk_hash FROM chunks)"
+        ).rowcount
+        queries_removed = self._conn.execute(
+            "DELETE FROM queries WHERE rowid NOT IN "
+            "(SELECT rowid FROM queries ORDER BY last_used DESC LIMIT ?)",
+            (self.MAX_QUERIES,),
+        ).rowcount
+        self._conn.commit()
+
+        return {
+            "files": len(removed),
+            "chunks": chunks_removed,
+            "embeddings": embeddings_removed,
+            "queries": queries_removed,
+        }
@@ -0,0 +1,212 @@
+"""
+AI Flow - Embedding Generation
+Batched, concurrent embedding calls that keep the event loop responsive
+"""
+
+import asyncio
+import json
+import urllib.request
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+
+from rag.lexical import tokenize_code
+
+
+# (completed_items, total_items)
+ProgressCallback = Callable[[int, int], None]
+
+# A blocking function that embeds a list of texts in one provider request
+BatchEmbedFn = Callable[[List[str]], List[List[float]]]
+
+# Gemini's batchEmbedContents accepts at most 100 texts per request
+GEMINI_MAX_BATCH = 100
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+
+class EmbeddingProvider(ABC):
+    """
+    An embedding model. `name` identifies the model in index manifests and
+    cache keys, so vectors from different models are never mixed.
+    """
+
+    # Largest number of texts sent in one request
+    max_batch: int = GEMINI_MAX_BATCH
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        pass
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts to be indexed, in one request (blocking)"""
+        pass
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed search queries; same space as embed_documents"""
+        return self.embed_documents(texts)
+
+
+class GeminiEmbedder(EmbeddingProvider):
+    """Gemini embedding API via batchEmbedContents (needs GOOGLE_API_KEY)"""
+
+    def __init__(self, model: str = "models/embedding-001"):
+        self.model = model
+
+    @property
+    def name(self) -> str:
+        # Bare model name, as used by indexes and caches built before providers existed
+        return self.model
+
+    def _embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        import google.generativeai as genai
+        result = genai.embed_content(model=self.model, content=texts, task_type=task_type)
+        return result['embedding']
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "retrieval_document")
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "retrieval_query")
+
+
+class OllamaEmbedder(EmbeddingProvider):
+    """Local embeddings from Ollama's /api/embed endpoint, many texts per request"""
+
+    def __init__(self, model: str = "nomic-embed-text", base_url: str = OLLAMA_BASE_URL, max_batch: int = 64):
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.max_batch = max_batch
+
+    @property
+    def name(self) -> str:
+        return f"ollama/{self.model}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        request = urllib.request.Request(
+            f"{self.base_url}/api/embed",
+            data=json.dumps({"model": self.model, "input": texts}).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return json.loads(response.read())["embeddings"]
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Deterministic CPU embedder for tests and air-gapped use. Code-aware
+    tokens and token bigrams are feature-hashed (CRC32) into `dim` signed
+    buckets, i.e. a sparse random projection of the bag of words. No model,
+    no network; similarity is lexical rather than semantic.
+    """
+
+    max_batch = 1000
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    @property
+    def name(self) -> str:
+        return f"hash/{self.dim}"
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            h = zlib.crc32(feature.encode('utf-8'))
+            bucket = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            if len(self._buckets) < 1_000_000:
+                self._buckets[feature] = bucket
+        return bucket
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize_code(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                index, sign = self._bucket(feature)
+                vectors[row, index] += sign
+        # Sublinear term frequency, then unit length
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+
+def create_embedder(spec: str, ollama_base_url: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Build the provider named by rag.embedding_model:
+
+        models/embedding-001, gemini/<model>   Gemini API
+        ollama/<model>                         local Ollama server
+        hash, hash/<dim>                       deterministic hashing embedder
+    """
+    if spec.startswith("ollama/"):
+        return OllamaEmbedder(spec[len("ollama/"):], base_url=ollama_base_url or OLLAMA_BASE_URL)
+    if spec == "hash" or spec.startswith("hash/"):
+        return HashingEmbedder(int(spec.split("/", 1)[1]) if "/" in spec else 384)
+    if spec.startswith("gemini/"):
+        spec = "models/" + spec[len("gemini/"):]
+    return GeminiEmbedder(spec)
+
+
+async def embed_in_batches(
+    texts: Sequence[str],
+    embed_batch: BatchEmbedFn,
+    batch_size: int = GEMINI_MAX_BATCH,
+    concurrency: int = 4,
+    max_attempts: int = 3,
+    on_progress: Optional[ProgressCallback] = None,
+    on_batch: Optional[Callable[[int, List[List[float]]], None]] = None,
+) -> List[Optional[List[float]]]:
+    """
+    Embed `texts` in batches of `batch_size`, running at most `concurrency`
+    batches at a time on the default executor so the event loop keeps running.
+
+    Each batch is retried independently with exponential backoff. Batches that
+    still fail leave None in their slots instead of aborting the whole run.
+    `on_batch(offset, vectors)` is called on the event loop as each batch lands,
+    which lets callers persist results incrementally.
+    """
+    total = len(texts)
+    results: List[Optional[List[float]]] = [None] * total
+    if total == 0:
+        return results
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+
+    async def run_batch(offset: int) -> None:
+        nonlocal done
+        batch = list(texts[offset:offset + batch_size])
+        async with semaphore:
+            try:
+                async for attempt in AsyncRetrying(
+                    reraise=True,
+                    stop=stop_after_attempt(max_attempts),
+                    wait=wait_exponential(multiplier=1, min=1, max=30),
+                ):
+                    with attempt:
+                        vectors = await loop.run_in_executor(None, embed_batch, batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+            except Exception as e:
+                print(f"Error embedding batch at {offset} ({len(batch)} texts): {e}")
+                return
+
+        results[offset:offset + len(batch)] = vectors
+        if on_batch:
+            on_batch(offset, vectors)
+        done += len(batch)
+        if on_progress:
+            on_progress(done, total)
+
+    await asyncio.gather(*(run_batch(offset) for offset in range(0, total, batch_size)))
+    return results
@@ -0,0 +1,231 @@
+"""
+AI Flow - Federated Index
+Searches several codebase / docs roots, each with its own persistent index shard
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rag.context import ContextBuilder
+from rag.indexer import CodeChunk, CodebaseIndexer, DocSection, DocumentIndexer, TaskContextSource
+from rag.lexical import reciprocal_rank_fusion
+from rag.metadata import ChunkFilter
+
+
+@dataclass
+class RootSpec:
+    """A root given on the command line as `[name=]path[@weight]`"""
+    path: str
+    name: str
+    weight: float = 1.0
+
+
+def parse_root(spec: str) -> RootSpec:
+    """
+    Parse `[name=]path[@weight]`, e.g. `api=../backend@1.5`. The name
+    defaults to the directory name and namespaces the root's results.
+    """
+    name, sep, path = spec.partition('=')
+    if not sep:
+        name, path = "", spec
+    weight = 1.0
+    base, at, suffix = path.rpartition('@')
+    if at:
+        try:
+            weight = float(suffix)
+            path = base
+        except ValueError:
+            pass  # an '@' that is part of the path
+    if weight <= 0:
+        raise ValueError(f"Root weight must be positive: {spec}")
+    return RootSpec(path=path, name=name or Path(path).resolve().name, weight=weight)
+
+
+def parse_roots(specs: Sequence[str]) -> List[RootSpec]:
+    """parse_root for every spec, making repeated names unique (api, api-2, ...)"""
+    roots, seen = [], {}
+    for spec in specs:
+        root = parse_root(spec)
+        seen[root.name] = seen.get(root.name, 0) + 1
+        if seen[root.name] > 1:
+            root.name = f"{root.name}-{seen[root.name]}"
+        roots.append(root)
+    return roots
+
+
+@dataclass
+class IndexShard:
+    """One root's own index, with the name and weight its results get when merged"""
+    name: str
+    indexer: object  # CodebaseIndexer or DocumentIndexer
+    weight: float = 1.0
+
+    def namespaced(self, path: str) -> str:
+        return f"{self.name}:{path}"
+
+
+def _fuse_shards(shards: Sequence[IndexShard], rankings: Sequence[Sequence], top_k: int, fusion_k: int) -> List[tuple]:
+    """
+    Weighted reciprocal-rank fusion of one query's ranked results from every
+    shard. Scores of different shards are not comparable (BM25 statistics and
+    fusion are per shard), ranks are. Returns (shard, item) pairs, best first.
+    """
+    offsets = np.cumsum([0] + [len(r) for r in rankings])
+    fused = reciprocal_rank_fusion(
+        [[int(offsets[s]) + j for j in range(len(r))] for s, r in enumerate(rankings)],
+        k=fusion_k,
+        weights=[shard.weight for shard in shards],
+    )
+    owner = np.searchsorted(offsets, [i for i, _ in fused[:top_k]], side="right") - 1
+    return [(shards[s], rankings[s][i - offsets[s]]) for s, (i, _) in zip(owner, fused[:top_k])]
+
+
+class FederatedCodebaseIndexer(TaskContextSource):
+    """
+    Code search over several roots (e.g. backend, frontend, shared types),
+    each indexed by its own CodebaseIndexer into its own persistent store,
+    so adding a root never re-indexes the others.
+
+    A search embeds the queries once per embedding model, fans out to every
+    shard concurrently, and merges the shards' top-k by weighted
+    reciprocal-rank fusion. Result paths are namespaced as `name:path`.
+    """
+
+    def __init__(self, shards: List[IndexShard], context_config: Optional[dict] = None, fusion_k: int = 60):
+        if not shards:
+            raise ValueError("A federated index needs at least one shard")
+        self.shards = shards
+        self.fusion_k = fusion_k
+        self.context_builder = ContextBuilder(**(context_config or {}))
+
+    def _live(self) -> List[IndexShard]:
+        return [s for s in self.shards if s.indexer.store is not None and s.indexer.store.count > 0]
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(s.indexer.chunk_count for s in self.shards)
+
+    def count_matching(self, chunk_filter: Optional[ChunkFilter]) -> int:
+        return sum(s.indexer.count_matching(chunk_filter) for s in self._live())
+
+    def _query_vectors(self, shards: List[IndexShard], queries: List[str], mode: Optional[str]) -> Dict[str, np.ndarray]:
+        """The queries embedded once per embedding model used by a vector-searching shard"""
+        vectors: Dict[str, np.ndarray] = {}
+        for shard in shards:
+            indexer: CodebaseIndexer = shard.indexer
+            if (mode or indexer.search_mode) == "lexical" or not indexer._has_vectors:
+                continue
+            if indexer.embedding_model not in vectors:
+                vectors[indexer.embedding_model] = indexer._embed_queries(queries)
+        return vectors
+
+    def _merge(self, shards: List[IndexShard], results: List[List[List[CodeChunk]]], top_k: int) -> List[List[CodeChunk]]:
+        merged = []
+        for per_query in zip(*results):
+            merged.append([
+                chunk.model_copy(update={"file_path": shard.namespaced(chunk.file_path)})
+                for shard, chunk in _fuse_shards(shards, per_query, top_k, self.fusion_k)
+            ])
+        return merged
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        chunk_filter: Optional[ChunkFilter] = None,
+    ) -> List[CodeChunk]:
+        return self.search_many([query], top_k, mode, chunk_filter)[0]
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        chunk_filter: Optional[ChunkFilter] = None,
+    ) -> List[List[CodeChunk]]:
+        """Search every shard in its own thread and merge the rankings"""
+        shards = self._live()
+        if not queries or not shards:
+            return [[] for _ in queries]
+        vectors = self._query_vectors(shards, queries, mode)
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            results = list(pool.map(
+                lambda s: s.indexer.search_many(
+                    queries, top_k, mode, chunk_filter, query_vectors=vectors.get(s.indexer.embedding_model)
+                ),
+                shards,
+            ))
+        return self._merge(shards, results, top_k)
+
+    async def asearch_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        chunk_filter: Optional[ChunkFilter] = None,
+    ) -> List[List[CodeChunk]]:
+        """search_many for the workflow's event loop: shards are searched concurrently"""
+        shards = self._live()
+        if not queries or not shards:
+            return [[] for _ in queries]
+        vectors = await asyncio.to_thread(self._query_vectors, shards, queries, mode)
+        results = await asyncio.gather(*(
+            s.indexer.asearch_many(
+                queries, top_k, mode, chunk_filter, query_vectors=vectors.get(s.indexer.embedding_model)
+            )
+            for s in shards
+        ))
+        return self._merge(shards, list(results), top_k)
+
+
+class FederatedDocumentIndexer(DocumentIndexer):
+    """
+    Documentation from several roots, each a DocumentIndexer with its own
+    persisted BM25 index and digests. Documents, sections and digests are
+    exposed under `name:filename`, so doc type matching, section text and
+    digests work as for a single root; search merges the shards' rankings
+    by weighted reciprocal-rank fusion (BM25 scores are per shard).
+    """
+
+    def __init__(self, shards: List[IndexShard], fusion_k: int = 60):
+        super().__init__()
+        if not shards:
+            raise ValueError("A federated index needs at least one shard")
+        self.shards = shards
+        self.fusion_k = fusion_k
+        self.digest_store = shards[0].indexer.digest_store
+        # Where each shard's sections start in self.sections, to rebase their `parent`
+        self._section_offsets: Dict[str, int] = {}
+        for shard in shards:
+            indexer: DocumentIndexer = shard.indexer
+            for filename, content in indexer.documents.items():
+                self.documents[shard.namespaced(filename)] = content
+                self._encoded[shard.namespaced(filename)] = indexer._encoded[filename]
+            for filename, digest in indexer.digests.items():
+                name = shard.namespaced(filename)
+                self.digests[name] = digest.model_copy(update={"filename": name})
+            self._section_offsets[shard.name] = len(self.sections)
+            self.sections.extend(self._namespaced(shard, s) for s in indexer.sections)
+
+    def _namespaced(self, shard: IndexShard, section: DocSection) -> DocSection:
+        """A shard's section under its `name:filename`, its parent index into self.sections"""
+        offset = self._section_offsets[shard.name]
+        return section.model_copy(update={
+            "filename": shard.namespaced(section.filename),
+            "parent": None if section.parent is None else section.parent + offset,
+        })
+
+    def search(
+        self, query: str, top_k: int = 5, doc_types: Optional[List[str]] = None
+    ) -> List[DocSection]:
+        rankings = [shard.indexer.search(query, top_k, doc_types) for shard in self.shards]
+        return [
+            self._namespaced(shard, section)
+            for shard, section in _fuse_shards(self.shards, rankings, top_k, self.fusion_k)
+        ]
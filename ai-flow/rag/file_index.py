@@ -0,0 +1,138 @@
+"""
+AI Flow - File Index
+Pooled per-file vectors for two-stage (file, then chunk) retrieval
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from rag.vector_store import SCORE_BLOCK_ROWS, normalize_rows
+
+
+class FileIndex:
+    """
+    One vector per file: the normalized mean of its chunks' vectors.
+
+    A query first scores the files and keeps the `top_files` best, then
+    scores only the chunks of those files exactly. The first stage scans one
+    row per file instead of one per chunk, and results come from the modules
+    that match the query as a whole rather than from whichever fragments
+    happen to score highest.
+
+    Rows are grouped by file in CSR form: the chunks of file f are
+    rows[offsets[f]:offsets[f + 1]].
+    """
+
+    FILES = ("file_vectors.npy", "file_offsets.npy", "file_rows.npy", "files.json")
+
+    def __init__(self, vectors: np.ndarray, offsets: np.ndarray, rows: np.ndarray, top_files: int = 20):
+        self.vectors = vectors
+        self.offsets = offsets
+        self.rows = rows
+        self.top_files = top_files
+        # Files without any embedded chunk never match
+        self.valid = np.linalg.norm(vectors, axis=1) > 0 if len(vectors) else np.zeros(0, dtype=bool)
+
+    @property
+    def count(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        path_ids: np.ndarray,
+        has_vector: np.ndarray,
+        file_count: int,
+        top_files: int = 20,
+    ) -> "FileIndex":
+        """Pool chunk vectors per file, reading the (memory-mapped) matrix block by block"""
+        path_ids = np.asarray(path_ids, dtype=np.int64)
+        has_vector = np.asarray(has_vector, dtype=bool)
+        sums = np.zeros((file_count, vectors.shape[1]), dtype=np.float32)
+        for start in range(0, len(path_ids), SCORE_BLOCK_ROWS):
+            labels = path_ids[start:start + SCORE_BLOCK_ROWS]
+            keep = has_vector[start:start + SCORE_BLOCK_ROWS]
+            if not keep.any():
+                continue
+            block = np.asarray(vectors[start:start + len(labels)], dtype=np.float32)[keep]
+            labels = labels[keep]
+            order = np.argsort(labels, kind="stable")
+            labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+            sums[labels[starts]] += np.add.reduceat(block[order], starts, axis=0)
+
+        rows = np.argsort(path_ids, kind="stable")
+        offsets = np.zeros(file_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(path_ids, minlength=file_count), out=offsets[1:])
+        return cls(normalize_rows(sums), offsets, rows, top_files=top_files)
+
+    def file_rows(self, files: np.ndarray) -> np.ndarray:
+        """Sorted row ids of all chunks in the given files"""
+        if len(files) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.rows[self.offsets[f]:self.offsets[f + 1]] for f in files]))
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        top_k: int,
+        top_files: Optional[int] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k chunks for each normalized query, drawn from its best files.
+        `vectors` is the full (memory-mapped) chunk matrix; `allowed` is an
+        optional boolean mask of the rows that may be returned (a filter, and
+        rows that have a vector), applied in both stages.
+        Returns (row_ids, scores) per query, best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        file_scores = queries @ self.vectors.T
+        eligible = self.valid
+        if allowed is not None:
+            # Allowed chunks per file, from a running count over the grouped rows
+            running = np.concatenate([[0], np.cumsum(allowed[self.rows])])
+            eligible = eligible & (running[self.offsets[1:]] > running[self.offsets[:-1]])
+        file_scores[:, ~eligible] = -np.inf
+
+        n_files = min(top_files or self.top_files, int(eligible.sum()))
+        results = []
+        for query, scores in zip(queries, file_scores):
+            if n_files == 0:
+                results.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+                continue
+            best_files = np.argpartition(-scores, n_files - 1)[:n_files]
+            rows = self.file_rows(best_files)
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            chunk_scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+            k = min(top_k, len(rows))
+            best = np.argpartition(-chunk_scores, k - 1)[:k]
+            best = best[np.argsort(-chunk_scores[best], kind="stable")]
+            results.append((rows[best], chunk_scores[best]))
+        return results
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        np.save(directory / "file_vectors.npy", self.vectors)
+        np.save(directory / "file_offsets.npy", self.offsets)
+        np.save(directory / "file_rows.npy", self.rows)
+        (directory / "files.json").write_text(json.dumps({"count": self.count, "top_files": self.top_files}))
+
+    @classmethod
+    def load(cls, directory: Path, top_files: Optional[int] = None) -> Optional["FileIndex"]:
+        directory = Path(directory)
+        if not all((directory / name).exists() for name in cls.FILES):
+            return None
+        meta = json.loads((directory / "files.json").read_text())
+        return cls(
+            np.load(directory / "file_vectors.npy"),
+            np.load(directory / "file_offsets.npy"),
+            np.load(directory / "file_rows.npy", mmap_mode="r"),
+            top_files=top_files or meta["top_files"],
+        )
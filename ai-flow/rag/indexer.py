@@ -3,14 +3,38 @@ AI Flow - RAG (Retrieval Augmented Generation) System
 Indexes existing codebase for context-aware code generation
 """
 
-import os
+import asyncio
+import json
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 import hashlib
 
-import google.generativeai as genai
+import numpy as np
 from pydantic import BaseModel
 
+from rag.ann import IVFIndex, carry_over_labels
+from rag.chroma_store import ChromaStore, chunk_ids, chunk_metadata
+from rag.chunker import SyntaxChunker
+from rag.context import ContextBuilder
+from rag.digests import DigestStore, DocDigest
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import (
+    GEMINI_MAX_BATCH,
+    EmbeddingProvider,
+    ProgressCallback,
+    create_embedder,
+    embed_in_batches,
+)
+from rag.file_index import FileIndex
+from rag.lexical import BM25Builder, BM25Index, reciprocal_rank_fusion, tokenize_code, tokenize_path
+from rag.metadata import ChunkFilter, MetadataIndex
+from rag.quantization import QuantizedIndex
+from rag.vector_store import VectorStore, VectorStoreWriter, normalize_rows
+from rag.walker import DirectoryWalker, WalkEntry, WalkStats, looks_binary, looks_generated
+
 
 class CodeChunk(BaseModel):
     """A chunk of code with metadata"""
@@ -19,15 +43,125 @@ class CodeChunk(BaseModel):
     start_line: int
     end_line: int
     chunk_hash: str
-    embedding: Optional[List[float]] = None
+    kind: str = ""  # declaration kind from the chunker; "" if mixed or unknown
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top-k scores along the last axis, best first.
+    Uses argpartition so only the k winners are sorted, not every score.
+    """
+    n = scores.shape[-1]
+    k = min(top_k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
 
 
-class CodebaseIndexer:
+class TaskContextSource:
+    """
+    Prompt context for tasks on top of search, asearch_many and
+    count_matching; shared by CodebaseIndexer and the federated index over
+    several of them. Subclasses set `context_builder`.
+    """
+    
+    context_builder: ContextBuilder
+    
+    @staticmethod
+    def _filter_key(chunk_filter: ChunkFilter) -> tuple:
+        return tuple(tuple(sorted(v)) for v in (chunk_filter.extensions, chunk_filter.directories, chunk_filter.kinds))
+    
+    def format_context(self, chunks: List[CodeChunk]) -> str:
+        """
+        Render retrieved chunks as prompt context: overlapping or adjacent
+        chunks of a file are merged, near-duplicates dropped and the result
+        packed into the configured budget (see ContextBuilder)
+        """
+        return self.context_builder.build(chunks)
+    
+    def get_context_for_task(self, task_description: str, top_k: int = 5) -> str:
+        """Get relevant code context for a task"""
+        return self.format_context(self.search(task_description, top_k))
+    
+    async def get_contexts_for_tasks(
+        self,
+        task_descriptions: List[str],
+        top_k: int = 5,
+        filters: Optional[List[Optional[ChunkFilter]]] = None,
+    ) -> List[str]:
+        """
+        Code context for a whole task plan: one embedding batch per distinct
+        filter, searched concurrently. A task whose filter matches no indexed
+        chunk (e.g. no .prisma files in the codebase) is searched unfiltered.
+        """
+        filters = filters or [None] * len(task_descriptions)
+        groups: Dict[tuple, Tuple[Optional[ChunkFilter], List[int]]] = {}
+        for i, chunk_filter in enumerate(filters):
+            if chunk_filter is not None and (chunk_filter.is_empty or self.count_matching(chunk_filter) == 0):
+                chunk_filter = None
+            key = self._filter_key(chunk_filter) if chunk_filter else ()
+            groups.setdefault(key, (chunk_filter, []))[1].append(i)
+        
+        contexts = [""] * len(task_descriptions)
+        input_chars = output_chars = merged = duplicates = 0
+        
+        async def search_group(chunk_filter: Optional[ChunkFilter], indices: List[int]) -> None:
+            results = await self.asearch_many(
+                [task_descriptions[i] for i in indices], top_k, chunk_filter=chunk_filter
+            )
+            nonlocal input_chars, output_chars, merged, duplicates
+            for i, chunks in zip(indices, results):
+                contexts[i] = self.format_context(chunks)
+                stats = self.context_builder.stats
+                input_chars += stats.input_chars
+                output_chars += stats.output_chars
+                merged += stats.merged
+                duplicates += stats.duplicates
+        
+        await asyncio.gather(*(search_group(f, indices) for f, indices in groups.values()))
+        if input_chars:
+            print(
+                f"Task context: {output_chars} of {input_chars} chars kept "
+                f"({merged} chunks merged, {duplicates} near-duplicates dropped)"
+            )
+        return contexts
+
+
+class CodebaseIndexer(TaskContextSource):
     """
     Indexes a codebase for RAG-based code generation.
-    Uses Gemini's embedding API (free tier).
+    Embeddings come from the provider named by `embedding_model` (Gemini,
+    a local Ollama model, or the offline hashing embedder).
+    
+    With an EmbeddingCache attached, unchanged files are not re-read and
+    chunks whose content hash was embedded before are not re-embedded.
+    
+    Chunks are streamed into an on-disk VectorStore (memory-mapped vectors,
+    compact metadata arrays, chunk text read lazily) rather than kept in RAM.
+    A BM25 index over the same chunks is stored alongside it; search_mode
+    selects "vector", "lexical" (no embedding calls at all) or "hybrid"
+    (reciprocal-rank fusion of both). With rag.quantization set, exact
+    vector search first scans int8 or binary codes and rescores only the
+    best candidates with the float vectors. With rag.hierarchical enabled,
+    vector search first picks the best files by their pooled vectors and
+    then scores only those files' chunks.
+    
+    With store="chroma" the vectors live in a persistent ChromaDB collection
+    instead (see ChromaStore), shared by every run and process that indexes
+    the same root; chunk text and the BM25 index stay in the local store.
     """
     
+    SEARCH_MODES = ("vector", "lexical", "hybrid")
+    STORES = ("native", "chroma")
+    # Each ranking contributes this many times top_k candidates to fusion
+    FUSION_DEPTH = 4
+    
     SUPPORTED_EXTENSIONS = {
         '.ts', '.tsx', '.js', '.jsx',  # JavaScript/TypeScript
         '.py',  # Python
@@ -44,180 +178,943 @@ class CodebaseIndexer:
         '.turbo', '.vercel', '.cache',
     }
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        embedding_model: str = "models/embedding-001",
+        cache: Optional[EmbeddingCache] = None,
+        embedding_batch_size: int = GEMINI_MAX_BATCH,
+        embedding_concurrency: int = 4,
+        index_dir: Optional[str] = None,
+        vector_dtype: str = "float32",
+        ann_config: Optional[dict] = None,
+        search_mode: str = "hybrid",
+        walker_config: Optional[dict] = None,
+        embedder: Optional[EmbeddingProvider] = None,
+        quantization_config: Optional[dict] = None,
+        store: str = "native",
+        hierarchical_config: Optional[dict] = None,
+        context_config: Optional[dict] = None,
+    ):
+        if search_mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        if store not in self.STORES:
+            raise ValueError(f"Unknown vector store: {store}")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.chunks: List[CodeChunk] = []
-    
-    def _should_index_file(self, path: Path) -> bool:
-        """Check if a file should be indexed"""
-        # Check extension
-        if path.suffix not in self.SUPPORTED_EXTENSIONS:
-            return False
-        
-        # Check if in ignored directory
-        for part in path.parts:
-            if part in self.IGNORE_DIRS:
-                return False
+        self.chunker = SyntaxChunker(chunk_size, chunk_overlap)
+        # The provider's name keys the store manifest and the cache, so
+        # switching models rebuilds the index instead of mixing vectors
+        self.embedder = embedder or create_embedder(embedding_model)
+        self.embedding_model = self.embedder.name
+        self.cache = cache
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_concurrency = embedding_concurrency
+        self.vector_dtype = vector_dtype
+        if index_dir is None:
+            index_dir = (
+                str(cache.cache_dir / "index") if cache
+                else tempfile.mkdtemp(prefix="ai-flow-index-")
+            )
+        self.index_dir = Path(index_dir)
         
-        return True
+        self.store: Optional[VectorStore] = None
+        self._writer: Optional[VectorStoreWriter] = None
+        self._root: Optional[str] = None
+        # Vectors in a Chroma collection instead of vectors.npy (rag.store)
+        self.store_backend = store
+        self.chroma: Optional[ChromaStore] = None
+        self._chroma_rows: Dict[str, int] = {}
+        # Extension/directory/kind lookup for filtered searches
+        self.metadata: Optional[MetadataIndex] = None
+        self._filter_masks: Dict[tuple, np.ndarray] = {}
+        # Optional IVF index over the store (rag.ann in config.yaml)
+        self.ann_config = ann_config or {}
+        self.ann: Optional[IVFIndex] = None
+        # Optional int8/binary codes for the exact-scan path (rag.quantization)
+        self.quantization_config = quantization_config or {}
+        self.quantized: Optional[QuantizedIndex] = None
+        # Optional two-stage file -> chunk search (rag.hierarchical)
+        self.hierarchical_config = hierarchical_config or {}
+        self.files: Optional[FileIndex] = None
+        # Merging, near-duplicate removal and budget for prompt context (rag.context)
+        self.context_builder = ContextBuilder(**(context_config or {}))
+        self.search_mode = search_mode
+        self.lexical: Optional[BM25Index] = None
+        self._lexical_builder: Optional[BM25Builder] = None
+        # Directory walk settings (rag.walker in config.yaml)
+        self.walker_config = walker_config or {}
+        self.walk_stats = WalkStats()
+        # Counters for the last index/embedding run
+        self.files_indexed = 0
+        self.files_skipped = 0
+        self.embedding_calls = 0
     
     def _chunk_content(self, content: str, file_path: str) -> List[CodeChunk]:
-        """Split content into chunks with overlap"""
-        chunks = []
-        lines = content.split('\n')
-        
-        current_chunk = []
-        current_start = 1
-        current_size = 0
-        
-        for i, line in enumerate(lines, 1):
-            line_size = len(line) + 1  # +1 for newline
-            
-            if current_size + line_size > self.chunk_size and current_chunk:
-                # Create chunk
-                chunk_content = '\n'.join(current_chunk)
-                chunk_hash = hashlib.md5(chunk_content.encode()).hexdigest()
-                
-                chunks.append(CodeChunk(
-                    file_path=file_path,
-                    content=chunk_content,
-                    start_line=current_start,
-                    end_line=i - 1,
-                    chunk_hash=chunk_hash,
-                ))
-                
-                # Start new chunk with overlap
-                overlap_lines = max(0, len(current_chunk) - self.chunk_overlap // 50)
-                current_chunk = current_chunk[overlap_lines:]
-                current_start = i - len(current_chunk)
-                current_size = sum(len(l) + 1 for l in current_chunk)
-            
-            current_chunk.append(line)
-            current_size += line_size
-        
-        # Last chunk
-        if current_chunk:
-            chunk_content = '\n'.join(current_chunk)
-            chunk_hash = hashlib.md5(chunk_content.encode()).hexdigest()
-            
-            chunks.append(CodeChunk(
+        """Split content into chunks at declaration boundaries (see SyntaxChunker)"""
+        return [
+            CodeChunk(
                 file_path=file_path,
-                content=chunk_content,
-                start_line=current_start,
-                end_line=len(lines),
+                content=chunk.content,
+                start_line=chunk.start_line,
+                end_line=chunk.end_line,
+                chunk_hash=hashlib.md5(chunk.content.encode()).hexdigest(),
+                kind=chunk.kind,
+            )
+            for chunk in self.chunker.chunk(content, file_path)
+        ]
+    
+    @property
+    def _chunker_signature(self) -> str:
+        """Identifies the chunking parameters a cached file layout was built with"""
+        return self.chunker.signature
+    
+    def _load_cached_file(self, root: str, entry: WalkEntry) -> Optional[List[CodeChunk]]:
+        """
+        Rebuild a file's chunks from the cache if it is unchanged since it was
+        indexed: same git blob SHA when both are known, else same mtime and size.
+        """
+        record = self.cache.get_file(root, entry.relative_path)
+        if record is None or record.chunker != self._chunker_signature:
+            return None
+        if entry.blob_sha and record.blob_sha:
+            unchanged = entry.blob_sha == record.blob_sha
+        else:
+            unchanged = record.mtime_ns == entry.mtime_ns and record.size == entry.size
+        if not unchanged:
+            return None
+        
+        contents = self.cache.get_chunk_contents([h for h, _, _, _ in record.chunks])
+        if len(contents) < len({h for h, _, _, _ in record.chunks}):
+            return None
+        
+        return [
+            CodeChunk(
+                file_path=entry.relative_path,
+                content=contents[chunk_hash],
+                start_line=start_line,
+                end_line=end_line,
                 chunk_hash=chunk_hash,
-            ))
+                kind=kind,
+            )
+            for chunk_hash, start_line, end_line, kind in record.chunks
+        ]
+    
+    def _read_and_chunk(self, entry: WalkEntry) -> Tuple[WalkEntry, str, List[CodeChunk]]:
+        """Worker: read one file and chunk it; status is ok/binary/generated/error"""
+        try:
+            data = entry.path.read_bytes()
+        except OSError as e:
+            print(f"Error indexing {entry.path}: {e}")
+            return entry, "error", []
+        if looks_binary(data):
+            return entry, "binary", []
+        if looks_generated(data):
+            return entry, "generated", []
+        content = data.decode('utf-8', errors='ignore')
+        return entry, "ok", self._chunk_content(content, entry.relative_path)
+    
+    def _store_dir(self, root: str) -> Path:
+        """Each indexed root gets its own store directory"""
+        return self.index_dir / hashlib.sha1(root.encode()).hexdigest()[:16]
+    
+    @property
+    def chunk_count(self) -> int:
+        if self._writer is not None:
+            return self._writer.count
+        return self.store.count if self.store else 0
+    
+    def iter_chunks(self, directory: str) -> Iterator[CodeChunk]:
+        """
+        Walk a directory and yield its chunks one file at a time.
+        
+        Files are read and chunked on a thread pool while the walk continues;
+        results are consumed in walk order through a bounded window so memory
+        stays flat. Cache lookups and writes stay on this thread.
+        """
+        root = str(Path(directory).resolve())
+        walker = DirectoryWalker(
+            self.SUPPORTED_EXTENSIONS,
+            self.IGNORE_DIRS,
+            respect_gitignore=self.walker_config.get("respect_gitignore", True),
+            use_git=self.walker_config.get("use_git", True),
+            max_file_bytes=self.walker_config.get("max_file_bytes", 1_000_000),
+        )
+        workers = max(1, self.walker_config.get("workers", 8))
+        window = workers * 4
+        live_paths = []
+        self.files_indexed = 0
+        self.files_skipped = 0
+        self.walk_stats = walker.stats
         
-        return chunks
+        def finish(item) -> List[CodeChunk]:
+            if not isinstance(item, Future):
+                self.files_skipped += 1
+                self.files_indexed += 1
+                return item
+            entry, status, file_chunks = item.result()
+            if status == "binary":
+                walker.stats.skipped_binary += 1
+            elif status == "generated":
+                walker.stats.skipped_generated += 1
+            if status != "ok":
+                return []
+            if self.cache:
+                self.cache.put_file(
+                    root, entry.relative_path, entry.mtime_ns, entry.size,
+                    self._chunker_signature,
+                    [(c.chunk_hash, c.start_line, c.end_line, c.content, c.kind) for c in file_chunks],
+                    blob_sha=entry.blob_sha,
+                )
+            self.files_indexed += 1
+            return file_chunks
+        
+        pending: deque = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for entry in walker.walk(directory):
+                live_paths.append(entry.relative_path)
+                cached = self._load_cached_file(root, entry) if self.cache else None
+                pending.append(cached if cached is not None else pool.submit(self._read_and_chunk, entry))
+                while len(pending) > window:
+                    yield from finish(pending.popleft())
+            while pending:
+                yield from finish(pending.popleft())
+        self.walk_stats = walker.stats
+        
+        if self.cache:
+            removed = self.cache.collect_garbage(root, live_paths)
+            if any(removed.values()):
+                print(f"Removed stale cache entries: {removed}")
     
     def index_directory(self, directory: str) -> int:
-        """Index all supported files in a directory"""
-        dir_path = Path(directory)
-        indexed_count = 0
+        """
+        Index all supported files in a directory.
+        Chunks are streamed to disk; call generate_embeddings() to finish the index.
+        """
+        root = self._root = str(Path(directory).resolve())
+        self._writer = VectorStoreWriter(self._store_dir(root), self.embedding_model, self.vector_dtype)
+        self._lexical_builder = BM25Builder()
+        for chunk in self.iter_chunks(directory):
+            self._writer.add_chunk(
+                chunk.file_path, chunk.content, chunk.start_line, chunk.end_line, chunk.chunk_hash, chunk.kind
+            )
+            self._lexical_builder.add(tokenize_path(chunk.file_path) + tokenize_code(chunk.content))
+        return self.files_indexed
+    
+    def load_index(self, directory: str) -> bool:
+        """Open a previously built index for `directory` without walking it"""
+        root = str(Path(directory).resolve())
+        self.store = VectorStore.open(self._store_dir(root), model=self.embedding_model)
+        if self.store is not None:
+            self.lexical = BM25Index.load(self.store.directory)
+            self._open_metadata()
+            if self._ann_wanted(self.store.count):
+                self.ann = IVFIndex.load(self.store.directory, nprobe=self.ann_config.get("nprobe"))
+            config = self.quantization_config
+            if self._quantization_wanted():
+                quantized = QuantizedIndex.load(self.store.directory, rescore=config.get("rescore"))
+                if quantized is not None and quantized.matches(config["mode"], config.get("pca_dim", 0)):
+                    self.quantized = quantized
+            if self._files_wanted(len(self.store.paths)):
+                self.files = FileIndex.load(self.store.directory, top_files=self.hierarchical_config.get("top_files"))
+            if self.store_backend == "chroma" and self.search_mode != "lexical":
+                self._open_chroma(root)
+        return self.store is not None
+    
+    async def generate_embeddings(self, on_progress: Optional[ProgressCallback] = None) -> None:
+        """
+        Generate embeddings for all indexed chunks with the configured
+        embedder (Gemini, Ollama or hash) and finalize the on-disk index.
+        Each distinct chunk_hash is embedded at most once, and never again
+        if the cache already holds a vector for it under this model.
+        Uncached chunks are sent in batches, several batches at a time.
+        In lexical search mode nothing is embedded.
+        """
+        writer = self._writer
+        if writer is None:
+            return
         
-        for file_path in dir_path.rglob('*'):
-            if file_path.is_file() and self._should_index_file(file_path):
-                try:
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                    relative_path = str(file_path.relative_to(dir_path))
-                    
-                    file_chunks = self._chunk_content(content, relative_path)
-                    self.chunks.extend(file_chunks)
-                    indexed_count += 1
-                    
-                except Exception as e:
-                    print(f"Error indexing {file_path}: {e}")
+        self.embedding_calls = 0
+        if self.search_mode == "lexical":
+            print(f"Lexical search mode: skipping embeddings for {writer.count} chunks")
+        elif self.store_backend == "chroma":
+            await self._sync_chroma(writer, on_progress)
+        else:
+            await self._embed_rows(writer, on_progress)
         
-        return indexed_count
+        # Keep the previous ANN layout so unchanged chunks keep their cells
+        previous_ann = None
+        if self._ann_wanted(writer.count):
+            previous = VectorStore.open(writer.directory, model=self.embedding_model)
+            previous_index = IVFIndex.load(writer.directory) if previous else None
+            if previous_index is not None:
+                previous_ann = (previous_index, np.array(previous.hashes))
+            if previous:
+                previous.close()
+        
+        self._lexical_builder.build().save(writer.tmp_dir)
+        self._lexical_builder = None
+        if self.store:
+            self.store.close()
+        self.store = writer.finalize()
+        self._writer = None
+        self.lexical = BM25Index.load(self.store.directory)
+        self._open_metadata()
+        self._build_ann(previous_ann)
+        self._build_quantized()
+        self._build_file_index()
+        if self.chroma is not None:
+            self._map_chroma_rows()
     
-    async def generate_embeddings(self) -> None:
-        """Generate embeddings for all chunks using Gemini"""
-        print(f"Generating embeddings for {len(self.chunks)} chunks...")
+    async def _embed_rows(
+        self,
+        writer: VectorStoreWriter,
+        on_progress: Optional[ProgressCallback],
+        rows: Optional[Sequence[int]] = None,
+        write: Optional[Callable[[List[int], np.ndarray], None]] = None,
+    ) -> None:
+        """
+        Embed the given rows (default: all) from the cache and the embedding
+        API, handing vectors to `write` (default: the writer's vector matrix).
+        """
+        write = write or writer.set_vectors
+        rows_by_hash: Dict[str, List[int]] = {}
+        for row in (range(writer.count) if rows is None else rows):
+            rows_by_hash.setdefault(writer.chunk_hash(row), []).append(row)
         
-        for i, chunk in enumerate(self.chunks):
-            try:
-                result = genai.embed_content(
-                    model="models/embedding-001",
-                    content=f"File: {chunk.file_path}\n{chunk.content}",
-                    task_type="retrieval_document",
-                )
-                chunk.embedding = result['embedding']
-                
-                if (i + 1) % 10 == 0:
-                    print(f"  Processed {i + 1}/{len(self.chunks)} chunks")
-                    
-            except Exception as e:
-                print(f"Error generating embedding for chunk: {e}")
+        def write_vectors(hashes: List[str], vectors: List) -> None:
+            rows, expanded = [], []
+            for chunk_hash, vector in zip(hashes, vectors):
+                hash_rows = rows_by_hash[chunk_hash]
+                rows.extend(hash_rows)
+                expanded.extend([vector] * len(hash_rows))
+            if rows:
+                write(rows, np.asarray(expanded, dtype=np.float32))
         
+        # Fill cached vectors straight into the memory-mapped matrix
+        missing = []
+        unique = list(rows_by_hash)
+        for start in range(0, len(unique), 4096):
+            block = unique[start:start + 4096]
+            cached = self.cache.get_embeddings(self.embedding_model, block) if self.cache else {}
+            write_vectors(list(cached), list(cached.values()))
+            missing.extend(h for h in block if h not in cached)
+        
+        print(
+            f"Generating embeddings for {writer.count} chunks "
+            f"({len(rows_by_hash)} unique, {len(missing)} not cached)..."
+        )
+        
+        def store_batch(offset: int, batch_vectors: List[List[float]]) -> None:
+            self.embedding_calls += 1
+            batch_hashes = missing[offset:offset + len(batch_vectors)]
+            if self.cache:
+                self.cache.put_embeddings(self.embedding_model, dict(zip(batch_hashes, batch_vectors)))
+            write_vectors(batch_hashes, batch_vectors)
+        
+        # Identical chunks share one vector, embedded with the first path seen
+        texts = (
+            f"File: {writer.path(rows_by_hash[h][0])}\n{writer.text(rows_by_hash[h][0])}"
+            for h in missing
+        )
+        await embed_in_batches(
+            list(texts),
+            self.embedder.embed_documents,
+            batch_size=min(self.embedding_batch_size, self.embedder.max_batch),
+            concurrency=self.embedding_concurrency,
+            on_progress=on_progress,
+            on_batch=store_batch,
+        )
         print("Embedding generation complete")
     
-    def search(self, query: str, top_k: int = 5) -> List[CodeChunk]:
+    def _open_metadata(self) -> None:
+        self.metadata = MetadataIndex.from_store(self.store)
+        self._filter_masks = {}
+    
+    def _filter_mask(self, chunk_filter: Optional[ChunkFilter]) -> Optional[np.ndarray]:
+        """Rows a filter allows (None = no filter), memoized per store"""
+        if chunk_filter is None or chunk_filter.is_empty or self.metadata is None:
+            return None
+        key = self._filter_key(chunk_filter)
+        if key not in self._filter_masks:
+            self._filter_masks[key] = self.metadata.mask(chunk_filter)
+        return self._filter_masks[key]
+    
+    def count_matching(self, chunk_filter: Optional[ChunkFilter]) -> int:
+        """Number of indexed chunks a filter allows"""
+        mask = self._filter_mask(chunk_filter)
+        if mask is None:
+            return self.store.count if self.store else 0
+        return int(np.count_nonzero(mask))
+    
+    def _open_chroma(self, root: str) -> None:
+        self.chroma = ChromaStore(self.index_dir / "chroma", root, self.embedding_model)
+        self._map_chroma_rows()
+    
+    def _map_chroma_rows(self) -> None:
+        """Collection id -> store row, to resolve Chroma hits into chunks"""
+        store = self.store
+        ids = chunk_ids((store.path(row) for row in range(store.count)),
+                        (store.chunk_hash(row) for row in range(store.count)))
+        self._chroma_rows = {chunk: row for row, chunk in enumerate(ids)}
+    
+    async def _sync_chroma(self, writer: VectorStoreWriter, on_progress: Optional[ProgressCallback]) -> None:
+        """
+        Bring the Chroma collection in line with the walked chunks: chunks of
+        changed or removed files are deleted, and only chunks the collection
+        does not hold yet are embedded (or taken from the cache) and upserted.
+        """
+        self.chroma = ChromaStore(self.index_dir / "chroma", self._root, self.embedding_model)
+        ids = chunk_ids((writer.path(row) for row in range(writer.count)),
+                        (writer.chunk_hash(row) for row in range(writer.count)))
+        metadata = [
+            chunk_metadata(writer.path(row), *writer.lines(row), writer.chunk_hash(row), writer.kind(row))
+            for row in range(writer.count)
+        ]
+        missing = set(self.chroma.sync(dict(zip(ids, metadata))))
+        rows = [row for row, chunk in enumerate(ids) if chunk in missing]
+        print(f"Chroma: {self.chroma.count} chunks stored, {len(rows)} to add")
+        
+        def upsert(batch_rows: List[int], vectors: np.ndarray) -> None:
+            self.chroma.upsert(
+                [ids[row] for row in batch_rows],
+                normalize_rows(vectors),
+                [writer.text(row) for row in batch_rows],
+                [metadata[row] for row in batch_rows],
+            )
+        
+        if rows:
+            await self._embed_rows(writer, on_progress, rows=rows, write=upsert)
+    
+    def _ann_wanted(self, count: int) -> bool:
+        return bool(self.ann_config.get("enabled")) and count >= self.ann_config.get("min_vectors", 20000)
+    
+    def _build_ann(self, previous: Optional[Tuple[IVFIndex, np.ndarray]] = None) -> None:
+        """
+        Build the IVF index for the current store. Centroids from the previous
+        build are reused until the corpus outgrows them, and chunks that were
+        indexed before keep their cell, so only new chunks are assigned.
+        """
+        self.ann = None
+        store = self.store
+        if not self._ann_wanted(store.count) or store.dim == 0:
+            return
+        
+        config = self.ann_config
+        nprobe = config.get("nprobe", 8)
+        valid_rows = np.flatnonzero(np.asarray(store.has_vector))
+        reuse = (
+            previous is not None
+            and previous[0].centroids.shape[1] == store.dim
+            and config.get("nlist", 0) in (0, previous[0].nlist)
+            and not previous[0].needs_retrain(len(valid_rows), config.get("retrain_growth", 2.0))
+        )
+        
+        if reuse:
+            ann = IVFIndex(previous[0].centroids, nprobe=nprobe, trained_count=previous[0].trained_count)
+            labels = carry_over_labels(previous[0], previous[1], np.asarray(store.hashes)[valid_rows])
+        else:
+            ann = IVFIndex.train(
+                store.vectors if store.all_valid else store.vectors[valid_rows],
+                nlist=config.get("nlist", 0),
+                nprobe=nprobe,
+                iterations=config.get("train_iterations", 10),
+                sample_size=config.get("train_sample", 50000),
+            )
+            labels = np.full(len(valid_rows), -1, dtype=np.int32)
+        
+        known = labels >= 0
+        ann.add_labeled(valid_rows[known], labels[known])
+        new_rows = valid_rows[~known]
+        for start in range(0, len(new_rows), 65536):
+            block = new_rows[start:start + 65536]
+            ann.add(store.vectors[block], block)
+        ann.save(store.directory)
+        self.ann = ann
+        print(
+            f"ANN index: {ann.nlist} cells, {int((~known).sum())} vectors assigned"
+            f"{'' if reuse else ' (retrained)'}"
+        )
+    
+    def _quantization_wanted(self) -> bool:
+        return self.quantization_config.get("mode", "none") != "none"
+    
+    def _build_quantized(self) -> None:
+        """Encode the store's vectors for the compressed first-pass scan"""
+        self.quantized = None
+        store = self.store
+        if not self._quantization_wanted() or store.dim == 0:
+            return
+        
+        config = self.quantization_config
+        valid_rows = np.flatnonzero(np.asarray(store.has_vector))
+        if len(valid_rows) == 0:
+            return
+        quantized = QuantizedIndex.build(
+            store.vectors,
+            valid_rows,
+            mode=config["mode"],
+            pca_dim=config.get("pca_dim", 0),
+            rescore=config.get("rescore", 10),
+            sample_size=config.get("train_sample", 50000),
+        )
+        quantized.save(store.directory)
+        self.quantized = quantized
+        print(
+            f"Quantized index: {quantized.mode}"
+            f"{f', PCA to {quantized.pca_dim} dims' if quantized.pca_dim else ''}, "
+            f"{quantized.nbytes / 2**20:.1f} MB of codes for {quantized.size} vectors"
+        )
+    
+    def _files_wanted(self, file_count: int) -> bool:
+        config = self.hierarchical_config
+        return bool(config.get("enabled")) and file_count >= config.get("min_files", 200)
+    
+    def _build_file_index(self) -> None:
+        """Pool chunk vectors into one vector per file for two-stage search"""
+        self.files = None
+        store = self.store
+        if not self._files_wanted(len(store.paths)) or store.dim == 0:
+            return
+        files = FileIndex.build(
+            store.vectors, store.path_ids, store.has_vector, len(store.paths),
+            top_files=self.hierarchical_config.get("top_files", 20),
+        )
+        files.save(store.directory)
+        self.files = files
+        print(f"File index: {files.count} files, {store.count / max(files.count, 1):.1f} chunks per file")
+    
+    def _chunk_at(self, row: int) -> CodeChunk:
+        """Materialize one stored chunk, reading its text lazily"""
+        return CodeChunk(
+            file_path=self.store.path(row),
+            content=self.store.text(row),
+            start_line=int(self.store.start_lines[row]),
+            end_line=int(self.store.end_lines[row]),
+            chunk_hash=self.store.chunk_hash(row),
+            kind=self.store.kind(row),
+        )
+    
+    def _vector_rows(
+        self, query_vectors: np.ndarray, top_k: int, chunk_filter: Optional[ChunkFilter] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Top (row, score) pairs per query embedding. With a filter, only the
+        rows it allows are scored, exactly (ANN and quantized codes are only
+        used for unfiltered searches); Chroma applies it as a `where` clause.
+        The file index, when built, takes precedence and applies the filter
+        in both of its stages.
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        allowed = self._filter_mask(chunk_filter)
+        if allowed is not None and not allowed.any():
+            return [[] for _ in range(len(queries))]
+        if self.chroma is not None:
+            where = self.metadata.chroma_where(chunk_filter) if allowed is not None else None
+            return [
+                [(self._chroma_rows[chunk], score) for chunk, score in hits if chunk in self._chroma_rows]
+                for hits in self.chroma.query(queries, top_k, where=where)
+            ]
+        if self.store is None or self.store.count == 0 or self.store.dim == 0:
+            return [[] for _ in range(len(queries))]
+        
+        if self.files is not None:
+            if not self.store.all_valid:
+                valid = np.asarray(self.store.has_vector)
+                allowed = valid if allowed is None else allowed & valid
+            return [
+                [(int(row), float(score)) for row, score in zip(rows, scores)]
+                for rows, scores in self.files.search(self.store.vectors, queries, top_k, allowed=allowed)
+            ]
+        if allowed is not None:
+            rows = np.flatnonzero(allowed)
+            scores = self.store.scores(queries, rows)
+            return [
+                [(int(rows[i]), float(row_scores[i])) for i in row_top if np.isfinite(row_scores[i])]
+                for row_scores, row_top in zip(scores, top_k_indices(scores, top_k))
+            ]
+        if self.ann is not None:
+            return [
+                [(int(row), float(score)) for row, score in zip(rows, scores)]
+                for rows, scores in self.ann.search(self.store.vectors, queries, top_k)
+            ]
+        if self.quantized is not None:
+            return [
+                [(int(row), float(score)) for row, score in zip(rows, scores)]
+                for rows, scores in self.quantized.search(self.store.vectors, queries, top_k)
+            ]
+        
+        scores = self.store.scores(queries)
+        return [
+            [(int(i), float(row_scores[i])) for i in row_top if np.isfinite(row_scores[i])]
+            for row_scores, row_top in zip(scores, top_k_indices(scores, top_k))
+        ]
+    
+    @property
+    def _has_vectors(self) -> bool:
+        return self.chroma is not None or (self.store is not None and self.store.dim > 0)
+    
+    def search_by_vectors(
+        self, query_vectors: np.ndarray, top_k: int = 5
+    ) -> List[List[Tuple[float, CodeChunk]]]:
+        """
+        Score one or many query embeddings against the index.
+        All queries are scored with a single matrix multiply.
+        """
+        return [
+            [(score, self._chunk_at(row)) for row, score in hits]
+            for hits in self._vector_rows(query_vectors, top_k)
+        ]
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        chunk_filter: Optional[ChunkFilter] = None,
+    ) -> List[CodeChunk]:
         """Search for relevant code chunks"""
-        # Generate query embedding
-        result = genai.embed_content(
-            model="models/embedding-001",
-            content=query,
-            task_type="retrieval_query",
+        return self.search_many([query], top_k, mode, chunk_filter)[0]
+    
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        chunk_filter: Optional[ChunkFilter] = None,
+        query_vectors: Optional[np.ndarray] = None,
+    ) -> List[List[CodeChunk]]:
+        """
+        Search for several queries at once (one embedding call, one matmul).
+        `mode` overrides search_mode; lexical search makes no network calls.
+        `chunk_filter` restricts the candidates before anything is scored.
+        `query_vectors`, if given, are the queries already embedded with
+        this index's model (e.g. once for several federated shards).
+        """
+        if not queries:
+            return []
+        if self.store is None or self.store.count == 0:
+            return [[] for _ in queries]
+        
+        mode = mode or self.search_mode
+        use_vectors = mode != "lexical" and self._has_vectors
+        use_lexical = mode != "vector" and self.lexical is not None
+        depth = top_k * self.FUSION_DEPTH if use_vectors and use_lexical else top_k
+        
+        allowed = self._filter_mask(chunk_filter)
+        if use_vectors and query_vectors is None:
+            query_vectors = self._embed_queries(queries)
+        vector_hits = (
+            self._vector_rows(query_vectors, depth, chunk_filter)
+            if use_vectors else [[] for _ in queries]
+        )
+        lexical_hits = (
+            [self.lexical.search(q, depth, allowed) for q in queries]
+            if use_lexical else [[] for _ in queries]
         )
-        query_embedding = result['embedding']
-        
-        # Calculate cosine similarity
-        def cosine_similarity(a: List[float], b: List[float]) -> float:
-            dot_product = sum(x * y for x, y in zip(a, b))
-            norm_a = sum(x ** 2 for x in a) ** 0.5
-            norm_b = sum(x ** 2 for x in b) ** 0.5
-            return dot_product / (norm_a * norm_b) if norm_a and norm_b else 0
-        
-        # Score all chunks
-        scored_chunks = []
-        for chunk in self.chunks:
-            if chunk.embedding:
-                score = cosine_similarity(query_embedding, chunk.embedding)
-                scored_chunks.append((score, chunk))
-        
-        # Return top-k
-        scored_chunks.sort(key=lambda x: x[0], reverse=True)
-        return [chunk for _, chunk in scored_chunks[:top_k]]
+        return self._fuse(vector_hits, lexical_hits, top_k)
     
-    def get_context_for_task(self, task_description: str, top_k: int = 5) -> str:
-        """Get relevant code context for a task"""
-        relevant_chunks = self.search(task_description, top_k)
+    async def asearch_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        chunk_filter: Optional[ChunkFilter] = None,
+        query_vectors: Optional[np.ndarray] = None,
+    ) -> List[List[CodeChunk]]:
+        """
+        search_many for use inside the workflow's event loop: the query batch
+        is embedded in a worker thread and the BM25 searches run concurrently.
+        """
+        if not queries:
+            return []
+        if self.store is None or self.store.count == 0:
+            return [[] for _ in queries]
         
-        context_parts = []
-        for chunk in relevant_chunks:
-            context_parts.append(
-                f"--- {chunk.file_path} (lines {chunk.start_line}-{chunk.end_line}) ---\n"
-                f"{chunk.content}\n"
-            )
+        mode = mode or self.search_mode
+        use_vectors = mode != "lexical" and self._has_vectors
+        use_lexical = mode != "vector" and self.lexical is not None
+        depth = top_k * self.FUSION_DEPTH if use_vectors and use_lexical else top_k
+        allowed = self._filter_mask(chunk_filter)
+        
+        async def vector_search() -> List[List[Tuple[int, float]]]:
+            if not use_vectors:
+                return [[] for _ in queries]
+            vectors = query_vectors
+            if vectors is None:
+                vectors = await asyncio.to_thread(self._embed_queries, queries)
+            return await asyncio.to_thread(self._vector_rows, vectors, depth, chunk_filter)
+        
+        async def lexical_search() -> List[List[Tuple[int, float]]]:
+            if not use_lexical:
+                return [[] for _ in queries]
+            return list(await asyncio.gather(
+                *(asyncio.to_thread(self.lexical.search, q, depth, allowed) for q in queries)
+            ))
         
-        return "\n".join(context_parts)
+        vector_hits, lexical_hits = await asyncio.gather(vector_search(), lexical_search())
+        return self._fuse(vector_hits, lexical_hits, top_k)
+    
+    def _fuse(
+        self,
+        vector_hits: List[List[Tuple[int, float]]],
+        lexical_hits: List[List[Tuple[int, float]]],
+        top_k: int,
+    ) -> List[List[CodeChunk]]:
+        """Reciprocal-rank fusion of per-query vector and lexical rankings"""
+        results = []
+        for vector_rows, lexical_rows in zip(vector_hits, lexical_hits):
+            rankings = [[row for row, _ in hits] for hits in (vector_rows, lexical_rows) if hits]
+            fused = reciprocal_rank_fusion(rankings) if len(rankings) > 1 else [
+                (row, 0.0) for row in (rankings[0] if rankings else [])
+            ]
+            results.append([self._chunk_at(row) for row, _ in fused[:top_k]])
+        return results
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries, reusing cached query embeddings where possible"""
+        vectors: List[Optional[np.ndarray]] = [
+            self.cache.get_query_embedding(self.embedding_model, q) if self.cache else None
+            for q in queries
+        ]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        
+        batch_size = min(self.embedding_batch_size, self.embedder.max_batch)
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            embeddings = self.embedder.embed_queries([queries[i] for i in batch])
+            self.embedding_calls += 1
+            for i, embedding in zip(batch, embeddings):
+                vectors[i] = np.asarray(embedding, dtype=np.float32)
+                if self.cache:
+                    self.cache.put_query_embedding(self.embedding_model, queries[i], embedding)
+        
+        return np.vstack(vectors)
+
+
+class DocSection(BaseModel):
+    """
+    A node of a document's heading tree. The section body runs from its
+    heading to the next heading of any level; its subtree runs to the next
+    heading of the same or a higher level. Offsets are byte offsets into the
+    UTF-8 encoded document.
+    """
+    filename: str
+    heading: str
+    level: int  # 0 for text before the first heading
+    path: List[str]  # headings from the document root down to this section
+    parent: Optional[int]  # index of the parent section, None at the top
+    start_line: int
+    end_line: int
+    start_byte: int
+    end_byte: int
+    subtree_end_byte: int
 
 
 class DocumentIndexer:
     """
     Indexes documentation files for requirements and context.
     Specifically designed for the /docs directory.
+    
+    Markdown is parsed into a heading tree of sections with a BM25 index
+    over them, so lookups need no embedding calls. Sections store only byte
+    offsets; their text is sliced from the document when retrieved. Searches
+    can be restricted to document types (e.g. BRD, TAD) so that each agent
+    only sees the parts of the docs relevant to it. With `index_dir` set,
+    the BM25 index is persisted and reused while the docs are unchanged.
+    
+    Each document also gets a DocDigest (entities, tables, endpoints,
+    constraints, decisions), stored under `index_dir` by content hash so
+    unchanged documents are never digested twice.
     """
     
-    def __init__(self):
+    def __init__(self, index_dir: Optional[str] = None):
         self.documents: dict = {}  # {filename: content}
+        self.sections: List[DocSection] = []
+        self.lexical: Optional[BM25Index] = None
+        self.index_dir = Path(index_dir) if index_dir else None
+        self._encoded: Dict[str, bytes] = {}
+        self.digests: Dict[str, DocDigest] = {}
+        self.digest_store = DigestStore(self.index_dir / "digests" if self.index_dir else None)
     
     def index_docs_directory(self, docs_dir: str) -> int:
         """Index all markdown files in the docs directory"""
         docs_path = Path(docs_dir)
         indexed_count = 0
+        signature = hashlib.sha1()
         
-        for file_path in docs_path.glob('*.md'):
+        for file_path in sorted(docs_path.glob('*.md')):
             try:
                 content = file_path.read_text(encoding='utf-8')
                 self.documents[file_path.name] = content
+                self._encoded[file_path.name] = content.encode('utf-8')
+                stat = file_path.stat()
+                signature.update(f"{file_path.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
                 indexed_count += 1
             except Exception as e:
                 print(f"Error indexing {file_path}: {e}")
         
+        self.sections = []
+        for filename, content in sorted(self.documents.items()):
+            self.sections.extend(self._parse_sections(filename, content, offset=len(self.sections)))
+        self._build_lexical(docs_path, signature.hexdigest())
+        self.digests = {
+            filename: self.digest_store.get(filename, content)
+            for filename, content in sorted(self.documents.items())
+        }
         return indexed_count
     
+    @staticmethod
+    def _parse_sections(filename: str, content: str, offset: int = 0) -> List[DocSection]:
+        """Build the heading tree of a markdown document (ignoring fenced code blocks)"""
+        lines = content.split('\n')
+        line_bytes = [0]
+        for line in lines:
+            line_bytes.append(line_bytes[-1] + len(line.encode('utf-8')) + 1)
+        total_bytes = len(content.encode('utf-8'))
+        
+        headings = [(0, 0, filename)]  # (line index, level, heading text)
+        in_fence = False
+        for i, line in enumerate(lines):
+            if line.lstrip().startswith('```'):
+                in_fence = not in_fence
+            elif not in_fence and line.startswith('#') and line.lstrip('#').startswith(' '):
+                level = len(line) - len(line.lstrip('#'))
+                if i == 0:
+                    headings[0] = (0, level, line.lstrip('#').strip())
+                else:
+                    headings.append((i, level, line.lstrip('#').strip()))
+        
+        sections: List[DocSection] = []
+        stack: List[int] = []  # open ancestors, as indices into `sections`
+        for n, (line, level, heading) in enumerate(headings):
+            end_line = headings[n + 1][0] if n + 1 < len(headings) else len(lines)
+            while stack and sections[stack[-1]].level >= level:
+                stack.pop()
+            parent = stack[-1] if stack else None
+            sections.append(DocSection(
+                filename=filename,
+                heading=heading,
+                level=level,
+                path=(sections[parent].path if parent is not None else []) + [heading],
+                parent=None if parent is None else parent + offset,
+                start_line=line + 1,
+                end_line=end_line,
+                start_byte=min(line_bytes[line], total_bytes),
+                end_byte=min(line_bytes[end_line], total_bytes),
+                subtree_end_byte=total_bytes,
+            ))
+            stack.append(len(sections) - 1)
+        
+        # A subtree ends where the next heading of the same or a higher level starts
+        for i, section in enumerate(sections):
+            for later in sections[i + 1:]:
+                if later.level <= section.level:
+                    section.subtree_end_byte = later.start_byte
+                    break
+        
+        return sections
+    
+    def section_text(self, section: DocSection, subtree: bool = False) -> str:
+        """Text of a section (or of its whole subtree), sliced by byte offsets"""
+        end = section.subtree_end_byte if subtree else section.end_byte
+        return self._encoded[section.filename][section.start_byte:end].decode('utf-8', errors='ignore').strip()
+    
+    def _build_lexical(self, docs_path: Path, signature: str) -> None:
+        """Build the section BM25 index, or reuse the persisted one if docs are unchanged"""
+        store_dir = None
+        if self.index_dir:
+            root = str(docs_path.resolve())
+            store_dir = self.index_dir / hashlib.sha1(root.encode()).hexdigest()[:16]
+            manifest = store_dir / "manifest.json"
+            if manifest.exists() and json.loads(manifest.read_text()).get("signature") == signature:
+                self.lexical = BM25Index.load(store_dir)
+                if self.lexical is not None and self.lexical.count == len(self.sections):
+                    return
+        
+        builder = BM25Builder()
+        for section in self.sections:
+            builder.add(
+                tokenize_path(section.filename)
+                + tokenize_code(' '.join(section.path))
+                + tokenize_code(self.section_text(section))
+            )
+        self.lexical = builder.build()
+        
+        if store_dir:
+            store_dir.mkdir(parents=True, exist_ok=True)
+            self.lexical.save(store_dir)
+            (store_dir / "manifest.json").write_text(json.dumps({"signature": signature}))
+    
+    def _matches_doc_types(self, filename: str, doc_types: Optional[List[str]]) -> bool:
+        return not doc_types or any(t.lower() in filename.lower() for t in doc_types)
+    
+    def search(
+        self, query: str, top_k: int = 5, doc_types: Optional[List[str]] = None
+    ) -> List[DocSection]:
+        """
+        Lexical (BM25) search over document sections; makes no network calls.
+        `doc_types` restricts results to files whose name contains one of
+        them, matched like get_doc_by_type (e.g. ["BRD", "FSD"]).
+        """
+        if not self.lexical or not self.sections:
+            return []
+        scores = self.lexical.scores(tokenize_code(query))
+        if doc_types:
+            allowed = np.array([self._matches_doc_types(s.filename, doc_types) for s in self.sections])
+            scores = np.where(allowed, scores, 0.0)
+        best = top_k_indices(scores, top_k)
+        return [self.sections[i] for i in best if scores[i] > 0]
+    
+    def get_context_for_query(
+        self,
+        query: str,
+        top_k: int = 5,
+        doc_types: Optional[List[str]] = None,
+        max_chars: Optional[int] = None,
+    ) -> str:
+        """Get the most relevant documentation sections for a query, best first"""
+        parts = []
+        used = 0
+        for section in self.search(query, top_k, doc_types):
+            text = self.section_text(section)
+            if max_chars is not None:
+                if used >= max_chars:
+                    break
+                text = text[:max_chars - used]
+            used += len(text)
+            parts.append(
+                f"--- {section.filename} > {' > '.join(section.path)} "
+                f"(lines {section.start_line}-{section.end_line}) ---\n{text}\n"
+            )
+        return "\n".join(parts)
+    
+    def get_digests(
+        self,
+        doc_types: Optional[List[str]] = None,
+        max_chars: Optional[int] = None,
+        max_items: int = 25,
+    ) -> str:
+        """
+        Digests of the documents matching `doc_types` (all when None), in file
+        order. Lists are shortened (down to 5 items) to fit `max_chars`;
+        digests that still overflow it are left out.
+        """
+        digests = [d for f, d in self.digests.items() if self._matches_doc_types(f, doc_types)]
+        for items in (max_items, 10, 5):
+            texts = [digest.render(items) for digest in digests]
+            if max_chars is None or sum(len(t) + 1 for t in texts) <= max_chars:
+                break
+        parts = []
+        used = 0
+        for text in texts:
+            if max_chars is not None and used + len(text) > max_chars:
+                continue
+            used += len(text) + 1
+            parts.append(text)
+        return "\n".join(parts)
+    
     def get_all_docs_content(self) -> str:
         """Get combined content of all documents"""
         parts = []
@@ -0,0 +1,203 @@
+"""
+AI Flow - Lexical Index
+Code-aware tokenization, BM25 scoring and reciprocal-rank fusion
+"""
+
+import json
+import math
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*|\d+")
+# Boundaries inside identifiers: fooBar, HTTPServer, user_id, v2Api
+_CAMEL_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_PATH_SEPARATORS = re.compile(r"[\\/.\-]+")
+
+
+def split_identifier(identifier: str) -> List[str]:
+    """Split camelCase / PascalCase / snake_case identifiers into lowercase parts"""
+    parts = []
+    for piece in identifier.replace("$", "_").split("_"):
+        parts.extend(p.lower() for p in _CAMEL_PARTS.findall(piece))
+    return parts
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Tokens for code and prose: every identifier is kept whole (lowercased) and
+    also split into its camelCase/snake_case parts, so "UsersService" matches
+    queries for "UsersService", "users" and "service".
+    """
+    tokens = []
+    for identifier in _IDENTIFIER.findall(text):
+        whole = identifier.lower()
+        tokens.append(whole)
+        parts = split_identifier(identifier)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def tokenize_path(path: str) -> List[str]:
+    """Tokens for a file path: directories, file stem and extension, split like identifiers"""
+    tokens = []
+    for segment in _PATH_SEPARATORS.split(path):
+        if segment:
+            tokens.extend(tokenize_code(segment))
+    return tokens
+
+
+class BM25Builder:
+    """Accumulates documents and term frequencies for a BM25Index"""
+
+    def __init__(self):
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[Tuple[array, array]] = []  # per term: (doc ids, term frequencies)
+        self._doc_lengths = array("i")
+
+    @property
+    def count(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, tokens: Iterable[str]) -> int:
+        """Add one document; returns its id (ids are assigned sequentially)"""
+        doc_id = len(self._doc_lengths)
+        counts: Dict[str, int] = {}
+        length = 0
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+            length += 1
+        for token, tf in counts.items():
+            term_id = self._vocab.get(token)
+            if term_id is None:
+                term_id = self._vocab[token] = len(self._postings)
+                self._postings.append((array("i"), array("i")))
+            docs, tfs = self._postings[term_id]
+            docs.append(doc_id)
+            tfs.append(tf)
+        self._doc_lengths.append(length)
+        return doc_id
+
+    def build(self) -> "BM25Index":
+        sizes = np.array([len(docs) for docs, _ in self._postings], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        docs = np.frombuffer(b"".join(d.tobytes() for d, _ in self._postings), dtype=np.int32)
+        tfs = np.frombuffer(b"".join(t.tobytes() for _, t in self._postings), dtype=np.int32)
+        return BM25Index(
+            dict(self._vocab), offsets, docs, tfs,
+            np.frombuffer(self._doc_lengths, dtype=np.int32).copy(),
+        )
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index stored as flat arrays (CSR layout):
+    postings of term t are docs[offsets[t]:offsets[t + 1]] with matching tfs.
+    """
+
+    FILES = ("bm25_vocab.json", "bm25_offsets.npy", "bm25_docs.npy", "bm25_tfs.npy", "bm25_lengths.npy")
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self.doc_lengths)
+
+    def scores(self, tokens: Sequence[str]) -> np.ndarray:
+        """BM25 score of every document for the query tokens"""
+        scores = np.zeros(self.count, dtype=np.float32)
+        if not self.count:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_length, 1e-9))
+        for token in set(tokens):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def search(
+        self, query: str, top_k: int = 10, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Top documents for a free-text query as (doc_id, score), best first.
+        `allowed` is an optional boolean mask of the documents that may match.
+        """
+        scores = self.scores(tokenize_code(query))
+        if allowed is not None:
+            scores = np.where(allowed, scores, 0.0)
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        (directory / "bm25_vocab.json").write_text(json.dumps(terms))
+        np.save(directory / "bm25_offsets.npy", self.offsets)
+        np.save(directory / "bm25_docs.npy", self.docs)
+        np.save(directory / "bm25_tfs.npy", self.tfs)
+        np.save(directory / "bm25_lengths.npy", self.doc_lengths)
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["BM25Index"]:
+        directory = Path(directory)
+        if not all((directory / name).exists() for name in cls.FILES):
+            return None
+        terms = json.loads((directory / "bm25_vocab.json").read_text())
+        return cls(
+            {term: i for i, term in enumerate(terms)},
+            np.load(directory / "bm25_offsets.npy"),
+            np.load(directory / "bm25_docs.npy", mmap_mode="r"),
+            np.load(directory / "bm25_tfs.npy", mmap_mode="r"),
+            np.load(directory / "bm25_lengths.npy"),
+        )
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Fuse several ranked lists of ids: score(d) = sum_i w_i / (k + rank_i(d)).
+    Robust to the very different score scales of BM25 and cosine similarity.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,83 @@
+"""
+AI Flow - Chunk Metadata Filters
+Restrict retrieval to chunks by file extension, directory and symbol kind
+"""
+
+import posixpath
+from typing import List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class ChunkFilter(BaseModel):
+    """
+    Which chunks a search may return. Empty fields match everything; a chunk
+    must match every non-empty field.
+
+    extensions   file suffixes, e.g. [".prisma", ".sql"]
+    directories  path prefixes relative to the indexed root, e.g. ["apps/web"]
+    kinds        declaration kinds from the chunker, e.g. ["class", "model"]
+    """
+    extensions: List[str] = []
+    directories: List[str] = []
+    kinds: List[str] = []
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.extensions or self.directories or self.kinds)
+
+    def matches_path(self, path: str) -> bool:
+        if self.extensions and posixpath.splitext(path)[1] not in self.extensions:
+            return False
+        return not self.directories or any(
+            path.startswith(d.strip('/') + '/') or not d.strip('/') for d in self.directories
+        )
+
+
+class MetadataIndex:
+    """
+    Extension/directory and symbol-kind lookup over a VectorStore's rows.
+
+    Extensions and directories are properties of a file, so they are checked
+    once per distinct path and broadcast to rows through path_ids; kinds are
+    compared as small integer ids. Resolving a filter never touches vectors
+    or chunk text.
+    """
+
+    def __init__(
+        self, paths: Sequence[str], path_ids: np.ndarray, kinds: Sequence[str], kind_ids: np.ndarray
+    ):
+        self.paths = list(paths)
+        self.path_ids = np.asarray(path_ids)
+        self.kinds = list(kinds)
+        self.kind_ids = np.asarray(kind_ids)
+
+    @classmethod
+    def from_store(cls, store) -> "MetadataIndex":
+        return cls(store.paths, store.path_ids, store.kinds, store.kind_ids)
+
+    def matching_paths(self, chunk_filter: ChunkFilter) -> List[str]:
+        return [p for p in self.paths if chunk_filter.matches_path(p)]
+
+    def mask(self, chunk_filter: ChunkFilter) -> np.ndarray:
+        """Boolean mask over rows of the chunks the filter allows"""
+        allowed = np.fromiter((chunk_filter.matches_path(p) for p in self.paths), dtype=bool, count=len(self.paths))
+        mask = allowed[self.path_ids] if len(self.paths) else np.zeros(len(self.path_ids), dtype=bool)
+        if chunk_filter.kinds:
+            kind_allowed = np.array([k in chunk_filter.kinds for k in self.kinds], dtype=bool)
+            mask &= kind_allowed[self.kind_ids]
+        return mask
+
+    def chroma_where(self, chunk_filter: ChunkFilter) -> Optional[dict]:
+        """The filter as a Chroma `where` clause; directories become the matching paths"""
+        clauses = []
+        if chunk_filter.extensions:
+            clauses.append({"extension": {"$in": list(chunk_filter.extensions)}})
+        if chunk_filter.directories:
+            clauses.append({"path": {"$in": self.matching_paths(ChunkFilter(directories=chunk_filter.directories))}})
+        if chunk_filter.kinds:
+            clauses.append({"kind": {"$in": list(chunk_filter.kinds)}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,243 @@
+"""
+AI Flow - Vector Quantization
+Compressed int8 / binary codes for a first-pass scan, rescored with exact floats
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Rows encoded per block, and int8 rows widened to float32 per scoring block,
+# to bound the float32 working set
+_BLOCK_ROWS = 65536
+_SCORE_BLOCK_ROWS = 8192
+
+# Bits set in each byte value, for NumPy versions without bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Number of set bits in each row of an unsigned integer matrix"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def pack_signs(z: np.ndarray, words: int) -> np.ndarray:
+    """Sign bits of each row, packed and zero-padded to `words` uint64 words"""
+    bits = np.packbits(z > 0, axis=1)
+    padded = np.zeros((len(z), words * 8), dtype=np.uint8)
+    padded[:, :bits.shape[1]] = bits
+    return padded.view(np.uint64)
+
+
+def fit_pca(sample: np.ndarray, n_components: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and top principal directions (n_components, dim) of a sample"""
+    mean = sample.mean(axis=0)
+    centered = sample - mean
+    covariance = centered.T @ centered / max(len(sample) - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+    return mean.astype(np.float32), np.ascontiguousarray(eigenvectors[:, order].T, dtype=np.float32)
+
+
+class QuantizedIndex:
+    """
+    Compressed copy of a VectorStore's vectors for the first pass of search.
+
+    Vectors are centered (and optionally projected onto their top `pca_dim`
+    principal components, fitted at index time) and then encoded as:
+
+        int8    one signed byte per dimension with a per-dimension scale;
+                scored against the float query (asymmetric dot product).
+                Widening the codes for BLAS makes the scan slower than
+                float32, so without `pca_dim` int8 only saves memory
+        binary  one sign bit per dimension; scored by Hamming distance,
+                computed with XOR + popcount on 64-bit words
+
+    A query scans only the codes, keeps the `rescore` * top_k best candidates
+    and rescores those exactly against the float vectors, so only their rows
+    of the full-precision matrix are ever read.
+    """
+
+    MODES = ("int8", "binary")
+    FILES = ("quant.json", "quant_codes.npy", "quant_ids.npy", "quant_mean.npy")
+
+    def __init__(
+        self,
+        mode: str,
+        codes: np.ndarray,
+        ids: np.ndarray,
+        mean: np.ndarray,
+        components: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        rescore: int = 10,
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.codes = codes
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.mean = mean
+        self.components = components
+        self.scales = scales
+        self.rescore = rescore
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def pca_dim(self) -> int:
+        return 0 if self.components is None else len(self.components)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory scanned by the first pass (codes plus ids)"""
+        return int(self.codes.nbytes + self.ids.nbytes)
+
+    def _project(self, vectors: np.ndarray, center: bool = True) -> np.ndarray:
+        z = np.asarray(vectors, dtype=np.float32)
+        if center:
+            z = z - self.mean
+        return z if self.components is None else z @ self.components.T
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        ids: Sequence[int],
+        mode: str = "int8",
+        pca_dim: int = 0,
+        rescore: int = 10,
+        sample_size: int = 50000,
+        seed: int = 0,
+    ) -> "QuantizedIndex":
+        """Fit the projection/scales on a sample of `vectors[ids]`, then encode every row"""
+        ids = np.asarray(ids, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        sample_rows = ids if len(ids) <= sample_size else np.sort(rng.choice(ids, sample_size, replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        dim = sample.shape[1]
+        if 0 < pca_dim < dim:
+            mean, components = fit_pca(sample, pca_dim)
+        else:
+            mean, components = sample.mean(axis=0).astype(np.float32), None
+        index = cls(mode, None, ids, mean, components, rescore=rescore)
+
+        projected = index._project(sample)
+        if mode == "int8":
+            # Symmetric per-dimension scale; outliers beyond the sample are clipped
+            index.scales = (np.abs(projected).max(axis=0) / 127.0).astype(np.float32)
+            index.scales[index.scales == 0] = 1.0
+            codes = np.empty((len(ids), projected.shape[1]), dtype=np.int8)
+        else:
+            words = -(-projected.shape[1] // 64)
+            codes = np.empty((len(ids), words), dtype=np.uint64)
+
+        for start in range(0, len(ids), _BLOCK_ROWS):
+            block = index._project(vectors[ids[start:start + _BLOCK_ROWS]])
+            if mode == "int8":
+                codes[start:start + len(block)] = np.clip(np.rint(block / index.scales), -127, 127)
+            else:
+                codes[start:start + len(block)] = pack_signs(block, codes.shape[1])
+        index.codes = codes
+        return index
+
+    def approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        First-pass scores (nq, size) of normalized queries against every code,
+        higher is better. int8 codes are widened block by block, once for the
+        whole query batch; numpy's integer matmul has no BLAS and is slower still.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.empty((len(queries), self.size), dtype=np.float32)
+        if self.mode == "int8":
+            weights = self._project(queries, center=False) * self.scales
+            for start in range(0, self.size, _SCORE_BLOCK_ROWS):
+                block = np.asarray(self.codes[start:start + _SCORE_BLOCK_ROWS], dtype=np.float32)
+                scores[:, start:start + len(block)] = weights @ block.T
+            return scores
+        query_bits = pack_signs(self._project(queries), self.codes.shape[1])
+        for i, bits in enumerate(query_bits):
+            scores[i] = -popcount_rows(self.codes ^ bits)
+        return scores
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        top_k: int,
+        rescore: Optional[int] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k for each normalized query: a scan over the codes, then exact
+        rescoring of the best `rescore` * top_k candidates against `vectors`
+        (the full memory-mapped matrix the ids refer to).
+        Returns (row_ids, scores) per query, best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        depth = min(max(top_k, top_k * (rescore or self.rescore)), self.size)
+        if depth == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+
+        approximate = self.approximate_scores(queries)
+        if depth < self.size:
+            candidates = np.argpartition(-approximate, depth - 1, axis=1)[:, :depth]
+        else:
+            candidates = np.broadcast_to(np.arange(self.size), (len(queries), self.size))
+
+        results = []
+        for query, query_candidates in zip(queries, candidates):
+            # Sorted ids keep memory-mapped reads sequential
+            rows = np.sort(self.ids[query_candidates])
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append((rows[best], scores[best]))
+        return results
+
+    def matches(self, mode: str, pca_dim: int) -> bool:
+        return self.mode == mode and self.pca_dim == (pca_dim if 0 < pca_dim < len(self.mean) else 0)
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        np.save(directory / "quant_codes.npy", self.codes)
+        np.save(directory / "quant_ids.npy", self.ids)
+        np.save(directory / "quant_mean.npy", self.mean)
+        if self.components is not None:
+            np.save(directory / "quant_components.npy", self.components)
+        if self.scales is not None:
+            np.save(directory / "quant_scales.npy", self.scales)
+        (directory / "quant.json").write_text(json.dumps({
+            "mode": self.mode,
+            "pca_dim": self.pca_dim,
+            "rescore": self.rescore,
+            "count": self.size,
+        }))
+
+    @classmethod
+    def load(cls, directory: Path, rescore: Optional[int] = None) -> Optional["QuantizedIndex"]:
+        directory = Path(directory)
+        if not all((directory / name).exists() for name in cls.FILES):
+            return None
+        meta = json.loads((directory / "quant.json").read_text())
+        components = scales = None
+        if meta["pca_dim"]:
+            components = np.load(directory / "quant_components.npy")
+        if meta["mode"] == "int8":
+            scales = np.load(directory / "quant_scales.npy")
+        return cls(
+            meta["mode"],
+            np.load(directory / "quant_codes.npy", mmap_mode="r"),
+            np.load(directory / "quant_ids.npy"),
+            np.load(directory / "quant_mean.npy"),
+            components=components,
+            scales=scales,
+            rescore=rescore or meta["rescore"],
+        )
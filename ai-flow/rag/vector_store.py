@@ -0,0 +1,267 @@
+"""
+AI Flow - Vector Store
+Columnar, memory-mapped on-disk index for chunk embeddings and metadata
+"""
+
+import json
+import mmap
+import shutil
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+FORMAT_VERSION = 2
+
+# Rows scored per block; bounds the float32 working set for float16 stores
+SCORE_BLOCK_ROWS = 65536
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so that a dot product equals cosine similarity"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorStore:
+    """
+    Read-only view of an index directory:
+
+        manifest.json     model, dimension, dtype, row count
+        vectors.npy       (rows, dim) normalized float32/float16, memory-mapped
+        has_vector.npy    bool per row; False where embedding failed
+        path_ids.npy      int32 index into paths.json
+        start_lines.npy   int32
+        end_lines.npy     int32
+        hashes.npy        S32 chunk_hash
+        kind_ids.npy      int16 index into kinds.json (declaration kind, "" if mixed)
+        offsets.npy       int64 byte offset of the chunk text in content.bin
+        lengths.npy       int32 byte length of the chunk text
+        paths.json        relative file paths
+        kinds.json        declaration kinds (class, function, model...)
+        content.bin       concatenated UTF-8 chunk texts
+
+    Everything except the JSON files is memory-mapped, so opening
+    an index is near-instant and only touched pages become resident.
+    """
+
+    ARRAYS = ("has_vector", "path_ids", "start_lines", "end_lines", "hashes", "offsets", "lengths", "kind_ids")
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.manifest = json.loads((self.directory / "manifest.json").read_text())
+        self.model: str = self.manifest["model"]
+        self.count: int = self.manifest["count"]
+        self.dim: int = self.manifest["dim"]
+        self.all_valid: bool = self.manifest["all_valid"]
+
+        self.vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(self.directory / f"{name}.npy", mmap_mode="r"))
+        self.paths: List[str] = json.loads((self.directory / "paths.json").read_text())
+        self.kinds: List[str] = json.loads((self.directory / "kinds.json").read_text())
+
+        self._content_file = open(self.directory / "content.bin", "rb")
+        content_size = (self.directory / "content.bin").stat().st_size
+        # Empty files cannot be mapped
+        self._content = (
+            mmap.mmap(self._content_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if content_size else b""
+        )
+
+    @classmethod
+    def open(cls, directory: Path, model: Optional[str] = None) -> Optional["VectorStore"]:
+        """Open an existing index, or return None if absent or built for another model"""
+        manifest_path = Path(directory) / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("version") != FORMAT_VERSION:
+            return None
+        if model is not None and manifest.get("model") != model:
+            return None
+        return cls(directory)
+
+    def close(self) -> None:
+        if isinstance(self._content, mmap.mmap):
+            self._content.close()
+        self._content_file.close()
+
+    def text(self, row: int) -> str:
+        """Read a chunk's text lazily from content.bin"""
+        start = int(self.offsets[row])
+        return bytes(self._content[start:start + int(self.lengths[row])]).decode("utf-8")
+
+    def path(self, row: int) -> str:
+        return self.paths[int(self.path_ids[row])]
+
+    def chunk_hash(self, row: int) -> str:
+        return self.hashes[row].decode("ascii")
+
+    def kind(self, row: int) -> str:
+        return self.kinds[int(self.kind_ids[row])]
+
+    def scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine scores of normalized `queries` (nq, dim) against every row, or
+        only against `rows` (sorted row ids) when given.
+        Scored block by block so float16 stores never materialize a full
+        float32 copy. Rows without a vector score -inf.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        count = self.count if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            block_rows = slice(start, start + SCORE_BLOCK_ROWS) if rows is None else rows[start:start + SCORE_BLOCK_ROWS]
+            block = np.asarray(self.vectors[block_rows], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if not self.all_valid:
+            valid = np.asarray(self.has_vector)
+            scores[:, ~(valid if rows is None else valid[rows])] = -np.inf
+        return scores
+
+
+class VectorStoreWriter:
+    """
+    Streams chunks into a new index directory.
+
+    Chunk text goes straight to content.bin and metadata into compact arrays,
+    so nothing per-chunk stays in Python objects. Vectors are written into a
+    memory-mapped .npy once the row count is known. The index is built in a
+    sibling `.tmp` directory and swapped in atomically by finalize().
+    """
+
+    def __init__(self, directory: Path, model: str, dtype: str = "float32"):
+        self.directory = Path(directory)
+        self.model = model
+        self.dtype = np.dtype(dtype)
+        self.tmp_dir = self.directory.with_name(self.directory.name + ".tmp")
+        if self.tmp_dir.exists():
+            shutil.rmtree(self.tmp_dir)
+        self.tmp_dir.mkdir(parents=True)
+
+        self._content = open(self.tmp_dir / "content.bin", "w+b")
+        self._offset = 0
+        self._paths: List[str] = []
+        self._path_index: Dict[str, int] = {}
+        self._path_ids = array("i")
+        self._start_lines = array("i")
+        self._end_lines = array("i")
+        self._offsets = array("q")
+        self._lengths = array("i")
+        self._hashes = bytearray()
+        self._kinds: List[str] = []
+        self._kind_index: Dict[str, int] = {}
+        self._kind_ids = array("h")
+
+        self._vectors: Optional[np.memmap] = None
+        self._has_vector: Optional[np.ndarray] = None
+
+    @property
+    def count(self) -> int:
+        return len(self._path_ids)
+
+    def add_chunk(
+        self, file_path: str, content: str, start_line: int, end_line: int, chunk_hash: str, kind: str = ""
+    ) -> int:
+        """Append one chunk; returns its row number"""
+        if self._vectors is not None:
+            raise RuntimeError("Cannot add chunks after vectors have been written")
+        path_id = self._path_index.get(file_path)
+        if path_id is None:
+            path_id = self._path_index[file_path] = len(self._paths)
+            self._paths.append(file_path)
+        kind_id = self._kind_index.get(kind)
+        if kind_id is None:
+            kind_id = self._kind_index[kind] = len(self._kinds)
+            self._kinds.append(kind)
+
+        data = content.encode("utf-8")
+        self._content.write(data)
+        self._path_ids.append(path_id)
+        self._start_lines.append(start_line)
+        self._end_lines.append(end_line)
+        self._offsets.append(self._offset)
+        self._lengths.append(len(data))
+        self._hashes += chunk_hash.encode("ascii")[:32].ljust(32, b"\0")
+        self._kind_ids.append(kind_id)
+        self._offset += len(data)
+        return self.count - 1
+
+    def chunk_hash(self, row: int) -> str:
+        return self._hashes[row * 32:(row + 1) * 32].rstrip(b"\0").decode("ascii")
+
+    def path(self, row: int) -> str:
+        return self._paths[self._path_ids[row]]
+
+    def lines(self, row: int) -> Tuple[int, int]:
+        return self._start_lines[row], self._end_lines[row]
+
+    def kind(self, row: int) -> str:
+        return self._kinds[self._kind_ids[row]]
+
+    def text(self, row: int) -> str:
+        self._content.flush()
+        self._content.seek(self._offsets[row])
+        data = self._content.read(self._lengths[row])
+        self._content.seek(0, 2)
+        return data.decode("utf-8")
+
+    def set_vectors(self, rows: Sequence[int], vectors: np.ndarray) -> None:
+        """Write (normalized) vectors for the given rows"""
+        vectors = normalize_rows(np.atleast_2d(vectors))
+        if self._vectors is None:
+            self._vectors = np.lib.format.open_memmap(
+                self.tmp_dir / "vectors.npy", mode="w+", dtype=self.dtype,
+                shape=(self.count, vectors.shape[1]),
+            )
+            self._has_vector = np.zeros(self.count, dtype=bool)
+        rows = np.asarray(rows, dtype=np.int64)
+        self._vectors[rows] = vectors.astype(self.dtype)
+        self._has_vector[rows] = True
+
+    def finalize(self) -> VectorStore:
+        """Flush everything to disk and atomically replace the previous index"""
+        self._content.close()
+        if self._vectors is None:
+            np.save(self.tmp_dir / "vectors.npy", np.zeros((self.count, 0), dtype=self.dtype))
+            self._has_vector = np.zeros(self.count, dtype=bool)
+            dim = 0
+        else:
+            self._vectors.flush()
+            dim = int(self._vectors.shape[1])
+            self._vectors = None
+
+        np.save(self.tmp_dir / "has_vector.npy", self._has_vector)
+        np.save(self.tmp_dir / "path_ids.npy", np.frombuffer(self._path_ids, dtype=np.int32))
+        np.save(self.tmp_dir / "start_lines.npy", np.frombuffer(self._start_lines, dtype=np.int32))
+        np.save(self.tmp_dir / "end_lines.npy", np.frombuffer(self._end_lines, dtype=np.int32))
+        np.save(self.tmp_dir / "offsets.npy", np.frombuffer(self._offsets, dtype=np.int64))
+        np.save(self.tmp_dir / "lengths.npy", np.frombuffer(self._lengths, dtype=np.int32))
+        np.save(self.tmp_dir / "hashes.npy", np.frombuffer(bytes(self._hashes), dtype="S32"))
+        np.save(self.tmp_dir / "kind_ids.npy", np.frombuffer(self._kind_ids, dtype=np.int16))
+        (self.tmp_dir / "paths.json").write_text(json.dumps(self._paths))
+        (self.tmp_dir / "kinds.json").write_text(json.dumps(self._kinds))
+        (self.tmp_dir / "manifest.json").write_text(json.dumps({
+            "version": FORMAT_VERSION,
+            "model": self.model,
+            "count": self.count,
+            "dim": dim,
+            "dtype": self.dtype.name,
+            "all_valid": bool(self._has_vector.all()),
+        }, indent=2))
+
+        old_dir = self.directory.with_name(self.directory.name + ".old")
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        if self.directory.exists():
+            self.directory.rename(old_dir)
+        self.tmp_dir.rename(self.directory)
+        if old_dir.exists():
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+        return VectorStore(self.directory)
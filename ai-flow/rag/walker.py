@@ -0,0 +1,297 @@
+"""
+AI Flow - Directory Walker
+Pruning, .gitignore-aware file discovery for the codebase indexer
+"""
+
+import os
+import re
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+# Lockfiles and other machine-written files that are large and useless as context
+GENERATED_FILENAMES = {
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'npm-shrinkwrap.json',
+    'poetry.lock', 'Pipfile.lock', 'composer.lock', 'Cargo.lock', 'bun.lockb',
+}
+GENERATED_SUFFIXES = ('.min.js', '.min.css', '.map', '.snap', '.bundle.js')
+# Markers tools put at the top of generated sources
+GENERATED_MARKERS = (b'@generated', b'DO NOT EDIT')
+
+
+@dataclass
+class WalkEntry:
+    """A file selected for indexing"""
+    relative_path: str
+    path: Path
+    size: int
+    mtime_ns: int
+    blob_sha: Optional[str] = None  # git blob SHA when clean in a git checkout
+
+
+@dataclass
+class WalkStats:
+    """Counters for one walk, for comparing walkers"""
+    files_seen: int = 0
+    files_selected: int = 0
+    dirs_pruned: int = 0
+    skipped_ignored: int = 0
+    skipped_large: int = 0
+    skipped_generated: int = 0
+    skipped_binary: int = 0
+    used_git: bool = False
+    started_at: float = field(default_factory=time.perf_counter)
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_seen / self.seconds if self.seconds else 0.0
+
+
+class GitIgnoreRule:
+    """One .gitignore pattern, compiled to a regex relative to its directory"""
+
+    __slots__ = ("negate", "dir_only", "regex")
+
+    def __init__(self, pattern: str):
+        self.negate = pattern.startswith('!')
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A slash anywhere but the end anchors the pattern to this directory
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        body = self._translate(pattern)
+        self.regex = re.compile(('^' if anchored else '^(?:.*/)?') + body + '$')
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        out = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                out.append('(?:.*/)?')
+                i += 3
+            elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+                out.append('/.*')
+                i += 3
+            elif pattern.startswith('**', i):
+                out.append('.*')
+                i += 2
+            elif pattern[i] == '*':
+                out.append('[^/]*')
+                i += 1
+            elif pattern[i] == '?':
+                out.append('[^/]')
+                i += 1
+            elif pattern[i] == '[':
+                end = pattern.find(']', i + 1)
+                if end == -1:
+                    out.append(re.escape(pattern[i]))
+                    i += 1
+                else:
+                    out.append('[' + pattern[i + 1:end].replace('!', '^', 1) + ']')
+                    i = end + 1
+            elif pattern[i] == '\\' and i + 1 < len(pattern):
+                out.append(re.escape(pattern[i + 1]))
+                i += 2
+            else:
+                out.append(re.escape(pattern[i]))
+                i += 1
+        return ''.join(out)
+
+
+def load_gitignore(path: Path) -> List[GitIgnoreRule]:
+    rules = []
+    try:
+        for line in path.read_text(encoding='utf-8', errors='ignore').splitlines():
+            line = line.rstrip()
+            if line and not line.startswith('#'):
+                rules.append(GitIgnoreRule(line))
+    except OSError:
+        pass
+    return rules
+
+
+def is_ignored(rules: Sequence[Tuple[str, List[GitIgnoreRule]]], relative_path: str, is_dir: bool) -> bool:
+    """Apply stacked (base_dir, rules) from the root down; the last matching rule wins"""
+    ignored = False
+    for base, base_rules in rules:
+        if base:
+            if not relative_path.startswith(base + '/'):
+                continue
+            local = relative_path[len(base) + 1:]
+        else:
+            local = relative_path
+        for rule in base_rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(local):
+                ignored = not rule.negate
+    return ignored
+
+
+class DirectoryWalker:
+    """
+    Finds indexable files under a root.
+
+    Ignored directories (IGNORE_DIRS and .gitignore matches) are pruned
+    during traversal rather than filtered afterwards, so trees like
+    node_modules are never descended into. Inside a git checkout the walker
+    can instead ask `git ls-files` for the file list, which also yields blob
+    SHAs that identify unchanged files regardless of mtime.
+    """
+
+    def __init__(
+        self,
+        extensions: Set[str],
+        ignore_dirs: Set[str],
+        respect_gitignore: bool = True,
+        use_git: bool = True,
+        max_file_bytes: int = 1_000_000,
+    ):
+        self.extensions = extensions
+        self.ignore_dirs = ignore_dirs
+        self.respect_gitignore = respect_gitignore
+        self.use_git = use_git
+        self.max_file_bytes = max_file_bytes
+        self.stats = WalkStats()
+
+    def _wanted_name(self, name: str) -> bool:
+        if os.path.splitext(name)[1] not in self.extensions:
+            return False
+        if name in GENERATED_FILENAMES or name.endswith(GENERATED_SUFFIXES):
+            self.stats.skipped_generated += 1
+            return False
+        return True
+
+    def _check_size(self, size: int) -> bool:
+        if size > self.max_file_bytes:
+            self.stats.skipped_large += 1
+            return False
+        return True
+
+    def walk(self, root: str) -> Iterator[WalkEntry]:
+        """Yield files to index, in a stable order"""
+        self.stats = WalkStats()
+        root_path = Path(root)
+        try:
+            entries = self._walk_git(root_path) if self.use_git else None
+            if entries is None:
+                entries = self._walk_tree(root_path)
+            yield from entries
+        finally:
+            self.stats.seconds = time.perf_counter() - self.stats.started_at
+
+    def _walk_tree(self, root: Path) -> Iterator[WalkEntry]:
+        root_rules: List[Tuple[str, List[GitIgnoreRule]]] = []
+        stack: List[Tuple[str, List[Tuple[str, List[GitIgnoreRule]]]]] = [("", root_rules)]
+
+        while stack:
+            relative_dir, rules = stack.pop()
+            dir_path = root / relative_dir if relative_dir else root
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            if self.respect_gitignore and any(e.name == '.gitignore' for e in entries):
+                rules = rules + [(relative_dir, load_gitignore(dir_path / '.gitignore'))]
+
+            subdirs = []
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in self.ignore_dirs or (
+                        self.respect_gitignore and is_ignored(rules, relative_path, True)
+                    ):
+                        self.stats.dirs_pruned += 1
+                        continue
+                    subdirs.append(relative_path)
+                elif entry.is_file(follow_symlinks=False):
+                    self.stats.files_seen += 1
+                    if not self._wanted_name(entry.name):
+                        continue
+                    if self.respect_gitignore and is_ignored(rules, relative_path, False):
+                        self.stats.skipped_ignored += 1
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if not self._check_size(stat.st_size):
+                        continue
+                    self.stats.files_selected += 1
+                    yield WalkEntry(relative_path, Path(entry.path), stat.st_size, stat.st_mtime_ns)
+
+            # Reverse so the stack pops directories in sorted order
+            stack.extend((d, rules) for d in reversed(subdirs))
+
+    def _git(self, root: Path, *args: str) -> Optional[bytes]:
+        try:
+            result = subprocess.run(
+                ["git", "-C", str(root), *args],
+                capture_output=True, check=True, timeout=120,
+            )
+            return result.stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _walk_git(self, root: Path) -> Optional[Iterator[WalkEntry]]:
+        """File list from git (tracked + untracked, minus ignored), or None outside a checkout"""
+        staged = self._git(root, "ls-files", "-z", "-s")
+        if staged is None:
+            return None
+        untracked = self._git(root, "ls-files", "-z", "--others", "--exclude-standard") or b""
+        if not staged and not untracked:
+            # Empty, or the root itself is ignored by an enclosing checkout
+            return None
+        modified = self._git(root, "ls-files", "-z", "-m") or b""
+        self.stats.used_git = True
+
+        blob_shas: Dict[str, Optional[str]] = {}
+        for record in staged.split(b"\0"):
+            if not record:
+                continue
+            meta, _, name = record.partition(b"\t")
+            blob_shas[name.decode("utf-8", "surrogateescape")] = meta.split()[1].decode()
+        for name in modified.split(b"\0"):
+            # Working tree differs from the index; the staged SHA is stale
+            blob_shas[name.decode("utf-8", "surrogateescape")] = None
+        names = sorted(set(blob_shas) | {
+            n.decode("utf-8", "surrogateescape") for n in untracked.split(b"\0") if n
+        })
+        return self._git_entries(root, names, blob_shas)
+
+    def _git_entries(
+        self, root: Path, names: List[str], blob_shas: Dict[str, Optional[str]]
+    ) -> Iterator[WalkEntry]:
+        for name in names:
+            self.stats.files_seen += 1
+            parts = name.split('/')
+            if any(part in self.ignore_dirs for part in parts[:-1]):
+                self.stats.skipped_ignored += 1
+                continue
+            if not self._wanted_name(parts[-1]):
+                continue
+            path = root / name
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # deleted but still in the index
+            if not self._check_size(stat.st_size):
+                continue
+            self.stats.files_selected += 1
+            yield WalkEntry(name, path, stat.st_size, stat.st_mtime_ns, blob_shas.get(name))
+
+
+def looks_binary(data: bytes) -> bool:
+    """Git's heuristic: a NUL byte in the first 8 KB means binary"""
+    return b'\0' in data[:8192]
+
+
+def looks_generated(data: bytes) -> bool:
+    head = data[:1024]
+    return any(marker in head for marker in GENERATED_MARKERS)
@@ -0,0 +1,50 @@
+"""
+AI Flow - Chunker tests
+Symbol names of brace-language blocks split at their members
+"""
+
+from rag.chunker import SyntaxChunker
+
+
+def _prisma_model(fields: int) -> str:
+    members = "".join(f'  field{i} String @default("value{i}")\n' for i in range(fields))
+    return "model User {\n  id String @id\n" + members + "  @@index([field0])\n}\n"
+
+
+def test_large_prisma_model_is_split_with_field_names():
+    chunks = SyntaxChunker(300, 0).chunk(_prisma_model(30), "schema.prisma")
+
+    assert [chunk.content.split("\n")[0] for chunk in chunks] == [
+        "// User, User.id, User.field0, User.field1 +5 more",
+        "// User.field7, User.field8, User.field9, User.field10 +4 more",
+        "// User.field15, User.field16, User.field17, User.field18 +4 more",
+        "// User.field23, User.field24, User.field25, User.field26 +4 more",
+    ]
+    # The opening line belongs to the model, not to a field called `model`
+    assert chunks[0].content.split("\n")[1] == "model User {"
+    assert "User.model" not in chunks[0].symbol
+
+
+def test_prisma_chunk_starts_at_its_first_named_field():
+    chunks = SyntaxChunker(300, 0).chunk(_prisma_model(30), "schema.prisma")
+
+    for chunk in chunks[1:]:
+        first_field = chunk.symbol.split(", ")[0].split(".")[1]
+        assert chunk.content.split("\n")[1].strip().startswith(f"{first_field} ")
+
+
+def test_ts_class_members_named_from_their_own_lines():
+    methods = "".join(
+        f"  method{i}(value: string): string {{\n    return value + '{i}';\n  }}\n" for i in range(12)
+    )
+    source = (
+        "export class UsersService {\n"
+        "  constructor(private readonly repo: Repository) {}\n"
+        + methods
+        + "}\n"
+    )
+    chunks = SyntaxChunker(300, 0).chunk(source, "users.service.ts")
+
+    names = [name for chunk in chunks for name in chunk.symbol.split(", ")]
+    assert names[:3] == ["UsersService", "UsersService.constructor", "UsersService.method0"]
+    assert not any(name.endswith(".export") or name.endswith(".class") for name in names)
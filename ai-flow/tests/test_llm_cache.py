@@ -0,0 +1,80 @@
+"""
+AI Flow - LLM cache tests
+Responses the code agent cannot use are never replayed
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from agents.code_agent import CodeAgent
+from agents.llm_cache import LLMCache
+from orchestrator.state import Task, TaskPriority, TaskStatus, TaskType, create_initial_state
+
+
+class ScriptedLLM:
+    """Answers with the next of `responses`, counting the calls"""
+
+    model = "scripted"
+    temperature = 0.1
+
+    def __init__(self, *responses: str):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return SimpleNamespace(content=self.responses.pop(0))
+
+
+def _task() -> Task:
+    return Task(
+        id="T-1", title="Add user model", description="Prisma model for users", type=TaskType.DATABASE,
+        story_id="S-1", dependencies=[], files_to_create=["schema.prisma"], files_to_modify=[],
+        estimated_minutes=10, priority=TaskPriority.P1,
+    )
+
+
+def _generate(agent: CodeAgent, tmp_path) -> Task:
+    task = _task()
+    state = create_initial_state("notes", output_dir=str(tmp_path / "generated"))
+    state["tasks"] = [task]
+    asyncio.run(agent._generate(state, task, "Generate the user model", revising=False))
+    return task
+
+
+def _agent(tmp_path, llm: ScriptedLLM) -> CodeAgent:
+    agent = CodeAgent()
+    agent.llm = llm
+    agent.llm_cache = LLMCache(str(tmp_path / "cache"))
+    return agent
+
+
+def test_response_without_files_is_not_replayed(tmp_path):
+    good = json.dumps({"files": [{"path": "schema.prisma", "content": "model User {}"}]})
+    llm = ScriptedLLM("Sorry, I cannot help with that.", good, "unused")
+    agent = _agent(tmp_path, llm)
+
+    assert _generate(agent, tmp_path).status == TaskStatus.REVIEW_NEEDED
+    assert llm.calls == 1  # nothing parseable: stored nowhere, so the next run asks again
+    assert _generate(agent, tmp_path).status == TaskStatus.REVIEW_NEEDED
+    assert llm.calls == 2
+    # The usable response is replayed
+    task = _generate(agent, tmp_path)
+    assert llm.calls == 2
+    assert json.loads(task.generated_code)[0]["path"] == "schema.prisma"
+
+
+def test_cached_response_without_files_is_requested_again(tmp_path):
+    good = json.dumps({"files": [{"path": "schema.prisma", "content": "model User {}"}]})
+    llm = ScriptedLLM(good)
+    agent = _agent(tmp_path, llm)
+    provider, model, temperature = agent._llm_identity()
+    key = LLMCache.make_key(provider, model, temperature, agent.system_prompt, "Generate the user model")
+    agent.llm_cache.put(key, json.dumps({"files": []}))
+
+    task = _generate(agent, tmp_path)
+
+    assert llm.calls == 1
+    assert json.loads(task.generated_code)[0]["path"] == "schema.prisma"
+    assert agent.llm_cache.get(key) == good